@@ -0,0 +1,35 @@
+from quart import Quart
+from views.api import ProfiledJSONProvider
+from views.async_api import bp as views_bp
+from settings import settings
+from main import init_services, restore_snapshot, shutdown_worker
+from database.async_models import close_client
+from utils.async_http_client import async_exchange_client, async_google_client
+
+
+def create_asgi_app():
+    app = Quart(__name__)
+
+    app.config.from_object(settings)
+    app.json = ProfiledJSONProvider(app)
+    app.register_blueprint(views_bp)
+
+    @app.after_request
+    async def add_cors_headers(response):
+        response.headers["Access-Control-Allow-Origin"] = "*"
+        response.headers["Access-Control-Allow-Headers"] = "*"
+        return response
+
+    @app.before_serving
+    async def startup():
+        restore_snapshot()
+        init_services()
+
+    @app.after_serving
+    async def shutdown():
+        await async_google_client.close()
+        await async_exchange_client.close()
+        close_client()
+        shutdown_worker()
+
+    return app
@@ -0,0 +1,47 @@
+import argparse
+import json
+
+METRICS = ["rps", "p50_ms", "p95_ms", "p99_ms", "error_rate"]
+
+
+def compare(baseline, current):
+    """Retorna {endpoint: {métrica: (antes, depois, variação %)}} para os
+    endpoints presentes nos dois resultados."""
+    rows = {}
+    names = [name for name in current["endpoints"] if name in baseline["endpoints"]] + ["total"]
+    for name in names:
+        before = baseline["total"] if name == "total" else baseline["endpoints"][name]
+        after = current["total"] if name == "total" else current["endpoints"][name]
+        rows[name] = {metric: (before[metric], after[metric], _change(before[metric], after[metric])) for metric in METRICS}
+    return rows
+
+
+def _change(before, after):
+    if not before or after is None:
+        return None
+    return (after - before) / before * 100
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Compara dois resultados de benchmark")
+    parser.add_argument("baseline")
+    parser.add_argument("current")
+    args = parser.parse_args(argv)
+    with open(args.baseline) as file:
+        baseline = json.load(file)
+    with open(args.current) as file:
+        current = json.load(file)
+
+    for name, metrics in compare(baseline, current).items():
+        print(name)
+        for metric, (before, after, change) in metrics.items():
+            change = "-" if change is None else f"{change:+.1f}%"
+            print(f"  {metric:<11} {_format(before):>10} -> {_format(after):>10} {change:>9}")
+
+
+def _format(value):
+    return "-" if value is None else f"{value:.2f}"
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,139 @@
+import math
+import random
+import threading
+import time
+import requests
+from benchmarks.mongo import SEED_CURRENCIES
+from benchmarks.stubs import COUNTRIES_BY_COORDS, USD_RATES
+
+CURRENCIES = sorted(USD_RATES)
+COUNTRIES = sorted({item["country_iso2"] for item in SEED_CURRENCIES})
+COORDS = sorted(COUNTRIES_BY_COORDS)
+
+
+def coords_payload(rng):
+    latitude, longitude = rng.choice(COORDS)
+    return {
+        "latitude": f"{latitude + rng.uniform(-0.04, 0.04):.6f}",
+        "longitude": f"{longitude + rng.uniform(-0.04, 0.04):.6f}",
+    }
+
+
+def tax_payload(rng):
+    return {"sender_currency": rng.choice(CURRENCIES), **coords_payload(rng)}
+
+
+def conversion_payload(rng):
+    return {
+        "sender_currency": rng.choice(CURRENCIES),
+        "receiver_currency": rng.choice(CURRENCIES),
+        "value": round(rng.uniform(1, 1000), 2),
+    }
+
+
+def conversion_by_country_payload(rng):
+    return {
+        "sender_country": rng.choice(COUNTRIES),
+        "receiver_country": rng.choice(COUNTRIES),
+        "value": round(rng.uniform(1, 1000), 2),
+    }
+
+
+# nome do endpoint -> (método, caminho, gerador de payload)
+ENDPOINTS = {
+    "tax_coords": ("POST", "/tax_coords", tax_payload),
+    "conversion": ("POST", "/conversion", conversion_payload),
+    "conversion_by_country": ("POST", "/conversion_by_country", conversion_by_country_payload),
+    "coords_currency": ("POST", "/coords/currency", coords_payload),
+    "currencies": ("GET", "/currencies", None),
+}
+
+
+def percentile(values, fraction):
+    """Percentil pelo método do posto mais próximo sobre valores ordenados."""
+    if not values:
+        return None
+    rank = max(1, math.ceil(fraction * len(values)))
+    return values[rank - 1]
+
+
+def summarize(samples, elapsed):
+    latencies = sorted(latency for latency, _ in samples)
+    errors = sum(1 for _, ok in samples if not ok)
+    return {
+        "requests": len(samples),
+        "errors": errors,
+        "error_rate": errors / len(samples) if samples else 0.0,
+        "rps": len(samples) / elapsed if elapsed else 0.0,
+        "mean_ms": sum(latencies) / len(latencies) * 1000 if latencies else None,
+        "p50_ms": _ms(percentile(latencies, 0.50)),
+        "p95_ms": _ms(percentile(latencies, 0.95)),
+        "p99_ms": _ms(percentile(latencies, 0.99)),
+        "max_ms": _ms(latencies[-1] if latencies else None),
+    }
+
+
+def _ms(value):
+    return None if value is None else value * 1000
+
+
+class LoadDriver:
+    """Dispara requisições em laço fechado com `concurrency` threads durante
+    `duration` segundos; cada thread usa um gerador aleatório derivado de `seed`
+    para que a sequência de payloads seja reproduzível."""
+
+    def __init__(self, base_url, endpoints, concurrency=8, duration=10.0, warmup=1.0, seed=42, timeout=30.0):
+        self.base_url = base_url.rstrip("/")
+        self.endpoints = endpoints
+        self.concurrency = concurrency
+        self.duration = duration
+        self.warmup = warmup
+        self.seed = seed
+        self.timeout = timeout
+
+    def run(self):
+        samples = {name: [] for name in self.endpoints}
+        lock = threading.Lock()
+        started = time.perf_counter()
+        measure_from = started + self.warmup
+        stop_at = measure_from + self.duration
+
+        def worker(index):
+            rng = random.Random(self.seed * 1000 + index)
+            session = requests.Session()
+            position = index
+            while True:
+                now = time.perf_counter()
+                if now >= stop_at:
+                    break
+                name = self.endpoints[position % len(self.endpoints)]
+                position += 1
+                ok, latency = self._request(session, name, rng)
+                if now >= measure_from:
+                    with lock:
+                        samples[name].append((latency, ok))
+            session.close()
+
+        threads = [threading.Thread(target=worker, args=(index,)) for index in range(self.concurrency)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        elapsed = self.duration
+        all_samples = [sample for values in samples.values() for sample in values]
+        return {
+            "endpoints": {name: summarize(values, elapsed) for name, values in samples.items()},
+            "total": summarize(all_samples, elapsed),
+        }
+
+    def _request(self, session, name, rng):
+        method, path, payload_factory = ENDPOINTS[name]
+        payload = payload_factory(rng) if payload_factory else None
+        started = time.perf_counter()
+        try:
+            response = session.request(method, self.base_url + path, json=payload, timeout=self.timeout)
+            ok = response.status_code < 500
+        except requests.RequestException:
+            ok = False
+        return ok, time.perf_counter() - started
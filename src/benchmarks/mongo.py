@@ -0,0 +1,84 @@
+import shutil
+import socket
+import subprocess
+import tempfile
+import time
+from pymongo import MongoClient
+from pymongo.errors import PyMongoError
+
+SEED_CURRENCIES = [
+    {"currency": "BRL", "country_iso2": "BR", "country": "Brasil"},
+    {"currency": "USD", "country_iso2": "US", "country": "Estados Unidos"},
+    {"currency": "EUR", "country_iso2": "FR", "country": "França"},
+    {"currency": "EUR", "country_iso2": "DE", "country": "Alemanha"},
+    {"currency": "GBP", "country_iso2": "GB", "country": "Reino Unido"},
+    {"currency": "JPY", "country_iso2": "JP", "country": "Japão"},
+    {"currency": "ARS", "country_iso2": "AR", "country": "Argentina"},
+    {"currency": "CAD", "country_iso2": "CA", "country": "Canadá"},
+    {"currency": "MXN", "country_iso2": "MX", "country": "México"},
+    {"currency": "CNY", "country_iso2": "CN", "country": "China"},
+    {"currency": "INR", "country_iso2": "IN", "country": "Índia"},
+]
+
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def seed(mongodb_uri, db_name):
+    client = MongoClient(mongodb_uri, serverSelectionTimeoutMS=5000)
+    try:
+        collection = client.get_database(db_name).currency
+        collection.delete_many({})
+        collection.insert_many([dict(item) for item in SEED_CURRENCIES])
+    finally:
+        client.close()
+
+
+class LocalMongo:
+    """Sobe um mongod temporário (ou usa a URI informada) e popula a coleção
+    currency com os dados fixos do benchmark."""
+
+    def __init__(self, db_name, mongodb_uri=None, mongod="mongod"):
+        self.db_name = db_name
+        self.uri = mongodb_uri
+        self.mongod = mongod
+        self._process = None
+        self._dbpath = None
+
+    def __enter__(self):
+        if self.uri is None:
+            if shutil.which(self.mongod) is None:
+                raise RuntimeError("mongod não encontrado; informe --mongo-uri")
+            port = free_port()
+            self._dbpath = tempfile.mkdtemp(prefix="geoloc-bench-")
+            self._process = subprocess.Popen(
+                [self.mongod, "--port", str(port), "--dbpath", self._dbpath, "--bind_ip", "127.0.0.1", "--quiet"],
+                stdout=subprocess.DEVNULL,
+                stderr=subprocess.DEVNULL,
+            )
+            self.uri = f"mongodb://127.0.0.1:{port}"
+            self._wait()
+        seed(self.uri, self.db_name)
+        return self
+
+    def __exit__(self, *args):
+        if self._process is not None:
+            self._process.terminate()
+            self._process.wait(timeout=30)
+            shutil.rmtree(self._dbpath, ignore_errors=True)
+
+    def _wait(self, timeout=30):
+        deadline = time.time() + timeout
+        while time.time() < deadline:
+            client = MongoClient(self.uri, serverSelectionTimeoutMS=500)
+            try:
+                client.admin.command("ping")
+                return
+            except PyMongoError:
+                time.sleep(0.2)
+            finally:
+                client.close()
+        raise RuntimeError("mongod não respondeu a tempo")
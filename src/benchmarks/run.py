@@ -0,0 +1,121 @@
+import argparse
+import json
+import os
+import platform
+import subprocess
+import sys
+import time
+import requests
+from benchmarks.load import ENDPOINTS, LoadDriver
+from benchmarks.mongo import LocalMongo, free_port
+from benchmarks.serve import SERVERS
+from benchmarks.stubs import StubServer
+
+SRC_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def parse_env(values):
+    env = {}
+    for value in values:
+        name, _, setting = value.partition("=")
+        env[name] = setting
+    return env
+
+
+def service_env(stub, mongo, overrides):
+    env = dict(os.environ)
+    env.update({
+        "PYTHONPATH": SRC_DIR,
+        "GOOGLE_MAPS_API": f"{stub.url}/maps/api/geocode/json",
+        "GOOGLE_API_KEY": "bench",
+        "CURRENCY_API": f"{stub.url}/v6",
+        "CURRENCY_API_KEY": "bench",
+        "MONGO_DATABASE_URI": mongo.uri,
+        "MONGO_DATABASE_NAME": mongo.db_name,
+    })
+    env.update(overrides)
+    return env
+
+
+def wait_ready(base_url, process, timeout=60):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        if process.poll() is not None:
+            raise RuntimeError("O serviço encerrou antes de ficar disponível")
+        try:
+            if requests.get(f"{base_url}/health", timeout=1).status_code == 200:
+                return
+        except requests.RequestException:
+            pass
+        time.sleep(0.2)
+    raise RuntimeError("O serviço não ficou disponível a tempo")
+
+
+def run(args):
+    overrides = parse_env(args.env)
+    with StubServer(args.latency, args.jitter, args.error_rate, args.seed) as stub, \
+            LocalMongo(args.db_name, args.mongo_uri, args.mongod) as mongo:
+        port = free_port()
+        base_url = f"http://127.0.0.1:{port}"
+        process = subprocess.Popen(
+            [sys.executable, "-m", "benchmarks.serve", "--server", args.server, "--port", str(port)],
+            cwd=SRC_DIR,
+            env=service_env(stub, mongo, overrides),
+        )
+        try:
+            wait_ready(base_url, process)
+            driver = LoadDriver(base_url, args.endpoint, args.concurrency, args.duration, args.warmup, args.seed)
+            result = driver.run()
+        finally:
+            process.terminate()
+            process.wait(timeout=30)
+        upstream_requests = stub.requests
+
+    result["config"] = {
+        "server": args.server,
+        "endpoints": args.endpoint,
+        "concurrency": args.concurrency,
+        "duration": args.duration,
+        "warmup": args.warmup,
+        "seed": args.seed,
+        "latency": args.latency,
+        "jitter": args.jitter,
+        "error_rate": args.error_rate,
+        "env": overrides,
+    }
+    result["upstream_requests"] = upstream_requests
+    result["python"] = platform.python_version()
+    return result
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark do GeoLoc-Backend com serviços externos simulados")
+    parser.add_argument("--server", choices=sorted(SERVERS), default="wsgi")
+    parser.add_argument("--endpoint", action="append", choices=sorted(ENDPOINTS),
+                        help="Endpoint a exercitar (pode repetir; padrão: todos)")
+    parser.add_argument("--duration", type=float, default=10.0, help="Duração da medição, em segundos")
+    parser.add_argument("--warmup", type=float, default=2.0, help="Aquecimento descartado, em segundos")
+    parser.add_argument("--concurrency", type=int, default=16, help="Número de clientes simultâneos")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--latency", type=float, default=0.05, help="Latência simulada dos serviços externos, em segundos")
+    parser.add_argument("--jitter", type=float, default=0.01, help="Variação da latência simulada, em segundos")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="Fração de respostas 500 dos serviços externos")
+    parser.add_argument("--mongo-uri", help="MongoDB já existente (padrão: sobe um mongod temporário)")
+    parser.add_argument("--mongod", default="mongod", help="Executável do mongod")
+    parser.add_argument("--db-name", default="geoloc-bench")
+    parser.add_argument("--env", action="append", default=[], metavar="NOME=VALOR",
+                        help="Variável de ambiente repassada ao serviço (pode repetir)")
+    parser.add_argument("--output", help="Arquivo JSON com os resultados")
+    args = parser.parse_args(argv)
+    args.endpoint = args.endpoint or list(ENDPOINTS)
+
+    result = run(args)
+    report = json.dumps(result, indent=2)
+    if args.output:
+        with open(args.output, "w") as file:
+            file.write(report)
+    print(report)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,42 @@
+import argparse
+import asyncio
+import os
+
+
+def serve_wsgi(host, port):
+    from werkzeug.serving import make_server
+    from main import create_app
+
+    make_server(host, port, create_app(), threaded=True).serve_forever()
+
+
+def serve_asgi(host, port):
+    from hypercorn.asyncio import serve
+    from hypercorn.config import Config
+    from asgi import create_asgi_app
+
+    config = Config()
+    config.bind = [f"{host}:{port}"]
+    config.accesslog = None
+    asyncio.run(serve(create_asgi_app(), config))
+
+
+def serve_gunicorn(host, port):
+    config = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "gunicorn.conf.py")
+    os.execvp("gunicorn", ["gunicorn", "--config", config, "--bind", f"{host}:{port}"])
+
+
+SERVERS = {"wsgi": serve_wsgi, "asgi": serve_asgi, "gunicorn": serve_gunicorn}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Sobe o serviço para o benchmark")
+    parser.add_argument("--server", choices=sorted(SERVERS), default="wsgi")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, required=True)
+    args = parser.parse_args()
+    SERVERS[args.server](args.host, args.port)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,134 @@
+import json
+import random
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+# Moedas e taxas em relação ao USD usadas pelo serviço de câmbio simulado
+USD_RATES = {
+    "USD": 1.0,
+    "BRL": 5.0,
+    "EUR": 0.92,
+    "GBP": 0.79,
+    "JPY": 151.0,
+    "ARS": 870.0,
+    "CAD": 1.36,
+    "MXN": 16.8,
+    "CNY": 7.23,
+    "INR": 83.3,
+}
+
+# País retornado pelo Google simulado para cada coordenada arredondada
+COUNTRIES_BY_COORDS = {
+    (-16.0, -48.1): "BR",
+    (-23.6, -46.6): "BR",
+    (40.7, -74.0): "US",
+    (48.9, 2.4): "FR",
+    (51.5, -0.1): "GB",
+    (35.7, 139.7): "JP",
+    (-34.6, -58.4): "AR",
+}
+
+
+class StubServer:
+    """Servidor HTTP local que imita as respostas do Google Geocoding e do
+    serviço de câmbio, com latência e taxa de erros configuráveis."""
+
+    def __init__(self, latency=0.0, jitter=0.0, error_rate=0.0, seed=None, host="127.0.0.1", port=0):
+        self.latency = latency
+        self.jitter = jitter
+        self.error_rate = error_rate
+        self.random = random.Random(seed)
+        self.requests = 0
+        self._lock = threading.Lock()
+        self.server = ThreadingHTTPServer((host, port), self._handler())
+        self.server.daemon_threads = True
+        self._thread = None
+
+    @property
+    def url(self):
+        host, port = self.server.server_address
+        return f"http://{host}:{port}"
+
+    def start(self):
+        self._thread = threading.Thread(target=self.server.serve_forever, name="stub-server", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *args):
+        self.stop()
+
+    def _delay_and_fail(self):
+        with self._lock:
+            self.requests += 1
+            delay = max(0.0, self.latency + self.random.uniform(-self.jitter, self.jitter))
+            fail = self.random.random() < self.error_rate
+        if delay:
+            time.sleep(delay)
+        return fail
+
+    def _handler(self):
+        stub = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                if stub._delay_and_fail():
+                    return self._send(500, {"error": "stub error"})
+                url = urlparse(self.path)
+                parts = url.path.strip("/").split("/")
+                if parts[-1] == "json":
+                    return self._send(200, google_payload(parse_qs(url.query).get("latlng", ["0,0"])[0]))
+                if len(parts) >= 2 and parts[-2] == "latest":
+                    payload = exchange_payload(parts[-1])
+                    return self._send(200 if payload else 404, payload or {"result": "error", "error-type": "unsupported-code"})
+                return self._send(404, {"error": "not found"})
+
+            def _send(self, status, payload):
+                body = json.dumps(payload).encode()
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, *args):
+                pass
+
+        return Handler
+
+
+def google_payload(latlng):
+    latitude, longitude = (float(value) for value in latlng.split(","))
+    country = COUNTRIES_BY_COORDS.get((round(latitude, 1), round(longitude, 1)))
+    if not country:
+        return {"results": [], "status": "ZERO_RESULTS"}
+    return {
+        "results": [{
+            "address_components": [
+                {"long_name": "Cidade", "short_name": "Cidade", "types": ["locality", "political"]},
+                {"long_name": country, "short_name": country, "types": ["country", "political"]},
+            ]
+        }],
+        "status": "OK",
+    }
+
+
+def exchange_payload(base):
+    if base not in USD_RATES:
+        return None
+    now = int(time.time())
+    return {
+        "result": "success",
+        "base_code": base,
+        "time_last_update_unix": now,
+        "time_next_update_unix": now + 86400,
+        "conversion_rates": {currency: rate / USD_RATES[base] for currency, rate in USD_RATES.items()},
+    }
@@ -0,0 +1,54 @@
+import argparse
+import logging
+import sys
+from pymongo.errors import PyMongoError
+from controllers.stream_controller import StreamConverter
+from database.models import currency_index
+from main import init_services
+from settings import settings
+from utils import quota
+from utils.streaming import RowParser, detect_format, to_ndjson
+
+logger = logging.getLogger(__name__)
+logger.setLevel(logging.INFO)
+
+
+def convert(lines, output, file_format, chunk_size, max_workers):
+    converter = StreamConverter(chunk_size, max_workers)
+    count = 0
+    for result in converter.convert(RowParser(file_format).rows(lines)):
+        output.write(to_ndjson(result))
+        count += 1
+    return count
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Conversão em massa de valores a partir de um arquivo CSV ou NDJSON")
+    parser.add_argument("input", help="Arquivo de entrada (- para a entrada padrão)")
+    parser.add_argument("--format", choices=["csv", "ndjson"], help="Formato da entrada (padrão: pela extensão do arquivo)")
+    parser.add_argument("--output", default="-", help="Arquivo NDJSON de saída (padrão: saída padrão)")
+    parser.add_argument("--chunk-size", type=int, default=settings.STREAM_CHUNK_SIZE, help="Linhas convertidas por bloco")
+    args = parser.parse_args(argv)
+
+    init_services(background=False)
+    quota.set_priority(quota.BATCH)
+    try:
+        currency_index.load()
+    except PyMongoError as e:
+        logger.warning(f"Índice de moedas não carregado, consultando o MongoDB: {str(e)}")
+
+    file_format = args.format or detect_format(filename=args.input)
+    source = sys.stdin if args.input == "-" else open(args.input, encoding="utf-8", newline="")
+    output = sys.stdout if args.output == "-" else open(args.output, "w", encoding="utf-8")
+    try:
+        count = convert(source, output, file_format, args.chunk_size, settings.BATCH_MAX_WORKERS)
+    finally:
+        if source is not sys.stdin:
+            source.close()
+        if output is not sys.stdout:
+            output.close()
+    logger.info(f"{count} linhas convertidas")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,273 @@
+import asyncio
+from contextlib import nullcontext
+import httpx
+from pymongo.errors import PyMongoError
+from marshmallow import ValidationError
+from settings import settings
+from controllers.geoloc_controller import cached_rate_table, convert_rates, currencies_payload, currencies_response, exchange_rate_table, exchange_unavailable, exchange_url, fetched_currencies, geocode_cache, geocode_key, geolocation_unavailable, google_country, google_url, historical_rates, history_unavailable, is_multi_tax, local_country, rate_matrix, rate_store, record_rate_table, register_flight_metrics, require_conversion, select_rates, serve_stale, share_rate_table, shared_currencies, tax_currencies, tax_response, upstream_flights
+from controllers.stream_controller import error_result, row_result, validate_row
+from database.async_models import AsyncCurrency, AsyncRateHistory
+from database.models import currency_index
+from utils.async_http_client import async_exchange_client, async_google_client
+from utils import quota
+from utils.rates import currency_code
+from utils.singleflight import AsyncSingleFlight
+from utils.exceptions import CircuitOpenError, CountryNotFound, CurrenciesNotFound, DesiredCurrencyNotFound, ExchangeApiError, ServiceOverloaded, TaxNotFound
+
+async_upstream_flights = AsyncSingleFlight()
+register_flight_metrics(upstream_flights, async_upstream_flights)
+
+
+async def off_loop(fn, *args):
+    """Executa uma operação de cache. Com CACHE_BACKEND compartilhado, ela faz
+    I/O bloqueante no SQLite ou no Redis e roda em uma thread para não parar
+    o event loop; em memória, roda direto."""
+    if settings.CACHE_BACKEND == "memory":
+        return fn(*args)
+    return await asyncio.to_thread(fn, *args)
+
+
+class AsyncGeoController:
+    async def get_country(self, latitude, longitude):
+        key = geocode_key(latitude, longitude)
+        country_code = await off_loop(geocode_cache.get, key)
+        if country_code:
+            return country_code
+        country_code = await self.resolve_country(latitude, longitude)
+        if country_code:
+            await off_loop(geocode_cache.set, key, country_code)
+        return country_code
+
+    async def resolve_country(self, latitude, longitude):
+        resolved, country_code = local_country(latitude, longitude)
+        if resolved:
+            return country_code
+        return await async_upstream_flights.do(
+            ("google", geocode_key(latitude, longitude)),
+            lambda: self.get_country_from_google(latitude, longitude),
+        )
+
+    async def get_country_from_google(self, latitude, longitude):
+        try:
+            response = await async_google_client.get(google_url(latitude, longitude))
+        except (httpx.HTTPError, CircuitOpenError) as e:
+            raise geolocation_unavailable(e)
+        return google_country(response)
+
+    async def get_exchanges(self, currency):
+        return (await self.get_rate_table(currency)).rates
+
+    async def get_rate_table(self, currency):
+        table = rate_store.get(currency)
+        if table:
+            return table
+        table, stale = await off_loop(cached_rate_table, currency)
+        if table:
+            return table
+
+        try:
+            table = await async_upstream_flights.do(("exchange", currency), lambda: self.fetch_shared_rate_table(currency))
+        except (ExchangeApiError, ServiceOverloaded):
+            if stale:
+                return serve_stale(currency, stale)
+            raise
+        rate_store.put(table)
+        return table
+
+    async def fetch_shared_rate_table(self, currency):
+        return await off_loop(share_rate_table, record_rate_table(await self.fetch_rate_table(currency)))
+
+    async def fetch_rate_table(self, currency):
+        try:
+            response = await async_exchange_client.get(exchange_url(currency))
+        except (httpx.HTTPError, CircuitOpenError) as e:
+            raise exchange_unavailable(e)
+        return exchange_rate_table(currency, response)
+
+    async def get_historical_rates(self, currency, as_of):
+        try:
+            table = await AsyncRateHistory.find(currency, as_of)
+        except PyMongoError as e:
+            raise history_unavailable(e)
+        return historical_rates(table, currency, as_of)
+
+    async def get_conversion(self, base_currency, desired_currency, amount, as_of=None):
+        if as_of is not None:
+            rate = (await self.get_historical_rates(base_currency, as_of)).get(desired_currency)
+        else:
+            rate = rate_store.rate(base_currency, desired_currency)
+            if rate is None:
+                rate = (await self.get_exchanges(base_currency)).get(desired_currency)
+        if rate is None:
+            return {}
+        return amount * rate
+
+    async def get_conversion_matrix(self, base_currency, amounts, desired_currencies=None, as_of=None):
+        base_currency = currency_code(base_currency)
+        if as_of is not None:
+            return require_conversion(convert_rates(await self.get_historical_rates(base_currency, as_of), amounts, desired_currencies))
+        if not rate_store.get(base_currency) and not rate_store.get(rate_store.pivot):
+            await self.get_rate_table(base_currency)
+        return require_conversion(rate_matrix.get().convert(base_currency, amounts, desired_currencies))
+
+    async def find_currency(self, country):
+        if shared_currencies is None or currency_index.loaded:
+            return await AsyncCurrency.find_by_country(country)
+        currency = await off_loop(shared_currencies.get, country)
+        if currency is None:
+            currency = await AsyncCurrency.find_by_country(country)
+            if currency:
+                await off_loop(shared_currencies.set, country, currency)
+        return currency
+
+    async def get_base_currency_by_coords(self, latitude, longitude):
+        current_country = await self.get_country(latitude, longitude)
+        if not current_country:
+            raise CountryNotFound("Não foi possível localizar o país com as coordenadas fornecidas")
+
+        base_currency = await self.find_currency(current_country)
+        if not base_currency:
+            raise DesiredCurrencyNotFound("Moeda desejada não encontrada")
+        return current_country, base_currency["currency"]
+
+    async def get_tax_by_coords(self, latitude, longitude, desired_currency):
+        _, base_currency = await self.get_base_currency_by_coords(latitude, longitude)
+        tax = await self.get_tax(base_currency, desired_currency)
+        if not tax:
+            raise TaxNotFound("Conversão para moeda desejada não encontrada")
+
+        return tax
+
+    async def get_taxes_by_coords(self, latitude, longitude, desired_currencies=None):
+        country, base_currency = await self.get_base_currency_by_coords(latitude, longitude)
+        currencies = await self.get_exchanges(base_currency)
+        if not currencies:
+            raise CurrenciesNotFound("Não foi possível buscar moedas para o país com as coordenadas fornecidas")
+        return {"country": country, "base_currency": base_currency, "rates": select_rates(currencies, desired_currencies)}
+
+    async def get_tax_response(self, payload):
+        if not is_multi_tax(payload):
+            return {"tax": await self.get_tax_by_coords(payload["latitude"], payload["longitude"], payload["sender_currency"])}
+        result = await self.get_taxes_by_coords(payload["latitude"], payload["longitude"], tax_currencies(payload))
+        return tax_response(result, payload)
+
+    async def get_tax(self, current_currency, desired_currency):
+        currencies = await self.get_exchanges(current_currency)
+        if not currencies:
+            raise CurrenciesNotFound("Não foi possível buscar moedas para o país com as coordenadas fornecidas")
+
+        if currencies.get(desired_currency):
+            return currencies[desired_currency]
+        return {}
+
+    async def get_conversion_by_country(self, sender_country, receiver_country, amount, as_of=None):
+        base_currency, desired_currency = await asyncio.gather(
+            self.find_currency(sender_country),
+            self.find_currency(receiver_country),
+        )
+        if not base_currency:
+            raise DesiredCurrencyNotFound("Moeda para país atual não encontrada")
+        if not desired_currency:
+            raise DesiredCurrencyNotFound("Moeda para país desejado não encontrada")
+
+        conversion = await self.get_conversion(base_currency["currency"], desired_currency["currency"], amount, as_of)
+        if not conversion:
+            raise TaxNotFound("Conversão para moeda desejada não encontrada")
+        return conversion
+
+    async def get_currency_by_coords(self, latitude, longitude):
+        current_country = await self.get_country(latitude, longitude)
+        if not current_country:
+            raise CountryNotFound("Não foi possível localizar o país com as coordenadas fornecidas")
+
+        return await self.find_currency(current_country)
+
+    async def get_currencies(self):
+        currencies = await AsyncCurrency.find()
+        for currency in currencies:
+            currency["_id"] = str(currency["_id"])
+        return currencies
+
+    async def get_currencies_response(self):
+        if currency_index.loaded:
+            return currencies_response.get(currency_index.generation, currencies_payload)
+        return fetched_currencies(await self.get_currencies())
+
+
+class AsyncBatchGeoController(AsyncGeoController):
+    """Versão em lote: chamadas idênticas dentro do lote compartilham a mesma
+    task, então cada país, moeda e tabela de câmbio é resolvido uma única vez."""
+
+    def __init__(self):
+        self._tasks = {}
+
+    def _shared(self, key, factory):
+        task = self._tasks.get(key)
+        if task is None:
+            task = self._tasks[key] = asyncio.ensure_future(factory())
+        return task
+
+    async def get_country(self, latitude, longitude):
+        return await self._shared(
+            ("country", geocode_key(latitude, longitude)),
+            lambda: AsyncGeoController.get_country(self, latitude, longitude),
+        )
+
+    async def get_exchanges(self, currency):
+        return await self._shared(("rates", currency), lambda: AsyncGeoController.get_exchanges(self, currency))
+
+    async def get_historical_rates(self, currency, as_of):
+        return await self._shared(("history", currency, as_of), lambda: AsyncGeoController.get_historical_rates(self, currency, as_of))
+
+    async def find_currency(self, country):
+        return await self._shared(("currency", country), lambda: AsyncGeoController.find_currency(self, country))
+
+
+class AsyncStreamConverter:
+    """Versão assíncrona do StreamConverter: cada bloco de linhas é convertido
+    em paralelo por um AsyncBatchGeoController, dentro de `chunk_budget()`
+    (um gerenciador de contexto assíncrono)."""
+
+    def __init__(self, chunk_size=500, chunk_budget=nullcontext):
+        self.chunk_size = chunk_size
+        self.chunk_budget = chunk_budget
+
+    async def convert(self, rows):
+        chunk = []
+        async for row in rows:
+            chunk.append(row)
+            if len(chunk) >= self.chunk_size:
+                for result in await self.convert_chunk(chunk):
+                    yield result
+                chunk = []
+        if chunk:
+            for result in await self.convert_chunk(chunk):
+                yield result
+
+    async def convert_chunk(self, chunk):
+        items = [(number, row, validate_row(row)) for number, row in chunk]
+        try:
+            async with self.chunk_budget():
+                controller = AsyncBatchGeoController()
+                results = await asyncio.gather(*(self.convert_item(controller, item) for _, _, item in items))
+        except ServiceOverloaded as e:
+            results = [error_result(e)] * len(items)
+        return [row_result(number, row, result) for (number, row, _), result in zip(items, results)]
+
+    async def convert_item(self, controller, item):
+        # Cada item roda em uma tarefa própria do gather, com cópia do contexto
+        quota.set_priority(quota.BATCH)
+        try:
+            if isinstance(item, ValidationError):
+                raise item
+            if "sender_country" in item:
+                result = await controller.get_conversion_by_country(item["sender_country"], item["receiver_country"], item["value"], item.get("as_of"))
+                if not result:
+                    raise DesiredCurrencyNotFound("Conversão não encontrada")
+            else:
+                result = await controller.get_conversion(item["sender_currency"], item["receiver_currency"], item["value"], item.get("as_of"))
+                if not result:
+                    raise TaxNotFound("Conversão não encontrada")
+            return {"status": 200, "result": result}
+        except Exception as e:
+            return error_result(e)
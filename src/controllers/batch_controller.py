@@ -0,0 +1,97 @@
+import contextvars
+from concurrent.futures import ThreadPoolExecutor
+from controllers.geoloc_controller import GeoController, geocode_key, rate_store
+
+
+class BatchGeoController(GeoController):
+    """GeoController que resolve cada país, moeda e tabela de câmbio uma única
+    vez por lote; os itens reutilizam os resultados (ou erros) memorizados."""
+
+    def __init__(self, max_workers=8):
+        self.max_workers = max_workers
+        self._results = {}
+
+    def _memoized(self, key, compute):
+        if key not in self._results:
+            try:
+                self._results[key] = (compute(), None)
+            except Exception as e:
+                self._results[key] = (None, e)
+        result, error = self._results[key]
+        if error is not None:
+            raise error
+        return result
+
+    def get_country(self, latitude, longitude):
+        return self._memoized(
+            ("country", geocode_key(latitude, longitude)),
+            lambda: GeoController.get_country(self, latitude, longitude),
+        )
+
+    def get_exchanges(self, currency):
+        return self._memoized(("rates", currency), lambda: GeoController.get_exchanges(self, currency))
+
+    def find_currency(self, country):
+        return self._memoized(("currency", country), lambda: GeoController.find_currency(self, country))
+
+    def get_historical_rates(self, currency, as_of):
+        return self._memoized(("history", currency, as_of), lambda: GeoController.get_historical_rates(self, currency, as_of))
+
+    def prefetch(self, method, calls):
+        """Executa em paralelo as chamadas distintas; erros ficam memorizados
+        e são relançados no item que depender deles. Cada chamada roda com uma
+        cópia do contexto da requisição (prazo e profile)."""
+        calls = list(dict.fromkeys(calls))
+        if not calls:
+            return
+
+        def call(item):
+            context, args = item
+            try:
+                context.run(method, *args)
+            except Exception:
+                pass
+
+        with ThreadPoolExecutor(max_workers=min(self.max_workers, len(calls))) as executor:
+            list(executor.map(call, [(contextvars.copy_context(), args) for args in calls]))
+
+    def prefetch_currencies(self, countries):
+        currencies = []
+        for country in dict.fromkeys(countries):
+            try:
+                currency = self.find_currency(country)
+            except Exception:
+                continue
+            if currency:
+                currencies.append(currency["currency"])
+        return currencies
+
+    def prepare_tax_by_coords(self, items):
+        coords = {}
+        for item in items:
+            try:
+                coords.setdefault(geocode_key(item["latitude"], item["longitude"]), (item["latitude"], item["longitude"]))
+            except ValueError:
+                continue
+        self.prefetch(self.get_country, coords.values())
+
+        countries = []
+        for latitude, longitude in coords.values():
+            try:
+                countries.append(self.get_country(latitude, longitude))
+            except Exception:
+                continue
+        currencies = self.prefetch_currencies(country for country in countries if country)
+        self.prefetch(self.get_exchanges, [(currency,) for currency in currencies])
+
+    def prepare_conversion(self, items):
+        self._prefetch_rates(item["sender_currency"] for item in items if item.get("as_of") is None)
+
+    def prepare_conversion_by_country(self, items):
+        self.prefetch_currencies(item["receiver_country"] for item in items)
+        self._prefetch_rates(self.prefetch_currencies(item["sender_country"] for item in items if item.get("as_of") is None))
+
+    def _prefetch_rates(self, currencies):
+        if rate_store.pivot and rate_store.get(rate_store.pivot):
+            return
+        self.prefetch(self.get_exchanges, [(currency,) for currency in currencies if not rate_store.get(currency)])
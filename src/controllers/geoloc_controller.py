@@ -1,61 +1,391 @@
 import logging
+import time
 import requests
+from pymongo.errors import PyMongoError
 from settings import settings
-from database.models import Currency
-from utils.exceptions import CountryNotFound, CurrenciesNotFound, DesiredCurrencyNotFound, ExchangeApiError, GoogleMapsApiError, TaxNotFound
+from database.models import Currency, currency_index, rate_history
+from utils.cache import create_cache, create_shared_cache
+from utils.geocoder import reverse_geocoder
+from utils.http_client import describe_error, exchange_client, google_client
+from utils.metrics import registry
+from utils import quota
+from utils.precomputed import PrecomputedCache
+from utils.rate_matrix import RateMatrixCache
+from utils.rates import RateStore, RateTable, currency_code
+from utils.refresher import RateRefresher
+from utils.singleflight import SingleFlight
+from utils.snapshot import WarmStart
+from utils.exceptions import CircuitOpenError, CountryNotFound, CurrenciesNotFound, DesiredCurrencyNotFound, ExchangeApiError, GoogleMapsApiError, ServiceOverloaded, TaxNotFound
 
 logger = logging.getLogger(__name__)
 logger.setLevel(logging.INFO)
 
+geocode_cache = create_cache("geocode", settings.GEOCODE_CACHE_SIZE, settings.GEOCODE_CACHE_TTL)
+# Com CACHE_BACKEND compartilhado, as tabelas de câmbio e as moedas buscadas
+# por um processo ficam disponíveis para os demais; em memória são None
+shared_rates = create_shared_cache("rates", 1024, settings.RATES_CACHE_TTL + settings.RATES_MAX_STALENESS)
+shared_currencies = create_shared_cache("currency", 1024, settings.CURRENCY_INDEX_POLL_INTERVAL)
+rate_store = RateStore(settings.RATES_PIVOT_CURRENCY, settings.RATES_CACHE_TTL)
+upstream_flights = SingleFlight()
+rate_matrix = RateMatrixCache(rate_store, settings.RATES_MAX_STALENESS)
+currencies_response = PrecomputedCache()
+fetched_currencies_response = PrecomputedCache()
+
+
+def cache_hit_ratio(stats):
+    lookups = stats["hits"] + stats["misses"]
+    return stats["hits"] / lookups if lookups else 0.0
+
+
+def register_flight_metrics(*flights):
+    def collect():
+        samples = {}
+        for group in flights:
+            for service, counters in group.stats().items():
+                for result, value in counters.items():
+                    samples[(service, result)] = samples.get((service, result), 0) + value
+        return samples
+
+    registry.callback(
+        "geoloc_upstream_flights_total",
+        "Chamadas aos serviços externos feitas (calls) e agrupadas em uma já em andamento (coalesced)",
+        "counter", ["service", "result"], collect,
+    )
+
+
+registry.callback(
+    "geoloc_geocode_cache_requests_total", "Consultas ao cache de países por resultado", "counter", ["result"],
+    lambda: {("hit",): geocode_cache.stats()["hits"], ("miss",): geocode_cache.stats()["misses"]},
+)
+registry.callback(
+    "geoloc_geocode_cache_evictions_total", "Entradas removidas do cache de países por falta de espaço", "counter", [],
+    lambda: {(): geocode_cache.stats()["evictions"]},
+)
+registry.callback(
+    "geoloc_geocode_cache_entries", "Entradas no cache de países", "gauge", [],
+    lambda: {(): len(geocode_cache)},
+)
+registry.callback(
+    "geoloc_geocode_cache_hit_ratio", "Fração das consultas ao cache de países atendidas pelo cache", "gauge", [],
+    lambda: {(): cache_hit_ratio(geocode_cache.stats())},
+)
+registry.callback(
+    "geoloc_rate_tables", "Tabelas de câmbio em memória", "gauge", [],
+    lambda: {(): len(rate_store.bases())},
+)
+register_flight_metrics(upstream_flights)
+
+
+def geocode_key(latitude, longitude):
+    precision = settings.GEOCODE_CACHE_PRECISION
+    return (round(float(latitude), precision), round(float(longitude), precision))
+
+
+def google_url(latitude, longitude):
+    return f"{settings.GOOGLE_MAPS_API}?latlng={latitude},{longitude}&key={settings.GOOGLE_API_KEY}"
+
+
+def exchange_url(currency):
+    return f"{settings.CURRENCY_API}/{settings.CURRENCY_API_KEY}/latest/{currency}"
+
+
+def load_shared_rate_table(currency):
+    """Traz para o rate_store a tabela gravada no cache compartilhado por
+    outro processo, quando ela é mais nova que a local; retorna a tabela se
+    estiver válida."""
+    if shared_rates is None:
+        return None
+    data = shared_rates.get(currency_code(currency))
+    if not data:
+        return None
+    table = RateTable.from_dict(data)
+    current = rate_store.peek(currency)
+    if current is None or current.fetched_at < table.fetched_at:
+        rate_store.put(table)
+    return rate_store.get(currency)
+
+
+def share_rate_table(table):
+    if shared_rates is not None:
+        ttl = max(0, rate_store.expires_at(table) - time.time()) + settings.RATES_MAX_STALENESS
+        shared_rates.set(table.base, table.to_dict(), ttl)
+    return table
+
+
+def record_rate_table(table):
+    rate_history.record(table)
+    return table
+
+
+def historical_rates(table, currency, as_of):
+    if table is None:
+        raise TaxNotFound(f"Não há taxas de {currency} registradas até {as_of.isoformat()}")
+    return table.rates
+
+
+def convert_rates(rates, amounts, desired_currencies=None):
+    targets = sorted(rates) if desired_currencies is None else desired_currencies
+    return {
+        currency: [amount * rates[currency_code(currency)] for amount in amounts] if currency_code(currency) in rates else None
+        for currency in targets
+    }
+
+
+def require_conversion(conversion):
+    """Resultado de /conversion/matrix; sem taxa para nenhuma das moedas
+    pedidas lança TaxNotFound, como a conversão de um único par."""
+    if not any(values is not None for values in conversion.values()):
+        raise TaxNotFound("Conversão não encontrada")
+    return conversion
+
+
+def tax_currencies(payload):
+    """Moedas pedidas em /tax_coords, com a `sender_currency` primeiro; None
+    quando todas as moedas da tabela foram pedidas."""
+    currencies = payload.get("currencies")
+    if currencies == "all":
+        return None
+    currencies = list(currencies or [])
+    if payload.get("sender_currency") and payload["sender_currency"] not in currencies:
+        currencies.insert(0, payload["sender_currency"])
+    return currencies
+
+
+def is_multi_tax(payload):
+    return payload.get("currencies") is not None or payload.get("response_fields") is not None
+
+
+def select_rates(rates, desired_currencies=None):
+    """Taxas pedidas (None para as ausentes da tabela); sem lista, todas."""
+    if desired_currencies is None:
+        return dict(rates)
+    selected = {currency: rates.get(currency) for currency in desired_currencies}
+    if not any(value is not None for value in selected.values()):
+        raise TaxNotFound("Conversão para moeda desejada não encontrada")
+    return selected
+
+
+def tax_response(result, payload):
+    response = dict(result)
+    if payload.get("sender_currency"):
+        response["tax"] = result["rates"].get(payload["sender_currency"])
+    if payload.get("response_fields"):
+        response = {field: response.get(field) for field in payload["response_fields"]}
+    return response
+
+
+def currencies_payload():
+    return {"result": currency_index.documents} if currency_index.documents else None
+
+
+def fetched_currencies(currencies):
+    """Resposta de /currencies para moedas lidas da coleção sem o índice; o
+    repr dos documentos serve de versão, então o corpo só é serializado e
+    comprimido de novo quando a coleção muda."""
+    return fetched_currencies_response.get(repr(currencies), lambda: {"result": currencies} if currencies else None)
+
+
+def parse_country(data):
+    country_code = None
+    if not data.get("results"):
+        return country_code
+    for address_component in data["results"][0]["address_components"]:
+        if "country" in address_component["types"]:
+            country_code = address_component["short_name"]
+    return country_code
+
+
+def local_country(latitude, longitude):
+    """País pela base local do geocoder: (True, país) quando a resposta é
+    final, (False, None) quando a coordenada deve ser consultada no Google."""
+    if settings.GEOCODER_MODE == "google" or not reverse_geocoder.loaded:
+        return False, None
+    country_code = reverse_geocoder.lookup(latitude, longitude)
+    if country_code or settings.GEOCODER_MODE == "local":
+        return True, country_code
+    logger.info(f"Coordenadas {latitude},{longitude} fora da base local, consultando o Google")
+    return False, None
+
+
+def geolocation_unavailable(e):
+    logger.error(f"Erro no serviço de geolocalização: {describe_error(e)}")
+    return GoogleMapsApiError("Geolocalização está indisponível")
+
+
+def google_country(response):
+    """País da resposta do Google; GoogleMapsApiError para respostas de erro."""
+    logger.info(f"Resposta do servidor de geolocalização: {response.status_code}")
+    if response.status_code != 200:
+        logger.error(f"Erro no serviço de geolocalização: {response.text}")
+        raise GoogleMapsApiError("Geolocalização está indisponível")
+    return parse_country(response.json())
+
+
+def exchange_unavailable(e):
+    logger.error(f"Erro no serviço de câmbio: {describe_error(e)}")
+    return ExchangeApiError("Taxas das moedas está indisponível")
+
+
+def exchange_rate_table(currency, response):
+    """Tabela de câmbio da resposta do serviço; ExchangeApiError para respostas de erro."""
+    logger.info(f"Resposta do servidor de câmbio: {response.status_code}")
+    if response.status_code != 200:
+        logger.error(f"Erro no serviço de câmbio: {response.text}")
+        raise ExchangeApiError("Taxas das moedas está indisponível")
+    return RateTable.from_response(currency, response.json())
+
+
+def history_unavailable(e):
+    logger.error(f"Erro ao consultar o histórico de câmbio: {str(e)}")
+    return ExchangeApiError("Histórico das taxas está indisponível")
+
+
+def cached_rate_table(currency):
+    """Tabela de câmbio sem chamar o serviço: (tabela, None) quando há uma
+    válida no cache local ou compartilhado, ou uma expirada com a atualização
+    já agendada na thread de segundo plano; senão (None, tabela expirada que
+    ainda pode ser servida se o serviço falhar)."""
+    table = rate_store.get(currency) or load_shared_rate_table(currency)
+    if table:
+        return table, None
+    stale = rate_store.get(currency, max_stale=settings.RATES_MAX_STALENESS)
+    if stale and rate_refresher.request_refresh(currency):
+        return stale, None
+    return None, stale
+
+
+def serve_stale(currency, stale):
+    logger.warning(f"Usando taxas expiradas de {currency} com o serviço de câmbio indisponível")
+    return stale
+
+
 class GeoController:
     def get_country(self, latitude, longitude):
-        url = f"{settings.GOOGLE_MAPS_API}?latlng={latitude},{longitude}&key={settings.GOOGLE_API_KEY}"
-        response = requests.get(url)
-        logger.info(f"Resposta do servidor de geolocalização: {response.status_code}")
-        if response.status_code != 200:
-            logger.error(f"Erro no serviço de geolocalização: {response.text}")
-            raise GoogleMapsApiError("Geolocalização está indisponível")
-        data = response.json()
-        for address_component in data["results"][0]["address_components"]:
-            if "country" in address_component["types"]:
-                country_code = address_component["short_name"]
+        key = geocode_key(latitude, longitude)
+        country_code = geocode_cache.get(key)
+        if country_code:
+            return country_code
+        country_code = self.resolve_country(latitude, longitude)
+        if country_code:
+            geocode_cache.set(key, country_code)
         return country_code
+
+    def resolve_country(self, latitude, longitude):
+        resolved, country_code = local_country(latitude, longitude)
+        if resolved:
+            return country_code
+        return upstream_flights.do(
+            ("google", geocode_key(latitude, longitude)),
+            lambda: self.get_country_from_google(latitude, longitude),
+        )
+
+    def get_country_from_google(self, latitude, longitude):
+        url = google_url(latitude, longitude)
+        try:
+            response = google_client.get(url)
+        except (requests.RequestException, CircuitOpenError) as e:
+            raise geolocation_unavailable(e)
+        return google_country(response)
     
     def get_exchanges(self, currency):
-        url = f"{settings.CURRENCY_API}/{settings.CURRENCY_API_KEY}/latest/{currency}"
-        response = requests.get(url)
-        logger.info(f"Resposta do servidor de câmbio: {response.status_code}")
-        if response.status_code != 200:
-            logger.error(f"Erro no serviço de câmbio: {response.text}")
-            raise ExchangeApiError("Taxas das moedas está indisponível")
-        data = response.json()
-        return data.get("conversion_rates", {})
+        return self.get_rate_table(currency).rates
+
+    def get_rate_table(self, currency):
+        table, stale = cached_rate_table(currency)
+        if table:
+            return table
+
+        try:
+            table = self.fetch_rate_table_coalesced(currency)
+        except (ExchangeApiError, ServiceOverloaded):
+            if stale:
+                return serve_stale(currency, stale)
+            raise
+        rate_store.put(table)
+        return table
+
+    def fetch_rate_table_coalesced(self, currency):
+        return upstream_flights.do(("exchange", currency), lambda: share_rate_table(record_rate_table(self.fetch_rate_table(currency))))
+
+    def fetch_rate_table(self, currency):
+        url = exchange_url(currency)
+        try:
+            response = exchange_client.get(url)
+        except (requests.RequestException, CircuitOpenError) as e:
+            raise exchange_unavailable(e)
+        return exchange_rate_table(currency, response)
     
-    def get_conversion(self, base_currency, desired_currency, amount):
-        url = f"{settings.CURRENCY_API}/{settings.CURRENCY_API_KEY}/pair/{base_currency}/{desired_currency}/{amount}"
-        response = requests.get(url)
-        logger.info(f"Resposta do servidor de câmbio: {response.status_code}")
-        if response.status_code != 200:
-            logger.error(f"Erro no serviço de câmbio: {response.text}")
-            raise ExchangeApiError("Taxas das moedas está indisponível")
-
-        data = response.json()
-        return data.get("conversion_result", {})
+    def get_historical_rates(self, currency, as_of):
+        """Taxas do snapshot em vigor em `as_of`, lidas apenas do histórico local."""
+        try:
+            table = rate_history.find(currency, as_of)
+        except PyMongoError as e:
+            raise history_unavailable(e)
+        return historical_rates(table, currency, as_of)
+
+    def get_conversion(self, base_currency, desired_currency, amount, as_of=None):
+        if as_of is not None:
+            rate = self.get_historical_rates(base_currency, as_of).get(desired_currency)
+        else:
+            rate = rate_store.rate(base_currency, desired_currency)
+            if rate is None:
+                rate = self.get_exchanges(base_currency).get(desired_currency)
+        if rate is None:
+            return {}
+        return amount * rate
     
-    def get_tax_by_coords(self, latitude, longitude, desired_currency):
+    def get_conversion_matrix(self, base_currency, amounts, desired_currencies=None, as_of=None):
+        base_currency = currency_code(base_currency)
+        if as_of is not None:
+            return require_conversion(convert_rates(self.get_historical_rates(base_currency, as_of), amounts, desired_currencies))
+        if not rate_store.get(base_currency) and not rate_store.get(rate_store.pivot):
+            self.get_rate_table(base_currency)
+        return require_conversion(rate_matrix.get().convert(base_currency, amounts, desired_currencies))
+    
+    def find_currency(self, country):
+        if shared_currencies is None or currency_index.loaded:
+            return Currency.find_by_country(country)
+        currency = shared_currencies.get(country)
+        if currency is None:
+            currency = Currency.find_by_country(country)
+            if currency:
+                shared_currencies.set(country, currency)
+        return currency
+    
+    def get_base_currency_by_coords(self, latitude, longitude):
         current_country = self.get_country(latitude, longitude)
         if not current_country:
             raise CountryNotFound("Não foi possível localizar o país com as coordenadas fornecidas")
 
-        base_currency = Currency.find_by_country(current_country)
+        base_currency = self.find_currency(current_country)
         if not base_currency:
             raise DesiredCurrencyNotFound("Moeda desejada não encontrada")
-        base_currency = base_currency["currency"]
+        return current_country, base_currency["currency"]
+
+    def get_tax_by_coords(self, latitude, longitude, desired_currency):
+        _, base_currency = self.get_base_currency_by_coords(latitude, longitude)
         tax = self.get_tax(base_currency, desired_currency)
         if not tax:
             raise TaxNotFound("Conversão para moeda desejada não encontrada")
 
         return tax
+
+    def get_taxes_by_coords(self, latitude, longitude, desired_currencies=None):
+        """Várias taxas com uma única geocodificação e uma única busca da
+        tabela de câmbio; sem `desired_currencies`, todas as moedas."""
+        country, base_currency = self.get_base_currency_by_coords(latitude, longitude)
+        currencies = self.get_exchanges(base_currency)
+        if not currencies:
+            raise CurrenciesNotFound("Não foi possível buscar moedas para o país com as coordenadas fornecidas")
+        return {"country": country, "base_currency": base_currency, "rates": select_rates(currencies, desired_currencies)}
+
+    def get_tax_response(self, payload):
+        """Resposta de /tax_coords: `{"tax": ...}` para uma moeda ou, com
+        `currencies`/`fields`, país, moeda base e as taxas pedidas."""
+        if not is_multi_tax(payload):
+            return {"tax": self.get_tax_by_coords(payload["latitude"], payload["longitude"], payload["sender_currency"])}
+        result = self.get_taxes_by_coords(payload["latitude"], payload["longitude"], tax_currencies(payload))
+        return tax_response(result, payload)
     
     def get_tax(self, current_currency, desired_currency):
         currencies = self.get_exchanges(current_currency)
@@ -66,19 +396,19 @@ class GeoController:
             return currencies[desired_currency]
         return {}
     
-    def get_conversion_by_country(self, sender_country, receiver_country, amount):
-        base_currency = Currency.find_by_country(sender_country)
+    def get_conversion_by_country(self, sender_country, receiver_country, amount, as_of=None):
+        base_currency = self.find_currency(sender_country)
         if not base_currency:
             raise DesiredCurrencyNotFound("Moeda para país atual não encontrada")
 
         base_currency = base_currency["currency"]
-        desired_currency = Currency.find_by_country(receiver_country)
+        desired_currency = self.find_currency(receiver_country)
 
         if not desired_currency:
             raise DesiredCurrencyNotFound("Moeda para país desejado não encontrada")
         
         desired_currency = desired_currency["currency"]
-        conversion = self.get_conversion(base_currency, desired_currency, amount)
+        conversion = self.get_conversion(base_currency, desired_currency, amount, as_of)
 
         if not conversion:
             raise TaxNotFound("Conversão para moeda desejada não encontrada")
@@ -89,11 +419,103 @@ class GeoController:
         if not current_country:
             raise CountryNotFound("Não foi possível localizar o país com as coordenadas fornecidas")
 
-        currency = Currency.find_by_country(current_country)
+        currency = self.find_currency(current_country)
         return currency
     
     def get_currencies(self):
         currencies = Currency.find()
         for currency in currencies:
             currency["_id"] = str(currency["_id"])
-        return currencies
\ No newline at end of file
+        return currencies
+
+    def get_currencies_response(self):
+        """Resposta de /currencies já serializada; com o índice de moedas
+        carregado ela é montada uma vez por versão da coleção."""
+        if currency_index.loaded:
+            return currencies_response.get(currency_index.generation, currencies_payload)
+        return fetched_currencies(self.get_currencies())
+
+
+def refresh_rate_table(currency):
+    """Busca do refresher, com a menor prioridade na cota do serviço de câmbio.
+    Usa a tabela que outro processo já gravou no cache compartilhado quando
+    ela ainda está fora da janela de antecedência, sem chamar o serviço."""
+    table = load_shared_rate_table(currency)
+    if table and rate_store.expires_at(table) > rate_store.timer() + settings.RATES_REFRESH_AHEAD:
+        return table
+    with quota.priority(quota.BACKGROUND):
+        return GeoController().fetch_rate_table_coalesced(currency)
+
+
+rate_refresher = RateRefresher(
+    rate_store,
+    refresh_rate_table,
+    Currency.find_currencies,
+    settings.RATES_REFRESH_INTERVAL,
+    settings.RATES_REFRESH_AHEAD,
+)
+
+
+def dump_geocode():
+    return [[list(key), value, ttl] for key, value, ttl in geocode_cache.items()]
+
+
+def restore_geocode(items, age):
+    entries = [
+        (tuple(key), value, None if ttl is None else ttl - age)
+        for key, value, ttl in items
+        if ttl is None or ttl > age
+    ]
+    geocode_cache.restore(entries)
+    return len(entries)
+
+
+def dump_rates():
+    return [table.to_dict() for table in rate_store.tables(max_stale=settings.RATES_MAX_STALENESS).values()]
+
+
+def restore_rates(tables, age):
+    """Restaura as tabelas ainda servíveis que forem mais novas que as já em memória."""
+    restored = 0
+    for data in tables:
+        table = RateTable.from_dict(data)
+        current = rate_store.peek(table.base)
+        if current is not None and current.fetched_at >= table.fetched_at:
+            continue
+        if rate_store.expires_at(table) + settings.RATES_MAX_STALENESS <= rate_store.timer():
+            continue
+        rate_store.put(table)
+        restored += 1
+    return restored
+
+
+def dump_quotas():
+    return {client.name: client.quota.dump() for client in (google_client, exchange_client)}
+
+
+def restore_quotas(quotas, age):
+    """Retoma o consumo mensal das cotas, para o processo novo não recomeçar do zero."""
+    restored = 0
+    for client in (google_client, exchange_client):
+        if client.name in quotas:
+            client.quota.restore(quotas[client.name])
+            restored += 1
+    return restored
+
+
+def dump_currencies():
+    return currency_index.documents if currency_index.loaded else []
+
+
+def restore_currencies(documents, age):
+    if not settings.CURRENCY_INDEX_ENABLED or currency_index.loaded or not documents:
+        return 0
+    currency_index.restore(documents)
+    return len(documents)
+
+
+warm_start = WarmStart(settings.SNAPSHOT_PATH, settings.SNAPSHOT_MAX_AGE, settings.SNAPSHOT_INTERVAL)
+warm_start.register("geocode", dump_geocode, restore_geocode)
+warm_start.register("rates", dump_rates, restore_rates)
+warm_start.register("currencies", dump_currencies, restore_currencies)
+warm_start.register("quotas", dump_quotas, restore_quotas)
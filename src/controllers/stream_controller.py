@@ -0,0 +1,94 @@
+from contextlib import nullcontext
+from marshmallow import EXCLUDE, ValidationError
+from controllers.batch_controller import BatchGeoController
+from schemas import ConversionCountrySchema, ConversionSchema
+from utils.exceptions import DesiredCurrencyNotFound, ExchangeApiError, ServiceOverloaded, TaxNotFound
+from utils.streaming import RowError, chunked
+
+STREAM_ERRORS = [(ExchangeApiError, 500), ((DesiredCurrencyNotFound, TaxNotFound), 404), (ServiceOverloaded, 503)]
+
+conversion_schema = ConversionSchema()
+conversion_country_schema = ConversionCountrySchema()
+
+
+def validate_row(row):
+    """Valida a linha pelo schema da conversão por moeda ou, quando ela traz
+    `sender_country`, da conversão por país; colunas extras são ignoradas."""
+    if isinstance(row, RowError):
+        return ValidationError(str(row))
+    schema = conversion_country_schema if "sender_country" in row else conversion_schema
+    try:
+        return schema.load(row, unknown=EXCLUDE)
+    except ValidationError as e:
+        return e
+
+
+def error_result(e):
+    if isinstance(e, ValidationError):
+        return {"status": 422, "message": str(e)}
+    status = next((status for types, status in STREAM_ERRORS if isinstance(e, types)), 400)
+    return {"status": status, "message": str(e)}
+
+
+def row_result(number, row, result):
+    prefix = {"row": number}
+    if isinstance(row, dict) and "id" in row:
+        prefix["id"] = row["id"]
+    return {**prefix, **result}
+
+
+def split_items(items):
+    by_currency = [item for item in items if "sender_currency" in item]
+    by_country = [item for item in items if "sender_country" in item]
+    return by_currency, by_country
+
+
+class StreamConverter:
+    """Converte um fluxo de linhas em blocos de `chunk_size`: cada bloco é
+    validado, tem as tabelas de câmbio e moedas resolvidas uma vez por um
+    BatchGeoController e é descartado antes do próximo, de modo que a memória
+    usada não depende do tamanho do arquivo. Cada bloco é convertido dentro
+    de `chunk_budget()` (ex.: prazo e vaga de admissão por bloco); se ele
+    recusar o bloco, as linhas do bloco recebem o erro."""
+
+    def __init__(self, chunk_size=500, max_workers=8, chunk_budget=nullcontext):
+        self.chunk_size = chunk_size
+        self.max_workers = max_workers
+        self.chunk_budget = chunk_budget
+
+    def convert(self, rows):
+        for chunk in chunked(rows, self.chunk_size):
+            yield from self.convert_chunk(chunk)
+
+    def convert_chunk(self, chunk):
+        items = [(number, row, validate_row(row)) for number, row in chunk]
+        try:
+            with self.chunk_budget():
+                results = self.convert_items(items)
+        except ServiceOverloaded as e:
+            results = [error_result(e)] * len(items)
+        for (number, row, _), result in zip(items, results):
+            yield row_result(number, row, result)
+
+    def convert_items(self, items):
+        controller = BatchGeoController(self.max_workers)
+        by_currency, by_country = split_items([item for _, _, item in items if not isinstance(item, ValidationError)])
+        controller.prepare_conversion(by_currency)
+        controller.prepare_conversion_by_country(by_country)
+        return [self.convert_item(controller, item) for _, _, item in items]
+
+    def convert_item(self, controller, item):
+        try:
+            if isinstance(item, ValidationError):
+                raise item
+            if "sender_country" in item:
+                result = controller.get_conversion_by_country(item["sender_country"], item["receiver_country"], item["value"], item.get("as_of"))
+                if not result:
+                    raise DesiredCurrencyNotFound("Conversão não encontrada")
+            else:
+                result = controller.get_conversion(item["sender_currency"], item["receiver_currency"], item["value"], item.get("as_of"))
+                if not result:
+                    raise TaxNotFound("Conversão não encontrada")
+            return {"status": 200, "result": result}
+        except Exception as e:
+            return error_result(e)
@@ -0,0 +1,66 @@
+import os
+from motor.motor_asyncio import AsyncIOMotorClient
+from settings import settings
+from database.models import currency_index, rate_history
+from database.rate_history import ORDER_COLLECTION, ORDER_ID
+from utils.deadline import bounded
+from utils.metrics import mongo_latency, timed
+
+_client = None
+_client_pid = None
+
+
+def get_database():
+    global _client, _client_pid
+    if _client is None or _client_pid != os.getpid():
+        _client_pid = os.getpid()
+        _client = AsyncIOMotorClient(
+            settings.MONGO_DATABASE_URI,
+            maxPoolSize=settings.MONGO_MAX_POOL_SIZE,
+            minPoolSize=settings.MONGO_MIN_POOL_SIZE,
+            waitQueueTimeoutMS=settings.MONGO_WAIT_QUEUE_TIMEOUT_MS,
+            serverSelectionTimeoutMS=settings.MONGO_SERVER_SELECTION_TIMEOUT_MS,
+        )
+    return _client.get_database(settings.MONGO_DATABASE_NAME)
+
+
+def close_client():
+    global _client
+    if _client is not None:
+        _client.close()
+        _client = None
+
+
+class AsyncCurrency:
+    @timed(mongo_latency, "find", span="currency.find")
+    @bounded
+    async def find():
+        return await get_database().currency.find({}).to_list(length=None)
+
+    async def find_by_country(country):
+        if currency_index.loaded:
+            return currency_index.find_by_country(country)
+        return await AsyncCurrency._find_one_by_country(country)
+
+    @timed(mongo_latency, "find_by_country", span="currency.find_by_country")
+    @bounded
+    async def _find_one_by_country(country):
+        result = await get_database().currency.find_one({"country_iso2": country})
+        if result:
+            result["_id"] = str(result["_id"])
+            return result
+        return {}
+
+
+class AsyncRateHistory:
+    @timed(mongo_latency, "find_rate_snapshot", span="rate_history.find_rate_snapshot")
+    @bounded
+    async def find(base, as_of):
+        database = get_database()
+        document = await database[rate_history.collection_name].find_one(rate_history.query(base, as_of), sort=rate_history.sort)
+        if document is None:
+            return None
+        if len(document["rates"]) // 8 > len(rate_history.order.currencies):
+            order = await database[ORDER_COLLECTION].find_one({"_id": ORDER_ID})
+            rate_history.order.update(order["currencies"] if order else [])
+        return rate_history.to_table(document)
@@ -0,0 +1,70 @@
+import csv
+import logging
+import time
+from pymongo import ASCENDING, UpdateOne
+from pymongo.errors import OperationFailure
+
+logger = logging.getLogger(__name__)
+logger.setLevel(logging.INFO)
+
+FIELDS = ("country_iso2", "currency", "country")
+
+
+def load_catalog(path):
+    """Lê o catálogo país (ISO 3166) -> moeda (ISO 4217) do arquivo CSV."""
+    with open(path, encoding="utf-8", newline="") as file:
+        rows = []
+        for row in csv.DictReader(file):
+            item = {field: (row.get(field) or "").strip() for field in FIELDS}
+            if not item["country_iso2"] or not item["currency"]:
+                raise ValueError(f"Linha inválida no catálogo de moedas: {row}")
+            item["country_iso2"] = item["country_iso2"].upper()
+            item["currency"] = item["currency"].upper()
+            rows.append(item)
+    return rows
+
+
+def ensure_indexes(collection):
+    """Cria, se ainda não existirem, o índice único por país e o índice por
+    moeda. Com países duplicados na coleção o índice único não é criado; a
+    sincronização do catálogo remove as duplicatas."""
+    collection.create_index([("currency", ASCENDING)], name="currency")
+    try:
+        collection.create_index([("country_iso2", ASCENDING)], name="country_iso2_unique", unique=True)
+    except OperationFailure as e:
+        logger.error(f"Índice único de country_iso2 não criado, existem países duplicados: {str(e)}")
+        return False
+    return True
+
+
+def remove_duplicates(collection):
+    """Mantém apenas o documento mais antigo de cada país; retorna quantos foram removidos."""
+    pipeline = [
+        {"$sort": {"_id": 1}},
+        {"$group": {"_id": "$country_iso2", "ids": {"$push": "$_id"}, "count": {"$sum": 1}}},
+        {"$match": {"count": {"$gt": 1}}},
+    ]
+    duplicated = [_id for group in collection.aggregate(pipeline) for _id in group["ids"][1:]]
+    if not duplicated:
+        return 0
+    return collection.delete_many({"_id": {"$in": duplicated}}).deleted_count
+
+
+def sync_catalog(collection, rows, batch_size=500, timer=time.perf_counter):
+    """Grava o catálogo com upserts por país em lotes de `bulk_write`, remove
+    duplicatas e garante os índices; retorna as contagens e a duração."""
+    started = timer()
+    stats = {"rows": len(rows), "matched": 0, "modified": 0, "upserted": 0}
+    stats["duplicates_removed"] = remove_duplicates(collection)
+    stats["unique_index"] = ensure_indexes(collection)
+    for position in range(0, len(rows), batch_size):
+        operations = [
+            UpdateOne({"country_iso2": row["country_iso2"]}, {"$set": row}, upsert=True)
+            for row in rows[position:position + batch_size]
+        ]
+        result = collection.bulk_write(operations, ordered=False)
+        stats["matched"] += result.matched_count
+        stats["modified"] += result.modified_count
+        stats["upserted"] += result.upserted_count
+    stats["elapsed"] = timer() - started
+    return stats
@@ -0,0 +1,109 @@
+import logging
+import threading
+from pymongo.errors import OperationFailure, PyMongoError
+
+logger = logging.getLogger(__name__)
+logger.setLevel(logging.INFO)
+
+
+class CurrencyIndex:
+    def __init__(self, get_collection, poll_interval=60):
+        self.get_collection = get_collection
+        self.poll_interval = poll_interval
+        self.by_country = {}
+        self.by_currency = {}
+        self.documents = []
+        self.version = None
+        self.generation = 0
+        self.loaded = False
+        self.watching = False
+        self._stop = threading.Event()
+        self._thread = None
+
+    def load(self, version=None):
+        documents = []
+        for item in self.get_collection().find({}):
+            item["_id"] = str(item["_id"])
+            documents.append(item)
+        self.restore(documents, version)
+        logger.info(f"Índice de moedas carregado com {len(self.by_country)} países")
+
+    def restore(self, documents, version=None):
+        """Monta o índice a partir de documentos já lidos (da coleção ou de um snapshot)."""
+        by_country = {}
+        by_currency = {}
+        for item in documents:
+            by_country.setdefault(item["country_iso2"], item)
+            by_currency.setdefault(item["currency"], []).append(item["country_iso2"])
+        self.by_country = by_country
+        self.by_currency = by_currency
+        self.documents = list(documents)
+        self.version = version
+        self.generation += 1
+        self.loaded = True
+
+    def find_by_country(self, country):
+        item = self.by_country.get(country)
+        return dict(item) if item else {}
+
+    def countries_by_currency(self, currency):
+        return list(self.by_currency.get(currency, []))
+
+    def start(self):
+        try:
+            self.load(self._collection_version())
+        except PyMongoError as e:
+            logger.error(f"Erro ao carregar o índice de moedas: {str(e)}")
+        if self._thread is None or not self._thread.is_alive():
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._run, name="currency-index", daemon=True)
+            self._thread.start()
+
+    def stop(self, timeout=None):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+        self._thread = None
+
+    def poll(self):
+        """Recarrega o índice quando a versão da coleção mudou; sem versão
+        disponível a coleção é recarregada a cada verificação."""
+        version = self._collection_version()
+        if self.loaded and version is not None and version == self.version:
+            return False
+        self.load(version)
+        return True
+
+    def _collection_version(self):
+        collection = self.get_collection()
+        try:
+            result = collection.database.command("dbHash", collections=[collection.name])
+            return result["collections"].get(collection.name)
+        except PyMongoError:
+            return None
+
+    def _run(self):
+        change_streams = True
+        while not self._stop.is_set():
+            try:
+                if change_streams:
+                    self._watch()
+                else:
+                    self.poll()
+            except OperationFailure as e:
+                logger.info(f"Change streams indisponíveis, usando verificação periódica: {str(e)}")
+                change_streams = False
+                continue
+            except PyMongoError as e:
+                logger.error(f"Erro ao atualizar o índice de moedas: {str(e)}")
+            finally:
+                self.watching = False
+            self._stop.wait(self.poll_interval)
+
+    def _watch(self):
+        with self.get_collection().watch(max_await_time_ms=1000) as stream:
+            self.watching = True
+            self.load()
+            while not self._stop.is_set() and stream.alive:
+                if stream.try_next() is not None:
+                    self.load()
@@ -1,10 +1,20 @@
+import logging
+import os
+import threading
 from pymongo import MongoClient
 from pymongo.collection import Collection
+from settings import settings
+
+logger = logging.getLogger(__name__)
+logger.setLevel(logging.INFO)
 
 
 class MongoDBManager:
     CONNECTIONS = {}
     CONNECTION_COUNT = 0
+    CHECKED_DB_NAMES = set()
+    _lock = threading.Lock()
+    _pid = os.getpid()
 
     def __init__(
         self,
@@ -14,18 +24,63 @@ class MongoDBManager:
         soft_delete: bool = True,
         **kwargs,
     ):
-        if mongodb_uri not in MongoDBManager.CONNECTIONS:
-            MongoDBManager.CONNECTIONS[mongodb_uri] = MongoClient(mongodb_uri, **kwargs)
-            MongoDBManager.CONNECTION_COUNT += 1
-        self.client = MongoDBManager.CONNECTIONS[mongodb_uri]
-        self._check_duplicated_db_name(db_name)
+        self.client = MongoDBManager.get_client(mongodb_uri, **kwargs)
+        self.db_name = db_name
         self.db = self.client.get_database(db_name)
         self.collection: Collection = self.db.get_collection(collection_name)
         self.soft_delete = soft_delete
 
-    def _check_duplicated_db_name(self, db_name):
+    @classmethod
+    def get_client(cls, mongodb_uri: str = None, **kwargs) -> MongoClient:
+        """Cliente compartilhado por processo. É criado sem conectar (connect=False)
+        e recriado após um fork, já que clientes do pymongo não são fork-safe."""
+        mongodb_uri = mongodb_uri or settings.MONGO_DATABASE_URI
+        with cls._lock:
+            if cls._pid != os.getpid():
+                cls.CONNECTIONS = {}
+                cls.CHECKED_DB_NAMES = set()
+                cls._pid = os.getpid()
+            if mongodb_uri not in cls.CONNECTIONS:
+                options = {
+                    "maxPoolSize": settings.MONGO_MAX_POOL_SIZE,
+                    "minPoolSize": settings.MONGO_MIN_POOL_SIZE,
+                    "waitQueueTimeoutMS": settings.MONGO_WAIT_QUEUE_TIMEOUT_MS,
+                    "serverSelectionTimeoutMS": settings.MONGO_SERVER_SELECTION_TIMEOUT_MS,
+                    "connect": False,
+                }
+                options.update(kwargs)
+                cls.CONNECTIONS[mongodb_uri] = MongoClient(mongodb_uri, **options)
+                cls.CONNECTION_COUNT += 1
+            return cls.CONNECTIONS[mongodb_uri]
+
+    @classmethod
+    def get_database(cls, db_name: str = None, mongodb_uri: str = None):
+        return cls.get_client(mongodb_uri).get_database(db_name or settings.MONGO_DATABASE_NAME)
+
+    @classmethod
+    def close_all(cls):
+        with cls._lock:
+            for client in cls.CONNECTIONS.values():
+                client.close()
+            cls.CONNECTIONS = {}
+
+    @classmethod
+    def ping(cls, mongodb_uri: str = None, db_name: str = None) -> bool:
+        try:
+            client = cls.get_client(mongodb_uri)
+            client.admin.command("ping")
+            cls(mongodb_uri or settings.MONGO_DATABASE_URI, db_name or settings.MONGO_DATABASE_NAME, "currency")._check_duplicated_db_name()
+        except Exception as e:
+            logger.error(f"MongoDB indisponível: {str(e)}")
+            return False
+        return True
+
+    def _check_duplicated_db_name(self):
+        if self.db_name in MongoDBManager.CHECKED_DB_NAMES:
+            return
         dbs = {o.lower(): o for o in self.client.list_database_names()}
-        if db_name.lower() in dbs and dbs[db_name.lower()] != db_name:
+        if self.db_name.lower() in dbs and dbs[self.db_name.lower()] != self.db_name:
             raise Exception(
-                f"""Current DB_NAME <{db_name}> duplicated with already existed DB_NAME: <{dbs[db_name.lower()]}>"""
-            )
\ No newline at end of file
+                f"""Current DB_NAME <{self.db_name}> duplicated with already existed DB_NAME: <{dbs[self.db_name.lower()]}>"""
+            )
+        MongoDBManager.CHECKED_DB_NAMES.add(self.db_name)
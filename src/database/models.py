@@ -1,10 +1,24 @@
-import pymongo
-
 from bson.objectid import ObjectId
+from pymongo import ReturnDocument
 from settings import settings
+from database.currency_index import CurrencyIndex
+from database.db import MongoDBManager
+from database.rate_history import RateHistory
+from utils.deadline import bounded
+from utils.metrics import mongo_latency, timed
+
+
+def get_db():
+    return MongoDBManager.get_database(settings.MONGO_DATABASE_NAME)
+
 
-db_client = pymongo.MongoClient(settings.MONGO_DATABASE_URI)
-db = db_client.get_database(settings.MONGO_DATABASE_NAME)
+currency_index = CurrencyIndex(lambda: get_db().currency, settings.CURRENCY_INDEX_POLL_INTERVAL)
+rate_history = RateHistory(
+    get_db,
+    settings.RATE_HISTORY_COLLECTION,
+    settings.RATE_HISTORY_GRANULARITY,
+    settings.RATE_HISTORY_RETENTION_DAYS,
+)
 
 class Currency:
     def __init__(self, currency, country_iso2, country):
@@ -12,29 +26,57 @@ class Currency:
         self.country_iso2 = country_iso2
         self.country = country
 
+    @timed(mongo_latency, "save", span="currency.save")
+    @bounded
     def save(self):
         currency = {
             "currency": self.currency,
             "country_iso2": self.country_iso2,
             "country": self.country
         }
-        result = db.currency.insert_one(currency)
-        return result.inserted_id
+        result = get_db().currency.find_one_and_update(
+            {"country_iso2": self.country_iso2},
+            {"$set": currency},
+            upsert=True,
+            return_document=ReturnDocument.AFTER,
+        )
+        return result["_id"]
     
+    @timed(mongo_latency, "find", span="currency.find")
+    @bounded
     def find():
         response = []
-        result = db.currency.find({})
+        result = get_db().currency.find({})
         for item in result:
             response.append(item)
         return response
     
+    def find_currencies():
+        if currency_index.loaded:
+            return list(currency_index.by_currency)
+        return Currency._distinct_currencies()
+
+    @timed(mongo_latency, "find_currencies", span="currency.find_currencies")
+    @bounded
+    def _distinct_currencies():
+        return get_db().currency.distinct("currency")
+    
+    @timed(mongo_latency, "find_by_id", span="currency.find_by_id")
+    @bounded
     def find_by_id(currency_id):
-        result = db.currency.find({"_id": ObjectId(currency_id)})
+        result = get_db().currency.find({"_id": ObjectId(currency_id)})
         currency = next(result, None)
         return currency
     
     def find_by_country(country):
-        result = db.currency.find_one({"country_iso2": country})
+        if currency_index.loaded:
+            return currency_index.find_by_country(country)
+        return Currency._find_one_by_country(country)
+
+    @timed(mongo_latency, "find_by_country", span="currency.find_by_country")
+    @bounded
+    def _find_one_by_country(country):
+        result = get_db().currency.find_one({"country_iso2": country})
         if result:
             result["_id"] = str(result["_id"])
             return result
@@ -0,0 +1,201 @@
+import logging
+import math
+import queue
+import struct
+import threading
+from datetime import datetime, timezone
+from bson.binary import Binary
+from pymongo import ASCENDING, DESCENDING, ReturnDocument
+from pymongo.errors import CollectionInvalid, PyMongoError
+from utils.deadline import bounded
+from utils.metrics import mongo_latency, timed
+from utils.rates import RateTable
+
+logger = logging.getLogger(__name__)
+logger.setLevel(logging.INFO)
+
+ORDER_COLLECTION = "rate_currency_order"
+ORDER_ID = "rates"
+
+
+def to_datetime(timestamp):
+    return datetime.fromtimestamp(timestamp, timezone.utc)
+
+
+def to_timestamp(value):
+    if value.tzinfo is None:
+        value = value.replace(tzinfo=timezone.utc)
+    return value.timestamp()
+
+
+class CurrencyOrder:
+    """Ordem das moedas compartilhada pelos snapshots. A lista no MongoDB só
+    cresce, então a posição de uma moeda nunca muda e snapshots antigos
+    continuam legíveis; se dois processos acrescentarem a mesma moeda, vale a
+    primeira posição."""
+
+    def __init__(self, get_collection):
+        self.get_collection = get_collection
+        self.currencies = []
+        self.positions = {}
+
+    def update(self, currencies):
+        positions = {}
+        for position, currency in enumerate(currencies):
+            positions.setdefault(currency, position)
+        self.currencies = list(currencies)
+        self.positions = positions
+
+    def load(self):
+        document = self.get_collection().find_one({"_id": ORDER_ID})
+        self.update(document["currencies"] if document else [])
+
+    def extend(self, currencies):
+        if all(currency in self.positions for currency in currencies):
+            return
+        self.load()
+        missing = sorted(currency for currency in currencies if currency not in self.positions)
+        if missing:
+            document = self.get_collection().find_one_and_update(
+                {"_id": ORDER_ID},
+                {"$push": {"currencies": {"$each": missing}}},
+                upsert=True,
+                return_document=ReturnDocument.AFTER,
+            )
+            self.update(document["currencies"])
+
+
+def pack_rates(rates, positions):
+    """Taxas como vetor de float64 little-endian na ordem compartilhada; NaN
+    onde a moeda não consta da tabela."""
+    size = max((positions[currency] for currency in rates), default=-1) + 1
+    values = [math.nan] * size
+    for currency, rate in rates.items():
+        values[positions[currency]] = rate
+    return Binary(struct.pack(f"<{size}d", *values))
+
+
+def unpack_rates(data, currencies):
+    values = struct.unpack(f"<{len(data) // 8}d", data)
+    return {currency: value for currency, value in zip(currencies, values) if not math.isnan(value)}
+
+
+class RateHistory:
+    """Histórico das tabelas de câmbio em uma coleção time-series do MongoDB:
+    um documento por moeda base e atualização do serviço de câmbio. A gravação
+    é feita por uma thread em segundo plano, fora do caminho das requisições;
+    a consulta pontual (`find`) usa o índice (base, timestamp)."""
+
+    sort = [("timestamp", DESCENDING)]
+
+    def __init__(self, get_db, collection_name="rate_snapshots", granularity="hours", retention_days=0, queue_size=1000):
+        self.get_db = get_db
+        self.collection_name = collection_name
+        self.granularity = granularity
+        self.retention_days = retention_days
+        self.order = CurrencyOrder(lambda: self.get_db()[ORDER_COLLECTION])
+        self._queue = queue.Queue(maxsize=queue_size)
+        self._recorded = {}
+        self._lock = threading.Lock()
+        self._thread = None
+
+    @property
+    def collection(self):
+        return self.get_db()[self.collection_name]
+
+    @property
+    def running(self):
+        return self._thread is not None and self._thread.is_alive()
+
+    def start(self):
+        if self.running:
+            return
+        self._thread = threading.Thread(target=self._run, name="rate-history", daemon=True)
+        self._thread.start()
+        logger.info("Gravação do histórico de câmbio iniciada")
+
+    def stop(self, timeout=None):
+        if self._thread is not None:
+            self._queue.put(None)
+            self._thread.join(timeout)
+        self._thread = None
+
+    def ensure_collection(self):
+        options = {"timeField": "timestamp", "metaField": "base", "granularity": self.granularity}
+        extra = {"expireAfterSeconds": self.retention_days * 86400} if self.retention_days else {}
+        try:
+            self.get_db().create_collection(self.collection_name, timeseries=options, **extra)
+        except CollectionInvalid:
+            pass
+        self.collection.create_index([("base", ASCENDING), ("timestamp", DESCENDING)])
+
+    def record(self, table):
+        """Agenda a gravação da tabela, uma vez por atualização do serviço de
+        câmbio; retorna False quando a gravação não está rodando ou a fila está
+        cheia."""
+        if not self.running:
+            return False
+        timestamp = self.timestamp(table)
+        with self._lock:
+            if self._recorded.get(table.base) == timestamp:
+                return False
+            self._recorded[table.base] = timestamp
+        try:
+            self._queue.put_nowait(table)
+        except queue.Full:
+            logger.warning(f"Fila do histórico de câmbio cheia, snapshot de {table.base} descartado")
+            return False
+        return True
+
+    def timestamp(self, table):
+        return table.updated_at or table.fetched_at
+
+    def save(self, table):
+        timestamp = to_datetime(self.timestamp(table))
+        if self.collection.find_one({"base": table.base, "timestamp": timestamp}, {"_id": 1}):
+            return False
+        self.order.extend(table.rates)
+        self.collection.insert_one({
+            "timestamp": timestamp,
+            "base": table.base,
+            "rates": pack_rates(table.rates, self.order.positions),
+            "fetched_at": to_datetime(table.fetched_at),
+        })
+        return True
+
+    def query(self, base, as_of):
+        return {"base": base, "timestamp": {"$lte": to_datetime(to_timestamp(as_of))}}
+
+    @timed(mongo_latency, "find_rate_snapshot", span="rate_history.find_rate_snapshot")
+    @bounded
+    def find(self, base, as_of):
+        """Snapshot em vigor em `as_of`: o mais recente com timestamp até essa data."""
+        document = self.collection.find_one(self.query(base, as_of), sort=self.sort)
+        if document is None:
+            return None
+        if len(document["rates"]) // 8 > len(self.order.currencies):
+            self.order.load()
+        return self.to_table(document)
+
+    def to_table(self, document):
+        timestamp = to_timestamp(document["timestamp"])
+        return RateTable(
+            document["base"],
+            unpack_rates(document["rates"], self.order.currencies),
+            fetched_at=to_timestamp(document.get("fetched_at", document["timestamp"])),
+            updated_at=timestamp,
+        )
+
+    def _run(self):
+        try:
+            self.ensure_collection()
+        except PyMongoError as e:
+            logger.error(f"Erro ao preparar a coleção do histórico de câmbio: {str(e)}")
+        while True:
+            table = self._queue.get()
+            if table is None:
+                return
+            try:
+                self.save(table)
+            except PyMongoError as e:
+                logger.error(f"Erro ao gravar o histórico de câmbio de {table.base}: {str(e)}")
@@ -0,0 +1,42 @@
+import multiprocessing
+import os
+from settings import settings
+
+chdir = os.path.dirname(os.path.abspath(__file__))
+wsgi_app = "wsgi:app"
+bind = settings.SERVER_BIND
+
+workers = settings.SERVER_WORKERS or multiprocessing.cpu_count() * 2 + 1
+# Sem backend compartilhado, cada worker fica com uma parte das cotas dos serviços externos
+raw_env = [f"GUNICORN_WORKERS={workers}"]
+threads = settings.SERVER_THREADS
+# /conversion/stream precisa de gthread: no worker sync, SERVER_TIMEOUT limita cada requisição
+worker_class = "gthread" if threads > 1 else "sync"
+
+timeout = settings.SERVER_TIMEOUT
+graceful_timeout = settings.SERVER_GRACEFUL_TIMEOUT
+keepalive = settings.SERVER_KEEPALIVE
+
+# Recicla cada worker após um número de requisições para limitar o uso de memória
+max_requests = settings.SERVER_MAX_REQUESTS
+max_requests_jitter = settings.SERVER_MAX_REQUESTS_JITTER
+
+# Com preload, a aplicação (e a base do geocoder) é carregada uma vez no master e
+# compartilhada pelos workers; sem preload, o SIGHUP recarrega também o código
+preload_app = settings.SERVER_PRELOAD
+
+accesslog = "-"
+errorlog = "-"
+
+
+def post_worker_init(worker):
+    from main import init_worker
+
+    init_worker()
+    worker.log.info(f"Worker {worker.pid} inicializado")
+
+
+def worker_exit(server, worker):
+    from main import shutdown_worker
+
+    shutdown_worker()
@@ -1,19 +1,90 @@
+import logging
 from flask import Flask
 from flask_cors import CORS
-from views.api import bp as views_bp
+from pymongo.errors import PyMongoError
+from views.api import ProfiledJSONProvider, bp as views_bp
 from settings import settings
+from controllers.geoloc_controller import rate_refresher, warm_start
+from database.currency_catalog import ensure_indexes
+from database.models import currency_index, get_db, rate_history
+from utils.http_client import exchange_client, google_client
+from utils.geocoder import reverse_geocoder
 
+logger = logging.getLogger(__name__)
+logger.setLevel(logging.INFO)
 
-def create_app():
+
+def init_services(background=True):
+    if settings.GEOCODER_MODE != "google" and not reverse_geocoder.loaded:
+        reverse_geocoder.load(settings.GEOCODER_BOUNDARIES_FILE)
+
+    if background:
+        start_background_services()
+
+
+def ensure_currency_indexes():
+    try:
+        ensure_indexes(get_db().currency)
+    except PyMongoError as e:
+        logger.error(f"Erro ao criar os índices da coleção currency: {str(e)}")
+
+
+def restore_snapshot():
+    if settings.SNAPSHOT_ENABLED:
+        warm_start.restore()
+
+
+def start_background_services():
+    if settings.CURRENCY_ENSURE_INDEXES:
+        ensure_currency_indexes()
+
+    if settings.SNAPSHOT_ENABLED:
+        warm_start.start()
+
+    if settings.CURRENCY_INDEX_ENABLED:
+        currency_index.start()
+
+    if settings.RATES_REFRESHER_ENABLED:
+        rate_refresher.start()
+
+    if settings.RATE_HISTORY_ENABLED:
+        rate_history.start()
+
+
+def init_worker():
+    """Inicialização de cada worker após o fork: recria os pools HTTP herdados
+    do processo master e inicia as threads de segundo plano, que não
+    sobrevivem ao fork. O cliente do MongoDB é recriado sozinho ao detectar o
+    novo PID."""
+    google_client.reset()
+    exchange_client.reset()
+    start_background_services()
+
+
+def shutdown_worker():
+    """Encerramento gracioso do worker: grava o snapshot para o próximo processo."""
+    if settings.SNAPSHOT_ENABLED:
+        warm_start.stop()
+
+
+def create_app(background=True):
+    """Cria a aplicação Flask. Com `background=False` as threads de segundo
+    plano não são iniciadas, para que o servidor de produção as inicie em cada
+    worker (`init_worker`) e não no processo master."""
     app = Flask(__name__)
 
     CORS(app, resources={r"/*": {"origins": "*"}})
 
     app.config.from_object(settings)
+    app.json = ProfiledJSONProvider(app)
     app.register_blueprint(views_bp)
 
+    restore_snapshot()
+    init_services(background)
+
     return app
 
 if __name__ == '__main__':
     app = create_app()
-    app.run(host='0.0.0.0', port=5020, debug=True, use_reloader=True)
+    debug = settings.ENVIROMENT == "dev"
+    app.run(host='0.0.0.0', port=5020, debug=debug, use_reloader=debug)
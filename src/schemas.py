@@ -1,19 +1,77 @@
-from marshmallow import Schema, fields
+from datetime import timezone
+from marshmallow import Schema, ValidationError, fields, validate, validates_schema
+from utils.profiling import span
 
 
-class CoordSchema(Schema):
-    latitude = fields.Str(required=True, error_messages={"required": "A latitude é obrigatória"})
-    longitude = fields.Str(required=True, error_messages={"required": "A longitude é obrigatória"})
+TAX_FIELDS = ("tax", "country", "base_currency", "rates")
+
+
+class BaseSchema(Schema):
+    def load(self, *args, **kwargs):
+        with span("validation"):
+            return super().load(*args, **kwargs)
+
+def coordinate(name, limit):
+    """Validador de coordenada recebida como texto: número finito entre -limit e limit."""
+
+    def validate_coordinate(value):
+        try:
+            number = float(value)
+        except ValueError:
+            raise ValidationError(f"A {name} deve ser um número")
+        if not -limit <= number <= limit:
+            raise ValidationError(f"A {name} deve estar entre -{limit} e {limit}")
+
+    return validate_coordinate
+
+class CoordSchema(BaseSchema):
+    latitude = fields.Str(required=True, validate=coordinate("latitude", 90), error_messages={"required": "A latitude é obrigatória"})
+    longitude = fields.Str(required=True, validate=coordinate("longitude", 180), error_messages={"required": "A longitude é obrigatória"})
+
+class CurrencySelection(fields.Field):
+    """Lista de códigos de moeda ou "all" para todas as moedas da tabela."""
+
+    def _deserialize(self, value, attr, data, **kwargs):
+        if value == "all":
+            return value
+        if isinstance(value, list) and value and all(isinstance(item, str) and item for item in value):
+            return list(dict.fromkeys(value))
+        raise ValidationError('Informe uma lista de moedas ou "all"')
 
 class TaxSchema(CoordSchema):
-    sender_currency = fields.Str(required=True, error_messages={"required": "A moeda desejada é obrigatória"})
+    sender_currency = fields.Str(load_default=None)
+    currencies = CurrencySelection(load_default=None)
+    response_fields = fields.List(
+        fields.Str(validate=validate.OneOf(TAX_FIELDS, error="Campo inválido, use um de: {choices}")),
+        data_key="fields",
+        load_default=None,
+        validate=validate.Length(min=1, error="Informe ao menos um campo"),
+    )
+
+    @validates_schema
+    def validate_currency(self, data, **kwargs):
+        if not data.get("sender_currency") and data.get("currencies") is None:
+            raise ValidationError("A moeda desejada é obrigatória", "sender_currency")
 
-class ConversionSchema(Schema):
+class ConversionSchema(BaseSchema):
     sender_currency = fields.Str(required=True, error_messages={"required": "A moeda base é obrigatória"})
     receiver_currency = fields.Str(required=True, error_messages={"required": "A moeda desejada é obrigatória"})
     value = fields.Float(required=True, error_messages={"required": "O valor a ser convertido é obrigatório"})
+    as_of = fields.AwareDateTime(load_default=None, default_timezone=timezone.utc, error_messages={"invalid": "A data deve estar no formato ISO 8601"})
 
-class ConversionCountrySchema(Schema):
+class ConversionCountrySchema(BaseSchema):
     sender_country = fields.Str(required=True, error_messages={"required": "O país base é obrigatório"})
     receiver_country = fields.Str(required=True, error_messages={"required": "O país é obrigatório"})
-    value = fields.Float(required=True, error_messages={"required": "O valor a ser convertido é obrigatório"})
\ No newline at end of file
+    value = fields.Float(required=True, error_messages={"required": "O valor a ser convertido é obrigatório"})
+    as_of = fields.AwareDateTime(load_default=None, default_timezone=timezone.utc, error_messages={"invalid": "A data deve estar no formato ISO 8601"})
+
+class ConversionMatrixSchema(BaseSchema):
+    sender_currency = fields.Str(required=True, error_messages={"required": "A moeda base é obrigatória"})
+    values = fields.List(
+        fields.Float(),
+        required=True,
+        validate=validate.Length(min=1, max=1000),
+        error_messages={"required": "Os valores a serem convertidos são obrigatórios"}
+    )
+    receiver_currencies = fields.List(fields.Str(), load_default=None)
+    as_of = fields.AwareDateTime(load_default=None, default_timezone=timezone.utc, error_messages={"invalid": "A data deve estar no formato ISO 8601"})
@@ -1,13 +1,126 @@
 import os
+import tempfile
 
 class Settings:
     def __init__(self):
         self.ENVIROMENT = os.getenv("ENVIROMENT", "dev")
+        self.SERVER_BIND = os.getenv("SERVER_BIND", "0.0.0.0:5020")
+        # 0: calculado pelos núcleos de CPU (2 * núcleos + 1)
+        self.SERVER_WORKERS = int(os.getenv("SERVER_WORKERS", "0"))
+        self.SERVER_THREADS = int(os.getenv("SERVER_THREADS", "1"))
+        self.SERVER_TIMEOUT = int(os.getenv("SERVER_TIMEOUT", "30"))
+        self.SERVER_GRACEFUL_TIMEOUT = int(os.getenv("SERVER_GRACEFUL_TIMEOUT", "30"))
+        self.SERVER_KEEPALIVE = int(os.getenv("SERVER_KEEPALIVE", "5"))
+        self.SERVER_MAX_REQUESTS = int(os.getenv("SERVER_MAX_REQUESTS", "10000"))
+        self.SERVER_MAX_REQUESTS_JITTER = int(os.getenv("SERVER_MAX_REQUESTS_JITTER", "1000"))
+        self.SERVER_PRELOAD = os.getenv("SERVER_PRELOAD", "false").lower() == "true"
         self.MONGO_DATABASE_URI = os.getenv("MONGO_DATABASE_URI", "mongodb://localhost:27017")
         self.MONGO_DATABASE_NAME = os.getenv("MONGO_DATABASE_NAME", "geoloc-dev")
+        self.MONGO_MAX_POOL_SIZE = int(os.getenv("MONGO_MAX_POOL_SIZE", "100"))
+        self.MONGO_MIN_POOL_SIZE = int(os.getenv("MONGO_MIN_POOL_SIZE", "0"))
+        self.MONGO_WAIT_QUEUE_TIMEOUT_MS = int(os.getenv("MONGO_WAIT_QUEUE_TIMEOUT_MS", "1000"))
+        self.MONGO_SERVER_SELECTION_TIMEOUT_MS = int(os.getenv("MONGO_SERVER_SELECTION_TIMEOUT_MS", "5000"))
         self.GOOGLE_MAPS_API = os.getenv("GOOGLE_MAPS_API", "https://maps.googleapis.com/maps/api/geocode/json")
         self.GOOGLE_API_KEY = os.getenv("GOOGLE_API_KEY", "api_key")
         self.CURRENCY_API = os.getenv("CURRENCY_API" ,"https://v6.exchangerate-api.com/v6")
         self.CURRENCY_API_KEY = os.getenv("CURRENCY_API_KEY", "api_key")
+        self.GOOGLE_CONNECT_TIMEOUT = float(os.getenv("GOOGLE_CONNECT_TIMEOUT", "2"))
+        self.GOOGLE_READ_TIMEOUT = float(os.getenv("GOOGLE_READ_TIMEOUT", "5"))
+        self.GOOGLE_RETRIES = int(os.getenv("GOOGLE_RETRIES", "2"))
+        self.GOOGLE_RETRY_BACKOFF = float(os.getenv("GOOGLE_RETRY_BACKOFF", "0.2"))
+        self.GOOGLE_POOL_SIZE = int(os.getenv("GOOGLE_POOL_SIZE", "10"))
+        self.CURRENCY_CONNECT_TIMEOUT = float(os.getenv("CURRENCY_CONNECT_TIMEOUT", "2"))
+        self.CURRENCY_READ_TIMEOUT = float(os.getenv("CURRENCY_READ_TIMEOUT", "5"))
+        self.CURRENCY_RETRIES = int(os.getenv("CURRENCY_RETRIES", "2"))
+        self.CURRENCY_RETRY_BACKOFF = float(os.getenv("CURRENCY_RETRY_BACKOFF", "0.2"))
+        self.CURRENCY_POOL_SIZE = int(os.getenv("CURRENCY_POOL_SIZE", "10"))
+        # Cotas dos serviços externos: chamadas por segundo, rajada (0: igual ao limite) e mensal (0: sem limite)
+        self.GOOGLE_RATE_LIMIT = float(os.getenv("GOOGLE_RATE_LIMIT", "50"))
+        self.GOOGLE_RATE_BURST = int(os.getenv("GOOGLE_RATE_BURST", "0"))
+        self.GOOGLE_MONTHLY_QUOTA = int(os.getenv("GOOGLE_MONTHLY_QUOTA", "0"))
+        self.CURRENCY_RATE_LIMIT = float(os.getenv("CURRENCY_RATE_LIMIT", "0"))
+        self.CURRENCY_RATE_BURST = int(os.getenv("CURRENCY_RATE_BURST", "0"))
+        self.CURRENCY_MONTHLY_QUOTA = int(os.getenv("CURRENCY_MONTHLY_QUOTA", "0"))
+        # Fração final do bucket e da cota mensal reservada às requisições interativas
+        self.QUOTA_RESERVE = float(os.getenv("QUOTA_RESERVE", "0.2"))
+        self.QUOTA_MAX_WAIT = float(os.getenv("QUOTA_MAX_WAIT", "2"))
+        # Processos que dividem as cotas com o CACHE_BACKEND em memória (0: os workers do gunicorn)
+        self.QUOTA_PROCESSES = int(os.getenv("QUOTA_PROCESSES", "0"))
+        self.ASYNC_MAX_CONNECTIONS = int(os.getenv("ASYNC_MAX_CONNECTIONS", "200"))
+        self.UPSTREAM_BREAKER_ENABLED = os.getenv("UPSTREAM_BREAKER_ENABLED", "true").lower() == "true"
+        self.UPSTREAM_BREAKER_FAILURE_RATE = float(os.getenv("UPSTREAM_BREAKER_FAILURE_RATE", "0.5"))
+        self.UPSTREAM_BREAKER_WINDOW = int(os.getenv("UPSTREAM_BREAKER_WINDOW", "20"))
+        self.UPSTREAM_BREAKER_MIN_CALLS = int(os.getenv("UPSTREAM_BREAKER_MIN_CALLS", "10"))
+        self.UPSTREAM_BREAKER_COOLDOWN = float(os.getenv("UPSTREAM_BREAKER_COOLDOWN", "30"))
+        self.UPSTREAM_HEDGE_ENABLED = os.getenv("UPSTREAM_HEDGE_ENABLED", "false").lower() == "true"
+        self.UPSTREAM_HEDGE_PERCENTILE = float(os.getenv("UPSTREAM_HEDGE_PERCENTILE", "0.95"))
+        self.UPSTREAM_HEDGE_MIN_SAMPLES = int(os.getenv("UPSTREAM_HEDGE_MIN_SAMPLES", "20"))
+        self.UPSTREAM_HEDGE_MIN_DELAY = float(os.getenv("UPSTREAM_HEDGE_MIN_DELAY", "0.05"))
+        # "hybrid": local com fallback no Google, "local": apenas local, "google": apenas Google
+        self.GEOCODER_MODE = os.getenv("GEOCODER_MODE", "hybrid")
+        self.GEOCODER_BOUNDARIES_FILE = os.getenv(
+            "GEOCODER_BOUNDARIES_FILE", os.path.join(os.path.dirname(__file__), "data", "countries.geojson")
+        )
+        self.GEOCODER_BORDER_MARGIN = float(os.getenv("GEOCODER_BORDER_MARGIN", "0.2"))
+        self.GEOCODER_GRID_CELL_SIZE = float(os.getenv("GEOCODER_GRID_CELL_SIZE", "5"))
+        # "memory": apenas em memória, "sqlite": compartilhado no host, "redis": compartilhado em rede
+        self.CACHE_BACKEND = os.getenv("CACHE_BACKEND", "memory")
+        self.CACHE_SQLITE_PATH = os.getenv("CACHE_SQLITE_PATH", os.path.join(tempfile.gettempdir(), "geoloc-cache.sqlite3"))
+        self.PROFILING_ENABLED = os.getenv("PROFILING_ENABLED", "false").lower() == "true"
+        self.PROFILING_DIR = os.getenv("PROFILING_DIR", os.path.join(tempfile.gettempdir(), "geoloc-profiles"))
+        self.PROFILING_SAMPLE_RATE = float(os.getenv("PROFILING_SAMPLE_RATE", "0"))
+        self.PROFILING_SECRET = os.getenv("PROFILING_SECRET", "")
+        self.PROFILING_HEADER = os.getenv("PROFILING_HEADER", "X-Profile")
+        # Opções das requisições amostradas: cprofile, tracemalloc (separadas por vírgula)
+        self.PROFILING_OPTIONS = os.getenv("PROFILING_OPTIONS", "")
+        self.SNAPSHOT_ENABLED = os.getenv("SNAPSHOT_ENABLED", "true").lower() == "true"
+        self.SNAPSHOT_PATH = os.getenv("SNAPSHOT_PATH", os.path.join(tempfile.gettempdir(), "geoloc-snapshot.bin"))
+        self.SNAPSHOT_INTERVAL = int(os.getenv("SNAPSHOT_INTERVAL", "300"))
+        self.SNAPSHOT_MAX_AGE = int(os.getenv("SNAPSHOT_MAX_AGE", "86400"))
+        self.CACHE_REDIS_URL = os.getenv("CACHE_REDIS_URL", "redis://localhost:6379/0")
+        self.GEOCODE_CACHE_PRECISION = int(os.getenv("GEOCODE_CACHE_PRECISION", "3"))
+        self.GEOCODE_CACHE_SIZE = int(os.getenv("GEOCODE_CACHE_SIZE", "10000"))
+        self.GEOCODE_CACHE_TTL = int(os.getenv("GEOCODE_CACHE_TTL", "86400"))
+        self.RATES_PIVOT_CURRENCY = os.getenv("RATES_PIVOT_CURRENCY", "USD")
+        self.RATES_CACHE_TTL = int(os.getenv("RATES_CACHE_TTL", "3600"))
+        self.RATES_REFRESHER_ENABLED = os.getenv("RATES_REFRESHER_ENABLED", "true").lower() == "true"
+        self.RATES_REFRESH_INTERVAL = int(os.getenv("RATES_REFRESH_INTERVAL", "60"))
+        self.RATES_REFRESH_AHEAD = int(os.getenv("RATES_REFRESH_AHEAD", "300"))
+        self.RATES_MAX_STALENESS = int(os.getenv("RATES_MAX_STALENESS", "86400"))
+        self.RATE_HISTORY_ENABLED = os.getenv("RATE_HISTORY_ENABLED", "true").lower() == "true"
+        self.RATE_HISTORY_COLLECTION = os.getenv("RATE_HISTORY_COLLECTION", "rate_snapshots")
+        self.RATE_HISTORY_GRANULARITY = os.getenv("RATE_HISTORY_GRANULARITY", "hours")
+        # 0: mantém os snapshots indefinidamente
+        self.RATE_HISTORY_RETENTION_DAYS = int(os.getenv("RATE_HISTORY_RETENTION_DAYS", "0"))
+        self.CURRENCY_CATALOG_FILE = os.getenv(
+            "CURRENCY_CATALOG_FILE", os.path.join(os.path.dirname(__file__), "data", "currencies.csv")
+        )
+        self.CURRENCY_CATALOG_BATCH_SIZE = int(os.getenv("CURRENCY_CATALOG_BATCH_SIZE", "500"))
+        self.CURRENCY_ENSURE_INDEXES = os.getenv("CURRENCY_ENSURE_INDEXES", "true").lower() == "true"
+        self.CURRENCY_INDEX_ENABLED = os.getenv("CURRENCY_INDEX_ENABLED", "true").lower() == "true"
+        self.CURRENCY_INDEX_POLL_INTERVAL = int(os.getenv("CURRENCY_INDEX_POLL_INTERVAL", "60"))
+        self.CURRENCIES_CACHE_MAX_AGE = int(os.getenv("CURRENCIES_CACHE_MAX_AGE", "300"))
+        self.BATCH_MAX_ITEMS = int(os.getenv("BATCH_MAX_ITEMS", "1000"))
+        self.BATCH_MAX_WORKERS = int(os.getenv("BATCH_MAX_WORKERS", "8"))
+        self.STREAM_CHUNK_SIZE = int(os.getenv("STREAM_CHUNK_SIZE", "500"))
+        # Prazo de cada bloco da conversão em fluxo, em segundos; o fluxo inteiro não tem prazo
+        self.STREAM_CHUNK_TIMEOUT = float(os.getenv("STREAM_CHUNK_TIMEOUT", "25"))
+        # Prazo padrão das requisições, em segundos; o cliente pode reduzi-lo pelo header (em milissegundos)
+        self.REQUEST_TIMEOUT = float(os.getenv("REQUEST_TIMEOUT", "10"))
+        self.REQUEST_TIMEOUT_HEADER = os.getenv("REQUEST_TIMEOUT_HEADER", "X-Request-Timeout")
+        # Prazos por rota: /rota=segundos, separados por vírgula
+        self.REQUEST_ROUTE_TIMEOUTS = os.getenv(
+            "REQUEST_ROUTE_TIMEOUTS", "/tax_coords/batch=25,/conversion/batch=25,/conversion_by_country/batch=25"
+        )
+        self.REQUEST_MIN_BUDGET = float(os.getenv("REQUEST_MIN_BUDGET", "0.05"))
+        self.ADMISSION_ENABLED = os.getenv("ADMISSION_ENABLED", "true").lower() == "true"
+        self.ADMISSION_CONCURRENCY = int(os.getenv("ADMISSION_CONCURRENCY", "32"))
+        self.ADMISSION_QUEUE_SIZE = int(os.getenv("ADMISSION_QUEUE_SIZE", "64"))
+        self.ADMISSION_QUEUE_TIMEOUT = float(os.getenv("ADMISSION_QUEUE_TIMEOUT", "1"))
+        # Limites por rota: /rota=concorrência[:fila], separados por vírgula
+        self.ADMISSION_ROUTE_LIMITS = os.getenv(
+            "ADMISSION_ROUTE_LIMITS", "/tax_coords/batch=4,/conversion/batch=4,/conversion_by_country/batch=4,/conversion/stream=2"
+        )
+        self.ADMISSION_RETRY_AFTER = int(os.getenv("ADMISSION_RETRY_AFTER", "1"))
 
 settings = Settings()
@@ -0,0 +1,26 @@
+import argparse
+import json
+import logging
+from database.currency_catalog import load_catalog, sync_catalog
+from database.models import get_db
+from settings import settings
+
+logger = logging.getLogger(__name__)
+logger.setLevel(logging.INFO)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Sincroniza a coleção currency com o catálogo país -> moeda")
+    parser.add_argument("--file", default=settings.CURRENCY_CATALOG_FILE, help="Arquivo CSV do catálogo")
+    parser.add_argument("--batch-size", type=int, default=settings.CURRENCY_CATALOG_BATCH_SIZE, help="Operações por bulk_write")
+    args = parser.parse_args(argv)
+
+    stats = sync_catalog(get_db().currency, load_catalog(args.file), args.batch_size)
+    logger.info(f"Catálogo de moedas sincronizado em {stats['elapsed']:.3f}s")
+    print(json.dumps(stats, indent=2))
+    return stats
+
+
+if __name__ == "__main__":
+    logging.basicConfig()
+    main()
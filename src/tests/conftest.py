@@ -1,6 +1,13 @@
+import os
 import pytest
 from flask import Flask
 from pymongo import MongoClient
+
+os.environ.setdefault("RATES_REFRESHER_ENABLED", "false")
+os.environ.setdefault("RATE_HISTORY_ENABLED", "false")
+os.environ.setdefault("CURRENCY_ENSURE_INDEXES", "false")
+os.environ.setdefault("SNAPSHOT_ENABLED", "false")
+
 from main import create_app
 from settings import settings
 
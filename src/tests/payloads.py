@@ -19,4 +19,38 @@ payload_conversion_by_country = {
 payload_coords = {
     "latitude": "-16.005031",
     "longitude": "-48.052034"
-}
\ No newline at end of file
+}
+
+payload_tax_batch = [
+    payload_tax,
+    payload_tax,
+    {
+        "sender_currency": "EUR",
+        "latitude": "-16.005031",
+        "longitude": "-48.052034"
+    },
+    {
+        "latitude": "-16.005031",
+        "longitude": "-48.052034"
+    }
+]
+
+payload_conversion_batch = [
+    payload_conversion,
+    {
+        "sender_currency": "BRL",
+        "receiver_currency": "USD",
+        "value": 10.00
+    }
+]
+
+payload_conversion_by_country_batch = [
+    payload_conversion_by_country,
+    payload_conversion_by_country
+]
+
+payload_conversion_matrix = {
+    "sender_currency": "BRL",
+    "values": [10.00, 20.00],
+    "receiver_currencies": ["USD", "EUR"]
+}
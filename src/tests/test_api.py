@@ -1,7 +1,14 @@
 from copy import deepcopy
 import json
-from utils.exceptions import ExchangeApiError, GoogleMapsApiError
+import time
+from controllers.geoloc_controller import rate_store
+from utils.admission import Admission
+from utils import deadline, quota
+from utils.exceptions import DeadlineExceeded, ExchangeApiError, GoogleMapsApiError, QuotaExceeded
+from utils.precomputed import PrecomputedResponse
+from utils.rates import RateTable
 from tests.payloads import payload_tax, payload_conversion, payload_conversion_by_country, payload_coords
+from tests.payloads import payload_tax_batch, payload_conversion_batch, payload_conversion_by_country_batch, payload_conversion_matrix
 
 
 
@@ -125,6 +132,20 @@ def test_tax_coords_invalid_payload(client):
     assert response.json == {"status": 422, "message": "{'sender_currency': ['A moeda desejada é obrigatória']}"}
 
 
+def test_tax_coords_invalid_coordinates(client):
+    """Testa que coordenadas que não são números válidos são recusadas na validação."""
+
+    payload_tax_invalid = deepcopy(payload_tax)
+    payload_tax_invalid["latitude"] = "abc"
+    payload_tax_invalid["longitude"] = "200"
+
+    response = client.post("/tax_coords", json=payload_tax_invalid)
+
+    assert response.status_code == 422
+    assert "'latitude': ['A latitude deve ser um número']" in response.json["message"]
+    assert "'longitude': ['A longitude deve estar entre -180 e 180']" in response.json["message"]
+
+
 def test_tax_coords_generic_error(client, mocker):
     """Testa o endpoint de buscar taxa de câmbio com erro generico."""
 
@@ -136,6 +157,69 @@ def test_tax_coords_generic_error(client, mocker):
 
     assert response.status_code == 400
 
+def test_tax_coords_multiple_currencies(client, mocker):
+    """Testa o endpoint de taxas com várias moedas usando uma única geocodificação e busca de câmbio."""
+
+    mock_google_coords = mocker.patch("controllers.geoloc_controller.GeoController.get_country", return_value="BR")
+    mocker.patch("database.models.Currency.find_by_country", return_value={"currency": "BRL"})
+    mock_exchange = mocker.patch(
+        "controllers.geoloc_controller.GeoController.get_exchanges", return_value={"USD": 0.2, "EUR": 0.18, "JPY": 29.5}
+    )
+
+    response = client.post("/tax_coords", json={**payload_tax, "currencies": ["EUR", "GBP"]})
+
+    assert response.status_code == 200
+    assert response.json == {
+        "country": "BR",
+        "base_currency": "BRL",
+        "rates": {"USD": 0.2, "EUR": 0.18, "GBP": None},
+        "tax": 0.2,
+    }
+    assert mock_google_coords.call_count == 1
+    assert mock_exchange.call_count == 1
+
+
+def test_tax_coords_all_currencies_with_fields(client, mocker):
+    """Testa o endpoint de taxas com todas as moedas e seleção de campos."""
+
+    mocker.patch("controllers.geoloc_controller.GeoController.get_country", return_value="BR")
+    mocker.patch("database.models.Currency.find_by_country", return_value={"currency": "BRL"})
+    mocker.patch("controllers.geoloc_controller.GeoController.get_exchanges", return_value={"USD": 0.2, "EUR": 0.18})
+
+    payload = {"latitude": payload_tax["latitude"], "longitude": payload_tax["longitude"], "currencies": "all", "fields": ["base_currency", "rates"]}
+    response = client.post("/tax_coords", json=payload)
+
+    assert response.status_code == 200
+    assert response.json == {"base_currency": "BRL", "rates": {"USD": 0.2, "EUR": 0.18}}
+
+
+def test_tax_coords_multiple_currencies_not_found(client, mocker):
+    """Testa o endpoint de taxas com várias moedas quando nenhuma existe na tabela."""
+
+    mocker.patch("controllers.geoloc_controller.GeoController.get_country", return_value="BR")
+    mocker.patch("database.models.Currency.find_by_country", return_value={"currency": "BRL"})
+    mocker.patch("controllers.geoloc_controller.GeoController.get_exchanges", return_value={"USD": 0.2})
+
+    response = client.post("/tax_coords", json={**payload_tax, "sender_currency": "XXX", "currencies": ["YYY"]})
+
+    assert response.status_code == 404
+    assert response.json == {"status": 404, "message": "Conversão para moeda desejada não encontrada"}
+
+
+def test_tax_coords_invalid_currencies(client):
+    """Testa o endpoint de taxas com lista de moedas e campos inválidos."""
+
+    response = client.post("/tax_coords", json={**payload_tax, "currencies": "EUR"})
+
+    assert response.status_code == 422
+    assert response.json == {"status": 422, "message": "{'currencies': ['Informe uma lista de moedas ou \"all\"']}"}
+
+    response = client.post("/tax_coords", json={**payload_tax, "fields": ["currency"]})
+
+    assert response.status_code == 422
+    assert "fields" in response.json["message"]
+
+
 def test_get_currencies(client, mocker):
     """Testa o endpoint de buscar moedas com sucesso."""
 
@@ -144,12 +228,29 @@ def test_get_currencies(client, mocker):
     assert response.status_code == 200
 
 
+def test_get_currencies_etag(client, mocker):
+    """Testa o ETag e o 304 do endpoint de buscar moedas."""
+
+    mocker.patch(
+        "controllers.geoloc_controller.GeoController.get_currencies_response",
+        return_value=PrecomputedResponse({"result": [{"currency": "BRL", "country_iso2": "BR"}]}),
+    )
+
+    response = client.get("/currencies")
+    not_modified = client.get("/currencies", headers={"If-None-Match": response.headers["ETag"]})
+
+    assert response.status_code == 200
+    assert response.json == {"result": [{"currency": "BRL", "country_iso2": "BR"}]}
+    assert response.headers["Cache-Control"].startswith("public")
+    assert not_modified.status_code == 304
+
+
 def test_get_currencies_not_found(client, mocker):
     """Testa o endpoint de buscar moedas com moedas não encontradas."""
 
-    mock_currencies = mocker.patch("controllers.geoloc_controller.GeoController.get_currencies")
+    mock_currencies = mocker.patch("controllers.geoloc_controller.GeoController.get_currencies_response")
     
-    mock_currencies.return_value = {}
+    mock_currencies.return_value = None
 
     response = client.get("/currencies")
 
@@ -161,7 +262,7 @@ def test_get_currencies_generic_error(client, mocker):
     """Testa o endpoint de buscar moedas com erro generico."""
 
     mocker.patch(
-        "controllers.geoloc_controller.GeoController.get_currencies", side_effect=Exception("Erro generico")
+        "controllers.geoloc_controller.GeoController.get_currencies_response", side_effect=Exception("Erro generico")
     )
 
     response = client.get("/currencies")
@@ -359,3 +460,301 @@ def test_currency_by_coords_currency_not_found(client, mocker):
 
     assert response.status_code == 404
     assert response.json == {"status": 404, "message": "Não foi possível localizar o país com as coordenadas fornecidas"}
+
+
+def test_tax_coords_batch_success(client, mocker):
+    """Testa o endpoint de taxas em lote resolvendo país e câmbio uma única vez."""
+
+    mock_google_coords = mocker.patch("controllers.geoloc_controller.GeoController.get_country")
+    
+    mock_google_coords.return_value = "BR"
+
+    mocker.patch("database.models.Currency.find_by_country", return_value={"currency": "BRL"})
+
+    mock_exchange = mocker.patch("controllers.geoloc_controller.GeoController.get_exchanges")
+
+    mock_exchange.return_value = {"USD": 0.2}
+
+    response = client.post("/tax_coords/batch", json=payload_tax_batch)
+
+    assert response.status_code == 200
+    assert response.json["results"] == [
+        {"status": 200, "tax": 0.2},
+        {"status": 200, "tax": 0.2},
+        {"status": 404, "message": "Conversão para moeda desejada não encontrada"},
+        {"status": 422, "message": "{'sender_currency': ['A moeda desejada é obrigatória']}"},
+    ]
+    assert mock_google_coords.call_count == 1
+    assert mock_exchange.call_count == 1
+
+
+def test_tax_coords_batch_google_error(client, mocker):
+    """Testa o endpoint de taxas em lote com erro na api da localização."""
+
+    mock_google_coords = mocker.patch(
+        "controllers.geoloc_controller.GeoController.get_country", side_effect=GoogleMapsApiError("Geolocalização está indisponível")
+    )
+
+    response = client.post("/tax_coords/batch", json=payload_tax_batch[:2])
+
+    assert response.status_code == 200
+    assert response.json["results"] == [{"status": 500, "message": "Geolocalização está indisponível"}] * 2
+    assert mock_google_coords.call_count == 1
+
+
+def test_tax_coords_batch_invalid_payload(client):
+    """Testa o endpoint de taxas em lote com payload que não é uma lista."""
+
+    response = client.post("/tax_coords/batch", json=payload_tax)
+
+    assert response.status_code == 422
+    assert response.json == {"status": 422, "message": "O lote deve ser uma lista de itens"}
+
+
+def test_conversion_batch_success(client, mocker):
+    """Testa o endpoint de conversão em lote."""
+
+    mock_conversion = mocker.patch("controllers.geoloc_controller.GeoController.get_conversion")
+    
+    mock_conversion.side_effect = [20.0, {}]
+
+    response = client.post("/conversion/batch", json=payload_conversion_batch)
+
+    assert response.status_code == 200
+    assert response.json["results"] == [
+        {"status": 200, "result": 20.0},
+        {"status": 404, "message": "Conversão não encontrada"},
+    ]
+
+
+def test_conversion_by_country_batch_success(client, mocker):
+    """Testa o endpoint de conversão por país em lote consultando cada país uma única vez."""
+
+    mock_find_by_country = mocker.patch("database.models.Currency.find_by_country")
+
+    mock_find_by_country.side_effect = lambda country: {"BR": {"currency": "BRL"}, "US": {"currency": "USD"}}[country]
+
+    mock_exchange = mocker.patch("controllers.geoloc_controller.GeoController.get_exchanges")
+
+    mock_exchange.return_value = {"USD": 0.2}
+
+    response = client.post("/conversion_by_country/batch", json=payload_conversion_by_country_batch)
+
+    assert response.status_code == 200
+    assert response.json["results"] == [{"status": 200, "result": 4.0}] * 2
+    assert mock_find_by_country.call_count == 2
+
+
+def test_conversion_matrix_success(client, mocker):
+    """Testa o endpoint de conversão para várias moedas com sucesso."""
+
+    mock_matrix = mocker.patch("controllers.geoloc_controller.GeoController.get_conversion_matrix")
+
+    mock_matrix.return_value = {"USD": [2.0, 4.0], "EUR": [1.8, 3.6]}
+
+    response = client.post("/conversion/matrix", json=payload_conversion_matrix)
+
+    assert response.status_code == 200
+    assert response.json == {"sender_currency": "BRL", "result": {"USD": [2.0, 4.0], "EUR": [1.8, 3.6]}}
+
+
+def test_conversion_matrix_invalid_payload(client):
+    """Testa o endpoint de conversão para várias moedas com payload inválido."""
+
+    payload_conversion_matrix_invalid = deepcopy(payload_conversion_matrix)
+    payload_conversion_matrix_invalid.pop("values")
+
+    response = client.post("/conversion/matrix", json=payload_conversion_matrix_invalid)
+
+    assert response.status_code == 422
+    assert response.json == {"status": 422, "message": "{'values': ['Os valores a serem convertidos são obrigatórios']}"}
+
+
+def test_conversion_matrix_exchange_error(client, mocker):
+    """Testa o endpoint de conversão para várias moedas com erro na api de conversão."""
+
+    mocker.patch(
+        "controllers.geoloc_controller.GeoController.get_conversion_matrix", side_effect=ExchangeApiError("Taxas das moedas está indisponível")
+    )
+
+    response = client.post("/conversion/matrix", json=payload_conversion_matrix)
+
+    assert response.status_code == 500
+    assert response.json == {"status": 500, "message": "Taxas das moedas está indisponível"}
+
+
+def test_conversion_matrix_without_any_rate(client, mocker):
+    """Testa que a conversão para várias moedas sem nenhuma taxa encontrada retorna 404."""
+
+    rate_store.clear()
+    mocker.patch("controllers.geoloc_controller.GeoController.fetch_rate_table", return_value=RateTable("BRL", {"BRL": 1, "USD": 0.2}))
+
+    response = client.post("/conversion/matrix", json={"sender_currency": "BRL", "values": [10], "receiver_currencies": ["XYZ"]})
+
+    assert response.status_code == 404
+    assert response.json == {"status": 404, "message": "Conversão não encontrada"}
+
+
+def test_metrics(client, mocker):
+    """Testa o endpoint de métricas no formato do Prometheus."""
+
+    mocker.patch("controllers.geoloc_controller.GeoController.get_country", side_effect=GoogleMapsApiError("Geolocalização está indisponível"))
+    client.post("/tax_coords", json=payload_tax)
+
+    response = client.get("/metrics")
+
+    body = response.data.decode()
+    assert response.status_code == 200
+    assert response.content_type.startswith("text/plain")
+    assert 'geoloc_http_request_duration_seconds_count{method="POST",route="/tax_coords",status="500"}' in body
+    assert 'geoloc_errors_total{exception="GoogleMapsApiError"}' in body
+    assert "geoloc_http_requests_in_flight 1.0" in body
+    assert "geoloc_geocode_cache_hit_ratio" in body
+
+
+def test_conversion_stream_csv(client, mocker):
+    """Testa o endpoint de conversão em fluxo com entrada CSV e saída NDJSON."""
+
+    rate_store.clear()
+    mocker.patch("controllers.geoloc_controller.GeoController.get_exchanges", return_value={"USD": 0.2})
+    body = "id,sender_currency,receiver_currency,value\na,BRL,USD,10\nb,BRL,USD,abc\n"
+
+    response = client.post("/conversion/stream", data=body, content_type="text/csv")
+
+    lines = [json.loads(line) for line in response.data.decode().splitlines()]
+    assert response.status_code == 200
+    assert response.mimetype == "application/x-ndjson"
+    assert lines[0] == {"row": 1, "id": "a", "status": 200, "result": 2.0}
+    assert lines[1]["row"] == 2 and lines[1]["status"] == 422
+
+
+def test_conversion_stream_budget_per_chunk(client, mocker):
+    """Testa que o fluxo não herda o prazo da requisição: cada bloco tem o seu, sem o header do cliente."""
+
+    budgets = []
+
+    def convert_items(self, items):
+        budgets.append(deadline.remaining())
+        return [{"status": 200, "result": 1.0} for _ in items]
+
+    mocker.patch("views.api.settings.STREAM_CHUNK_SIZE", 1)
+    mocker.patch("controllers.stream_controller.StreamConverter.convert_items", convert_items)
+    body = "sender_currency,receiver_currency,value\nBRL,USD,1\nBRL,USD,2\n"
+
+    response = client.post("/conversion/stream", data=body, content_type="text/csv", headers={"X-Request-Timeout": "1"})
+
+    assert response.status_code == 200
+    assert len(response.data.decode().splitlines()) == 2
+    assert len(budgets) == 2 and all(budget > 1 for budget in budgets)
+
+
+def test_conversion_stream_invalid_format(client):
+    """Testa o endpoint de conversão em fluxo com formato desconhecido."""
+
+    response = client.post("/conversion/stream?format=xml", data="<a/>")
+
+    assert response.status_code == 422
+    assert response.json == {"status": 422, "message": "Formato inválido: xml"}
+
+
+def test_conversion_as_of(client, mocker):
+    """Testa o endpoint de conversão com a taxa vigente em uma data passada."""
+
+    mock_history = mocker.patch("controllers.geoloc_controller.GeoController.get_historical_rates", return_value={"USD": 0.19})
+
+    response = client.post("/conversion", json={**payload_conversion, "receiver_currency": "USD", "as_of": "2024-01-10T12:00:00Z"})
+
+    assert response.status_code == 200
+    assert response.json == {"result": payload_conversion["value"] * 0.19}
+    assert mock_history.call_args.args[1].isoformat() == "2024-01-10T12:00:00+00:00"
+
+
+def test_conversion_as_of_invalid(client):
+    """Testa o endpoint de conversão com data em formato inválido."""
+
+    response = client.post("/conversion", json={**payload_conversion, "as_of": "ontem"})
+
+    assert response.status_code == 422
+    assert response.json == {"status": 422, "message": "{'as_of': ['A data deve estar no formato ISO 8601']}"}
+
+
+def test_request_without_deadline_budget_is_shed(client, mocker):
+    """Testa a recusa imediata com 503 e Retry-After quando o prazo do cliente não comporta a requisição."""
+
+    mock_google_coords = mocker.patch("controllers.geoloc_controller.GeoController.get_country")
+
+    response = client.post("/tax_coords", json=payload_tax, headers={"X-Request-Timeout": "10"})
+
+    assert response.status_code == 503
+    assert response.headers["Retry-After"] == "1"
+    assert response.json == {"status": 503, "message": "Tempo limite da requisição esgotado"}
+    assert not mock_google_coords.called
+    assert client.get("/health", headers={"X-Request-Timeout": "0"}).status_code == 200
+
+
+def test_request_shed_when_admission_queue_is_full(client, mocker):
+    """Testa a recusa com 503 quando a rota não tem vaga nem lugar na fila."""
+
+    mocker.patch("views.api.admission", Admission(concurrency=0, queue_size=0))
+
+    response = client.post("/conversion", json=payload_conversion)
+
+    assert response.status_code == 503
+    assert response.headers["Retry-After"] == "1"
+    assert response.json == {"status": 503, "message": "Serviço sobrecarregado, tente novamente"}
+
+
+def test_deadline_exceeded_during_request(client, mocker):
+    """Testa a resposta 503 quando o prazo acaba durante a chamada a um serviço externo."""
+
+    mocker.patch("controllers.geoloc_controller.GeoController.get_country", side_effect=DeadlineExceeded())
+
+    response = client.post("/tax_coords", json=payload_tax)
+
+    assert response.status_code == 503
+    assert response.headers["Retry-After"] == "1"
+
+    response = client.post("/tax_coords/batch", json=payload_tax_batch[:1])
+
+    assert response.status_code == 200
+    assert response.json["results"] == [{"status": 503, "message": "Tempo limite da requisição esgotado"}]
+
+
+def test_stale_rates_served_when_deadline_exceeded(client, mocker):
+    """Testa que as taxas expiradas são usadas quando o prazo acaba na busca do câmbio."""
+
+    rate_store.clear()
+    rate_store.put(RateTable("BRL", {"USD": 0.2}, fetched_at=time.time() - 2 * rate_store.default_ttl))
+    mocker.patch("controllers.geoloc_controller.rate_refresher.request_refresh", return_value=False)
+    mocker.patch("controllers.geoloc_controller.GeoController.fetch_rate_table_coalesced", side_effect=DeadlineExceeded())
+
+    response = client.post("/conversion", json={**payload_conversion, "receiver_currency": "USD"})
+    rate_store.clear()
+
+    assert response.status_code == 200
+    assert response.json["result"] == payload_conversion["value"] * 0.2
+
+
+def test_batch_routes_use_batch_priority(client, mocker):
+    """Testa que as rotas em lote consomem a cota dos serviços externos com prioridade de lote."""
+
+    priorities = []
+
+    def get_country(self, latitude, longitude):
+        priorities.append(quota.current_priority())
+        raise QuotaExceeded()
+
+    mocker.patch("controllers.geoloc_controller.GeoController.get_country", get_country)
+
+    response = client.post("/tax_coords", json=payload_tax)
+
+    assert response.status_code == 503
+    assert response.headers["Retry-After"] == "1"
+    assert response.json == {"status": 503, "message": "Cota do serviço externo esgotada, tente novamente"}
+
+    response = client.post("/tax_coords/batch", json=payload_tax_batch[:1])
+
+    assert response.json["results"] == [{"status": 503, "message": "Cota do serviço externo esgotada, tente novamente"}]
+    assert priorities[0] == quota.INTERACTIVE
+    assert set(priorities[1:]) == {quota.BATCH}
+    assert quota.current_priority() == quota.INTERACTIVE
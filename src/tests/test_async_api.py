@@ -0,0 +1,291 @@
+import asyncio
+import json
+import threading
+import pytest
+from asgi import create_asgi_app
+from controllers.async_geoloc_controller import AsyncGeoController
+from controllers.geoloc_controller import rate_store
+from settings import settings
+from utils import deadline
+from utils.admission import Admission, AsyncRouteLimiter
+from utils.exceptions import DeadlineExceeded, GoogleMapsApiError
+from utils.precomputed import PrecomputedResponse
+from utils.profiling import make_token
+from utils.rates import RateTable
+from tests.payloads import payload_tax, payload_conversion_by_country, payload_tax_batch
+
+
+@pytest.fixture
+def async_client():
+    """Fixture para criar um cliente de teste para o aplicativo ASGI."""
+    return create_asgi_app().test_client()
+
+
+def post(client, url, payload):
+    async def request():
+        response = await client.post(url, json=payload)
+        return response.status_code, await response.get_json()
+
+    return asyncio.run(request())
+
+
+def test_async_tax_coords_success(async_client, mocker):
+    """Testa o endpoint assíncrono de buscar taxa de câmbio com sucesso."""
+
+    mocker.patch("controllers.async_geoloc_controller.AsyncGeoController.get_country", return_value="BR")
+    mocker.patch("database.async_models.AsyncCurrency.find_by_country", return_value={"currency": "BRL"})
+    mocker.patch("controllers.async_geoloc_controller.AsyncGeoController.get_exchanges", return_value={"USD": 0.2})
+
+    status, data = post(async_client, "/tax_coords", payload_tax)
+
+    assert status == 200
+    assert data == {"tax": 0.2}
+
+
+def test_async_tax_coords_multiple_currencies(async_client, mocker):
+    """Testa o endpoint assíncrono de taxas com várias moedas e seleção de campos."""
+
+    mock_country = mocker.patch("controllers.async_geoloc_controller.AsyncGeoController.get_country", return_value="BR")
+    mocker.patch("database.async_models.AsyncCurrency.find_by_country", return_value={"currency": "BRL"})
+    mock_exchange = mocker.patch(
+        "controllers.async_geoloc_controller.AsyncGeoController.get_exchanges", return_value={"USD": 0.2, "EUR": 0.18}
+    )
+
+    status, data = post(async_client, "/tax_coords", {**payload_tax, "currencies": ["EUR"], "fields": ["country", "tax", "rates"]})
+
+    assert status == 200
+    assert data == {"country": "BR", "tax": 0.2, "rates": {"USD": 0.2, "EUR": 0.18}}
+    assert mock_country.call_count == 1
+    assert mock_exchange.call_count == 1
+
+
+def test_async_tax_coords_google_error(async_client, mocker):
+    """Testa o endpoint assíncrono de buscar taxa de câmbio com erro na api da localização."""
+
+    mocker.patch(
+        "controllers.async_geoloc_controller.AsyncGeoController.get_country", side_effect=GoogleMapsApiError("Geolocalização está indisponível")
+    )
+
+    status, data = post(async_client, "/tax_coords", payload_tax)
+
+    assert status == 500
+    assert data == {"status": 500, "message": "Geolocalização está indisponível"}
+
+
+def test_async_tax_coords_invalid_payload(async_client):
+    """Testa o endpoint assíncrono de buscar taxa de câmbio com payload inválido."""
+
+    status, data = post(async_client, "/tax_coords", {"latitude": "-16.005031", "longitude": "-48.052034"})
+
+    assert status == 422
+    assert data == {"status": 422, "message": "{'sender_currency': ['A moeda desejada é obrigatória']}"}
+
+
+def test_async_conversion_by_country_success(async_client, mocker):
+    """Testa o endpoint assíncrono de conversão por país com sucesso."""
+
+    mocker.patch(
+        "database.async_models.AsyncCurrency.find_by_country",
+        side_effect=lambda country: {"BR": {"currency": "BRL"}, "US": {"currency": "USD"}}[country],
+    )
+    mocker.patch("controllers.async_geoloc_controller.AsyncGeoController.get_conversion", return_value=4.0)
+
+    status, data = post(async_client, "/conversion_by_country", payload_conversion_by_country)
+
+    assert status == 200
+    assert data == {"result": 4.0}
+
+
+def test_async_tax_coords_batch(async_client, mocker):
+    """Testa o endpoint assíncrono de taxas em lote resolvendo o país uma única vez."""
+
+    mock_country = mocker.patch("controllers.async_geoloc_controller.AsyncGeoController.get_country", return_value="BR")
+    mocker.patch("database.async_models.AsyncCurrency.find_by_country", return_value={"currency": "BRL"})
+    mocker.patch("controllers.async_geoloc_controller.AsyncGeoController.get_exchanges", return_value={"USD": 0.2})
+
+    status, data = post(async_client, "/tax_coords/batch", payload_tax_batch)
+
+    assert status == 200
+    assert [result["status"] for result in data["results"]] == [200, 200, 404, 422]
+    assert mock_country.call_count == 1
+
+
+def test_async_conversion_by_country_concurrent_lookups(mocker):
+    """Testa que as moedas dos dois países são buscadas ao mesmo tempo."""
+
+    running = []
+
+    async def find_by_country(country):
+        running.append(country)
+        await asyncio.sleep(0.01)
+        assert len(running) == 2
+        return {"BR": {"currency": "BRL"}, "US": {"currency": "USD"}}[country]
+
+    mocker.patch("database.async_models.AsyncCurrency.find_by_country", side_effect=find_by_country)
+    mocker.patch("controllers.async_geoloc_controller.AsyncGeoController.get_conversion", return_value=4.0)
+
+    assert asyncio.run(AsyncGeoController().get_conversion_by_country("BR", "US", 20.0)) == 4.0
+
+
+def test_async_metrics(async_client):
+    """Testa o endpoint assíncrono de métricas."""
+
+    async def request():
+        await async_client.get("/health")
+        response = await async_client.get("/metrics")
+        return response.status_code, await response.get_data(as_text=True)
+
+    status, body = asyncio.run(request())
+
+    assert status == 200
+    assert 'geoloc_http_request_duration_seconds_count{method="GET",route="/health",status="200"}' in body
+    assert "# TYPE geoloc_upstream_flights_total counter" in body
+
+
+def test_async_currencies_not_modified(async_client, mocker):
+    """Testa o 304 do endpoint assíncrono de buscar moedas."""
+
+    mocker.patch(
+        "controllers.async_geoloc_controller.AsyncGeoController.get_currencies_response",
+        return_value=PrecomputedResponse({"result": [{"currency": "BRL"}]}),
+    )
+
+    async def request():
+        response = await async_client.get("/currencies")
+        etag = response.headers["ETag"]
+        not_modified = await async_client.get("/currencies", headers={"If-None-Match": etag})
+        return response.status_code, await response.get_json(), not_modified.status_code
+
+    assert asyncio.run(request()) == (200, {"result": [{"currency": "BRL"}]}, 304)
+
+
+def test_async_conversion_stream(async_client, mocker):
+    """Testa o endpoint assíncrono de conversão em fluxo com entrada NDJSON."""
+
+    rate_store.clear()
+    mocker.patch("controllers.async_geoloc_controller.AsyncGeoController.get_exchanges", return_value={"USD": 0.2})
+    body = '{"sender_currency": "BRL", "receiver_currency": "USD", "value": 10}\n{quebrado\n'
+
+    async def request():
+        response = await async_client.post("/conversion/stream", data=body, headers={"Content-Type": "application/x-ndjson"})
+        return response.status_code, await response.get_data(as_text=True)
+
+    status, data = asyncio.run(request())
+    lines = [json.loads(line) for line in data.splitlines()]
+
+    assert status == 200
+    assert lines[0] == {"row": 1, "status": 200, "result": 2.0}
+    assert lines[1] == {"row": 2, "status": 422, "message": "JSON inválido"}
+
+
+def test_async_conversion_stream_budget_per_chunk(async_client, mocker):
+    """Testa que o fluxo assíncrono usa o prazo de cada bloco, e não o do header da requisição."""
+
+    budgets = []
+
+    async def get_conversion(self, base_currency, desired_currency, amount, as_of=None):
+        budgets.append(deadline.remaining())
+        return amount
+
+    mocker.patch("controllers.async_geoloc_controller.AsyncGeoController.get_conversion", get_conversion)
+    body = '{"sender_currency": "BRL", "receiver_currency": "USD", "value": 10}\n'
+
+    async def request():
+        response = await async_client.post(
+            "/conversion/stream", data=body, headers={"Content-Type": "application/x-ndjson", "X-Request-Timeout": "1"}
+        )
+        return response.status_code, await response.get_data(as_text=True)
+
+    status, data = asyncio.run(request())
+
+    assert status == 200
+    assert json.loads(data) == {"row": 1, "status": 200, "result": 10}
+    assert len(budgets) == 1 and budgets[0] > 1
+
+
+def test_async_conversion_matrix_as_of(async_client, mocker):
+    """Testa o endpoint assíncrono de conversão para várias moedas em uma data passada."""
+
+    mocker.patch("database.async_models.AsyncRateHistory.find", return_value=RateTable("BRL", {"USD": 0.2, "EUR": 0.5}))
+
+    status, data = post(async_client, "/conversion/matrix", {"sender_currency": "BRL", "values": [10], "as_of": "2024-01-10T00:00:00Z"})
+
+    assert status == 200
+    assert data == {"sender_currency": "BRL", "result": {"EUR": [5.0], "USD": [2.0]}}
+
+
+def test_async_profiled_request(async_client, mocker, tmp_path):
+    """Testa o profiling de uma requisição assíncrona ativado pelo header assinado."""
+
+    mocker.patch.multiple("views.api.profiler", enabled=True, directory=str(tmp_path), secret="segredo")
+    mocker.patch(
+        "database.async_models.AsyncCurrency.find_by_country",
+        side_effect=lambda country: {"BR": {"currency": "BRL"}, "US": {"currency": "USD"}}[country],
+    )
+    mocker.patch("controllers.async_geoloc_controller.AsyncGeoController.get_conversion", return_value=4.0)
+
+    async def request():
+        response = await async_client.post(
+            "/conversion_by_country", json=payload_conversion_by_country, headers={"X-Profile": make_token("segredo")}
+        )
+        return response.status_code, response.headers.get("X-Profile-Id")
+
+    status, profile_id = asyncio.run(request())
+
+    assert status == 200
+    folded = next(tmp_path.glob(f"*{profile_id}.folded")).read_text()
+    assert "POST /conversion_by_country;validation " in folded
+    assert "POST /conversion_by_country;serialization " in folded
+
+
+def test_async_request_shedding(async_client, mocker):
+    """Testa no app assíncrono a recusa com 503 e Retry-After por prazo e por fila cheia."""
+
+    async def request(url, payload, headers=None):
+        response = await async_client.post(url, json=payload, headers=headers)
+        return response.status_code, response.headers.get("Retry-After"), await response.get_json()
+
+    status, retry_after, data = asyncio.run(request("/tax_coords", payload_tax, {"X-Request-Timeout": "10"}))
+
+    assert (status, retry_after) == (503, "1")
+    assert data == {"status": 503, "message": "Tempo limite da requisição esgotado"}
+
+    mocker.patch("views.async_api.async_admission", Admission(concurrency=0, queue_size=0, limiter=AsyncRouteLimiter))
+    status, retry_after, data = asyncio.run(request("/tax_coords", payload_tax))
+
+    assert (status, retry_after) == (503, "1")
+    assert data == {"status": 503, "message": "Serviço sobrecarregado, tente novamente"}
+
+
+def test_async_deadline_exceeded_during_request(async_client, mocker):
+    """Testa a resposta 503 quando o prazo acaba durante a requisição assíncrona."""
+
+    mocker.patch("controllers.async_geoloc_controller.AsyncGeoController.get_country", side_effect=DeadlineExceeded())
+
+    status, data = post(async_client, "/tax_coords", payload_tax)
+
+    assert status == 503
+    assert data == {"status": 503, "message": "Tempo limite da requisição esgotado"}
+
+
+def test_async_shared_cache_runs_off_the_event_loop(mocker):
+    """Testa que, com cache compartilhado, as leituras e gravações bloqueantes rodam fora do event loop."""
+
+    threads = []
+
+    class SharedCache:
+        def get(self, key):
+            threads.append(threading.get_ident())
+            return None
+
+        def set(self, key, value, ttl=None):
+            threads.append(threading.get_ident())
+
+    mocker.patch.object(settings, "CACHE_BACKEND", "redis")
+    mocker.patch("controllers.geoloc_controller.shared_rates", SharedCache())
+    mocker.patch("controllers.async_geoloc_controller.AsyncGeoController.fetch_rate_table", return_value=RateTable("BRL", {"USD": 0.2}))
+    rate_store.clear()
+
+    assert asyncio.run(AsyncGeoController().get_exchanges("BRL")) == {"USD": 0.2}
+    assert len(threads) == 2
+    assert threading.get_ident() not in threads
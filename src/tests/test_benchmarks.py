@@ -0,0 +1,81 @@
+import random
+import requests
+from benchmarks.compare import compare
+from benchmarks.load import ENDPOINTS, percentile, summarize
+from benchmarks.stubs import StubServer, exchange_payload, google_payload
+from controllers.geoloc_controller import parse_country
+from utils.rates import RateTable
+
+
+def test_stub_google_payload_is_parsed_by_controller():
+    """Testa que a resposta do Google simulado é interpretada pelo controller."""
+
+    assert parse_country(google_payload("-15.99,-48.09")) == "BR"
+    assert not parse_country(google_payload("0,0"))
+
+
+def test_stub_exchange_payload_builds_rate_table():
+    """Testa que a resposta do câmbio simulado gera uma tabela de taxas válida."""
+
+    table = RateTable.from_response("BRL", exchange_payload("BRL"))
+
+    assert table.rates["BRL"] == 1
+    assert table.rates["USD"] == 0.2
+    assert exchange_payload("XXX") is None
+
+
+def test_stub_server_injects_errors():
+    """Testa a injeção de erros do servidor simulado."""
+
+    with StubServer(error_rate=1.0, seed=1) as stub:
+        response = requests.get(f"{stub.url}/v6/key/latest/USD", timeout=5)
+
+    assert response.status_code == 500
+    assert stub.requests == 1
+
+
+def test_percentile_nearest_rank():
+    """Testa o percentil pelo posto mais próximo."""
+
+    values = list(range(1, 101))
+
+    assert percentile(values, 0.50) == 50
+    assert percentile(values, 0.99) == 99
+    assert percentile([7], 0.95) == 7
+    assert percentile([], 0.5) is None
+
+
+def test_summarize_counts_errors():
+    """Testa o resumo de latências e erros de um endpoint."""
+
+    summary = summarize([(0.01, True), (0.02, True), (0.03, False), (0.04, True)], elapsed=2)
+
+    assert summary["requests"] == 4
+    assert summary["errors"] == 1
+    assert summary["rps"] == 2
+    assert summary["p50_ms"] == 20
+    assert summary["max_ms"] == 40
+
+
+def test_load_driver_payloads_are_reproducible():
+    """Testa que a mesma seed gera a mesma sequência de requisições."""
+
+    def payloads(seed):
+        rng = random.Random(seed)
+        return [ENDPOINTS[name][2](rng) for name in ["tax_coords", "conversion", "conversion_by_country"]]
+
+    assert payloads(42) == payloads(42)
+    assert payloads(42) != payloads(43)
+
+
+def test_compare_reports_change():
+    """Testa a comparação entre dois resultados de benchmark."""
+
+    stats = {"rps": 100.0, "p50_ms": 10.0, "p95_ms": 20.0, "p99_ms": 30.0, "error_rate": 0.0}
+    faster = dict(stats, rps=150.0, p99_ms=15.0)
+
+    rows = compare({"endpoints": {"conversion": stats}, "total": stats}, {"endpoints": {"conversion": faster}, "total": faster})
+
+    assert rows["conversion"]["rps"] == (100.0, 150.0, 50.0)
+    assert rows["total"]["p99_ms"] == (30.0, 15.0, -50.0)
+    assert rows["total"]["error_rate"][2] is None
@@ -0,0 +1,211 @@
+import fnmatch
+import multiprocessing
+import sqlite3
+import pytest
+from settings import settings
+from utils.cache import SIZE_SAMPLE_INTERVAL, RedisCache, SQLiteCache, TieredCache, TTLCache, create_cache, create_shared_cache
+
+
+class FakeTimer:
+    def __init__(self):
+        self.now = 0
+
+    def __call__(self):
+        return self.now
+
+
+def test_cache_hit_and_miss():
+    """Testa os contadores de acertos e falhas do cache."""
+
+    cache = TTLCache(maxsize=2, ttl=10)
+    cache.set("BR", "BRL")
+
+    assert cache.get("BR") == "BRL"
+    assert cache.get("US") is None
+    assert cache.stats()["hits"] == 1
+    assert cache.stats()["misses"] == 1
+
+
+def test_cache_ttl_expiration():
+    """Testa a expiração das entradas do cache pelo TTL."""
+
+    timer = FakeTimer()
+    cache = TTLCache(maxsize=2, ttl=10, timer=timer)
+    cache.set("BR", "BRL")
+
+    timer.now = 11
+
+    assert cache.get("BR") is None
+    assert len(cache) == 0
+
+
+def test_cache_lru_eviction():
+    """Testa a remoção da entrada menos usada quando o cache está cheio."""
+
+    cache = TTLCache(maxsize=2, ttl=10)
+    cache.set("BR", "BRL")
+    cache.set("US", "USD")
+    cache.get("BR")
+    cache.set("FR", "EUR")
+
+    assert cache.get("US") is None
+    assert cache.get("BR") == "BRL"
+    assert cache.stats()["evictions"] == 1
+
+
+class FakeRedis:
+    """Substituto local do Redis com a parte da API usada pelo RedisCache."""
+
+    def __init__(self):
+        self.data = {}
+
+    def get(self, key):
+        return self.data.get(key)
+
+    def set(self, key, value, px=None):
+        self.data[key] = value.encode()
+
+    def delete(self, *keys):
+        for key in keys:
+            self.data.pop(key, None)
+
+    def scan_iter(self, match):
+        return [key for key in list(self.data) if fnmatch.fnmatch(key, match)]
+
+
+def test_sqlite_cache_shared_between_processes(tmp_path):
+    """Testa que um valor gravado por outro processo é lido pelo cache SQLite."""
+
+    path = str(tmp_path / "cache.sqlite3")
+
+    def fill():
+        SQLiteCache("geocode", path).set((-16.005, -48.052), "BR")
+
+    process = multiprocessing.get_context("fork").Process(target=fill)
+    process.start()
+    process.join()
+
+    cache = SQLiteCache("geocode", path)
+    assert cache.get((-16.005, -48.052)) == "BR"
+    assert cache.get((0, 0)) is None
+    assert cache.stats()["hits"] == 1
+    assert cache.stats()["misses"] == 1
+
+
+def test_sqlite_cache_expiration_and_namespaces(tmp_path):
+    """Testa a expiração e o isolamento entre namespaces do cache SQLite."""
+
+    timer = FakeTimer()
+    path = str(tmp_path / "cache.sqlite3")
+    rates = SQLiteCache("rates", path, ttl=10, timer=timer)
+    geocode = SQLiteCache("geocode", path, timer=timer)
+
+    rates.set("BRL", {"USD": 0.2})
+    geocode.set("BRL", "BR")
+    assert rates.get("BRL") == {"USD": 0.2}
+
+    timer.now = 11
+    assert rates.get("BRL") is None
+    assert geocode.get("BRL") == "BR"
+
+    rates.clear()
+    assert len(geocode) == 1
+
+
+def test_sqlite_cache_evicts_over_maxsize(tmp_path):
+    """Testa que a limpeza remove as entradas que expiram primeiro acima do limite."""
+
+    timer = FakeTimer()
+    cache = SQLiteCache("geocode", str(tmp_path / "cache.sqlite3"), maxsize=2, ttl=100, timer=timer)
+    for position in range(3):
+        timer.now = position
+        cache.set(position, "BR")
+
+    cache.evict()
+
+    assert len(cache) == 2
+    assert cache.get(0) is None
+    assert cache.stats()["evictions"] == 1
+
+
+def test_sqlite_cache_errors_do_not_raise(tmp_path, mocker):
+    """Testa que falhas do SQLite na remoção, limpeza e contagem não propagam."""
+
+    cache = SQLiteCache("geocode", str(tmp_path / "cache.sqlite3"))
+    cache.set("key", "BR")
+    connection = mocker.Mock()
+    connection.execute.side_effect = sqlite3.OperationalError("database is locked")
+    mocker.patch.object(cache, "_connection", return_value=connection)
+
+    cache.delete("key")
+    cache.clear()
+    assert len(cache) == 0
+    assert cache.stats()["size"] == 0
+
+
+def test_sqlite_cache_stats_samples_size(tmp_path, mocker):
+    """Testa que as métricas não recontam as entradas do SQLite a cada consulta."""
+
+    cache = SQLiteCache("geocode", str(tmp_path / "cache.sqlite3"))
+    cache.set("a", "BR")
+    clock = mocker.patch("utils.cache.time.monotonic", return_value=1000.0)
+
+    assert cache.stats()["size"] == 1
+    cache.set("b", "US")
+    assert cache.stats()["size"] == 1
+
+    clock.return_value = 1000.0 + SIZE_SAMPLE_INTERVAL
+    assert cache.stats()["size"] == 2
+
+
+def test_redis_cache_with_local_stand_in():
+    """Testa o cache em rede com um substituto local do Redis."""
+
+    client = FakeRedis()
+    cache = RedisCache("geocode", client=client)
+
+    cache.set((1.0, 2.0), "BR")
+
+    assert cache.get((1.0, 2.0)) == "BR"
+    assert RedisCache("geocode", client=client).get((1.0, 2.0)) == "BR"
+    assert cache.get((3.0, 4.0)) is None
+
+    cache.clear()
+    assert client.data == {}
+
+
+def test_redis_cache_errors_are_misses(mocker):
+    """Testa que a falha de conexão com o Redis vira um miss."""
+
+    client = mocker.Mock()
+    client.get.side_effect = ConnectionError("recusada")
+
+    assert RedisCache("geocode", client=client).get("BR") is None
+
+
+def test_tiered_cache_fills_local_from_shared():
+    """Testa que o cache em camadas lê o compartilhado e guarda o valor localmente."""
+
+    shared = RedisCache("geocode", client=FakeRedis())
+    shared.set("key", "BR")
+    cache = TieredCache(TTLCache(), shared)
+
+    assert cache.get("key") == "BR"
+    assert cache.get("key") == "BR"
+
+    stats = cache.stats()
+    assert stats["hits"] == 2
+    assert stats["shared"]["hits"] == 1
+    assert cache.get("other", "padrão") == "padrão"
+
+
+def test_create_cache_by_backend(tmp_path, mocker):
+    """Testa a escolha do backend de cache pela configuração."""
+
+    mocker.patch.object(settings, "CACHE_SQLITE_PATH", str(tmp_path / "cache.sqlite3"))
+
+    assert isinstance(create_cache("geocode", 10, 60, "memory"), TTLCache)
+    assert create_shared_cache("geocode", 10, 60, "memory") is None
+    assert isinstance(create_cache("geocode", 10, 60, "sqlite").shared, SQLiteCache)
+    with pytest.raises(ValueError):
+        create_cache("geocode", 10, 60, "memcached")
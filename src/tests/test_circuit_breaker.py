@@ -0,0 +1,122 @@
+import pytest
+from utils.circuit_breaker import CLOSED, HALF_OPEN, OPEN, PROBE, CircuitBreaker
+from utils.exceptions import CircuitOpenError
+from utils.hedging import LatencyTracker
+
+
+class FakeTimer:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+def test_breaker_opens_on_failure_rate():
+    """Testa que o circuito abre quando a taxa de falhas da janela atinge o limite."""
+
+    breaker = CircuitBreaker("teste", failure_rate=0.5, window=4, min_calls=4)
+
+    for _ in range(2):
+        breaker.record_success()
+    breaker.record_failure()
+    assert breaker.state == CLOSED
+
+    breaker.record_failure()
+
+    assert breaker.state == OPEN
+    with pytest.raises(CircuitOpenError):
+        breaker.check()
+
+
+def test_breaker_waits_for_min_calls():
+    """Testa que o circuito não abre antes do número mínimo de chamadas."""
+
+    breaker = CircuitBreaker("teste", failure_rate=0.5, window=10, min_calls=5)
+
+    for _ in range(4):
+        breaker.record_failure()
+
+    assert breaker.state == CLOSED
+
+
+def test_breaker_half_open_allows_single_probe():
+    """Testa que, após o cool-down, apenas uma chamada de teste passa e o sucesso fecha o circuito."""
+
+    timer = FakeTimer()
+    breaker = CircuitBreaker("teste", failure_rate=0.5, window=2, min_calls=2, cooldown=30, timer=timer)
+    breaker.record_failure()
+    breaker.record_failure()
+
+    timer.now = 29
+    assert not breaker.allow()
+
+    timer.now = 30
+    assert breaker.allow() == PROBE
+    assert breaker.state == HALF_OPEN
+    assert not breaker.allow()
+
+    breaker.record_success()
+
+    assert breaker.state == CLOSED
+    assert breaker.allow() is True
+    assert breaker.check() is False
+
+
+def test_breaker_probe_failure_reopens():
+    """Testa que a falha da chamada de teste reabre o circuito e reinicia o cool-down."""
+
+    timer = FakeTimer()
+    breaker = CircuitBreaker("teste", failure_rate=0.5, window=2, min_calls=2, cooldown=30, timer=timer)
+    breaker.record_failure()
+    breaker.record_failure()
+    timer.now = 30
+    assert breaker.allow()
+
+    breaker.record_failure()
+
+    assert breaker.state == OPEN
+    timer.now = 59
+    assert not breaker.allow()
+
+
+def test_disabled_breaker_always_allows():
+    """Testa que o circuito desabilitado nunca bloqueia chamadas."""
+
+    breaker = CircuitBreaker("teste", window=2, min_calls=1, enabled=False)
+    breaker.record_failure()
+    breaker.record_failure()
+
+    assert breaker.allow()
+
+
+def test_latency_tracker_percentile_with_floor():
+    """Testa a espera do hedge pelo percentil das latências recentes, com piso mínimo."""
+
+    tracker = LatencyTracker(percentile=0.9, min_samples=10, min_delay=0.05)
+    for latency in range(1, 10):
+        tracker.record(latency / 100)
+    assert tracker.delay() is None
+
+    tracker.record(0.10)
+    assert tracker.delay() == 0.09
+
+    fast = LatencyTracker(percentile=0.5, min_samples=1, min_delay=0.05)
+    fast.record(0.001)
+    assert fast.delay() == 0.05
+
+
+def test_breaker_release_probe():
+    """Testa que a chamada de teste liberada sem resultado permite uma nova chamada de teste."""
+
+    timer = FakeTimer()
+    breaker = CircuitBreaker("teste", window=1, min_calls=1, cooldown=30, timer=timer)
+    breaker.record_failure()
+    timer.now = 30
+
+    assert breaker.check()
+    assert not breaker.allow()
+    breaker.release_probe()
+
+    assert breaker.state == HALF_OPEN
+    assert breaker.check()
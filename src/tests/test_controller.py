@@ -0,0 +1,243 @@
+import time
+from datetime import datetime, timezone
+import pytest
+import requests
+from controllers.geoloc_controller import GeoController, geocode_cache, rate_refresher, rate_store
+from database.models import currency_index, rate_history
+from settings import settings
+from utils.exceptions import ExchangeApiError, TaxNotFound
+from utils.http_client import exchange_breaker, exchange_client
+from utils import precomputed
+from utils.cache import SQLiteCache
+from utils.rates import RateTable
+
+
+def test_get_country_cached_by_cell(mocker):
+    """Testa que coordenadas na mesma célula reutilizam o país em cache."""
+
+    geocode_cache.clear()
+    mock_resolve = mocker.patch("controllers.geoloc_controller.GeoController.resolve_country")
+    mock_resolve.return_value = "BR"
+
+    assert GeoController().get_country("-16.005031", "-48.052034") == "BR"
+    assert GeoController().get_country("-16.005112", "-48.051987") == "BR"
+    assert mock_resolve.call_count == 1
+    assert geocode_cache.stats()["hits"] == 1
+
+
+def test_get_country_not_found_is_not_cached(mocker):
+    """Testa que coordenadas sem país não ficam em cache."""
+
+    geocode_cache.clear()
+    mock_resolve = mocker.patch("controllers.geoloc_controller.GeoController.resolve_country")
+    mock_resolve.return_value = None
+
+    GeoController().get_country("0", "-30")
+    GeoController().get_country("0", "-30")
+
+    assert mock_resolve.call_count == 2
+
+
+def test_get_conversion_uses_cached_rate_table(mocker):
+    """Testa que conversões repetidas reutilizam a tabela de câmbio em cache."""
+
+    rate_store.clear()
+    mock_fetch = mocker.patch("controllers.geoloc_controller.GeoController.fetch_rate_table")
+    mock_fetch.return_value = RateTable("BRL", {"BRL": 1, "USD": 0.2})
+
+    assert GeoController().get_conversion("BRL", "USD", 20.0) == 4.0
+    assert GeoController().get_conversion("BRL", "USD", 50.0) == 10.0
+    assert mock_fetch.call_count == 1
+
+
+def test_get_conversion_desired_currency_not_found(mocker):
+    """Testa a conversão para uma moeda ausente na tabela de câmbio."""
+
+    rate_store.clear()
+    mock_fetch = mocker.patch("controllers.geoloc_controller.GeoController.fetch_rate_table")
+    mock_fetch.return_value = RateTable("BRL", {"BRL": 1})
+
+    assert GeoController().get_conversion("BRL", "XYZ", 20.0) == {}
+
+
+def test_get_rate_table_serves_stale_on_exchange_error(mocker):
+    """Testa que a última tabela é usada quando o serviço de câmbio falha."""
+
+    rate_store.clear()
+    rate_store.put(RateTable("BRL", {"USD": 0.2}, next_update=time.time() - 60))
+    mocker.patch(
+        "controllers.geoloc_controller.GeoController.fetch_rate_table", side_effect=ExchangeApiError("Taxas das moedas está indisponível")
+    )
+
+    assert GeoController().get_exchanges("BRL") == {"USD": 0.2}
+
+
+def test_get_rate_table_too_stale(mocker):
+    """Testa o erro quando a última tabela passou do limite de validade."""
+
+    rate_store.clear()
+    rate_store.put(RateTable("BRL", {"USD": 0.2}, next_update=time.time() - settings.RATES_MAX_STALENESS - 60))
+    mocker.patch(
+        "controllers.geoloc_controller.GeoController.fetch_rate_table", side_effect=ExchangeApiError("Taxas das moedas está indisponível")
+    )
+
+    with pytest.raises(ExchangeApiError):
+        GeoController().get_exchanges("BRL")
+
+
+def test_fetch_rate_table_connection_error(mocker):
+    """Testa que falhas de conexão com o serviço de câmbio viram ExchangeApiError."""
+
+    mocker.patch("controllers.geoloc_controller.exchange_client.get", side_effect=requests.ConnectionError("recusada"))
+
+    with pytest.raises(ExchangeApiError):
+        GeoController().fetch_rate_table("BRL")
+
+
+def test_open_circuit_serves_stale_without_calling_exchange(mocker):
+    """Testa que, com o circuito do câmbio aberto, a última tabela é servida sem chamar o serviço."""
+
+    rate_store.clear()
+    rate_store.put(RateTable("BRL", {"USD": 0.2}, next_update=time.time() - 60))
+    mocker.patch.object(exchange_breaker, "allow", return_value=False)
+    mock_get = mocker.patch.object(exchange_client.session, "get")
+
+    assert GeoController().get_exchanges("BRL") == {"USD": 0.2}
+    mock_get.assert_not_called()
+
+
+def test_get_conversion_matrix(mocker):
+    """Testa a conversão para várias moedas a partir da tabela da moeda base."""
+
+    rate_store.clear()
+    mock_fetch = mocker.patch("controllers.geoloc_controller.GeoController.fetch_rate_table")
+    mock_fetch.return_value = RateTable("BRL", {"BRL": 1, "USD": 0.2, "EUR": 0.18})
+
+    result = GeoController().get_conversion_matrix("BRL", [10.0, 20.0], ["USD", "EUR"])
+
+    assert result == {"USD": [2.0, 4.0], "EUR": [pytest.approx(1.8), pytest.approx(3.6)]}
+    assert mock_fetch.call_count == 1
+
+
+def test_get_conversion_matrix_lowercase_base(mocker):
+    """Testa que a moeda base em minúsculas usa a mesma tabela que a em maiúsculas."""
+
+    rate_store.clear()
+    mock_fetch = mocker.patch("controllers.geoloc_controller.GeoController.fetch_rate_table")
+    mock_fetch.return_value = RateTable("BRL", {"BRL": 1, "USD": 0.2})
+
+    assert GeoController().get_conversion_matrix("brl", [10.0], ["usd"]) == {"usd": [2.0]}
+    mock_fetch.assert_called_once_with("BRL")
+
+
+def test_get_conversion_matrix_without_any_rate(mocker):
+    """Testa que a conversão sem taxa para nenhuma das moedas pedidas é recusada, e a parcial não."""
+
+    rate_store.clear()
+    mocker.patch("controllers.geoloc_controller.GeoController.fetch_rate_table", return_value=RateTable("BRL", {"BRL": 1, "USD": 0.2}))
+
+    with pytest.raises(TaxNotFound):
+        GeoController().get_conversion_matrix("BRL", [10.0], ["XYZ", "ABC"])
+    assert GeoController().get_conversion_matrix("BRL", [10.0], ["USD", "XYZ"]) == {"USD": [2.0], "XYZ": None}
+
+
+def test_get_currencies_response_cached_by_index_generation(mocker):
+    """Testa que a resposta de moedas é remontada apenas quando o índice é recarregado."""
+
+    mocker.patch.object(currency_index, "loaded", True)
+    mocker.patch.object(currency_index, "documents", [{"_id": "1", "currency": "BRL", "country_iso2": "BR"}])
+    mocker.patch.object(currency_index, "generation", 100)
+    mock_find = mocker.patch("database.models.Currency.find")
+
+    first = GeoController().get_currencies_response()
+    assert GeoController().get_currencies_response() is first
+
+    currency_index.documents = [{"_id": "2", "currency": "USD", "country_iso2": "US"}]
+    currency_index.generation = 101
+
+    assert GeoController().get_currencies_response().etag != first.etag
+    mock_find.assert_not_called()
+
+
+def test_get_currencies_response_without_index_reused_until_collection_changes(mocker):
+    """Testa que, sem o índice de moedas, a resposta só é remontada quando a coleção muda."""
+
+    mocker.patch.object(currency_index, "loaded", False)
+    mock_find = mocker.patch("database.models.Currency.find", return_value=[{"_id": "1", "currency": "BRL", "country_iso2": "BR"}])
+    mock_compress = mocker.spy(precomputed.gzip, "compress")
+
+    first = GeoController().get_currencies_response()
+    assert GeoController().get_currencies_response() is first
+    assert mock_compress.call_count == 1
+
+    mock_find.return_value = [{"_id": "2", "currency": "USD", "country_iso2": "US"}]
+
+    assert GeoController().get_currencies_response().etag != first.etag
+    assert mock_compress.call_count == 2
+
+
+def test_rate_table_shared_between_workers(tmp_path, mocker):
+    """Testa que a tabela buscada por um processo é usada por outro sem chamar o serviço de câmbio."""
+
+    shared = SQLiteCache("rates", str(tmp_path / "cache.sqlite3"))
+    mocker.patch("controllers.geoloc_controller.shared_rates", shared)
+    rate_store.clear()
+    mocker.patch(
+        "controllers.geoloc_controller.GeoController.fetch_rate_table",
+        return_value=RateTable("BRL", {"USD": 0.2}, next_update=time.time() + 3600),
+    )
+    GeoController().fetch_rate_table_coalesced("BRL")
+
+    rate_store.clear()
+    mock_fetch = mocker.patch("controllers.geoloc_controller.GeoController.fetch_rate_table")
+
+    assert GeoController().get_exchanges("BRL") == {"USD": 0.2}
+    mock_fetch.assert_not_called()
+
+
+def test_refresh_uses_table_published_by_another_worker(tmp_path, mocker):
+    """Testa que o refresher usa a tabela que outro processo já gravou no cache compartilhado."""
+
+    shared = SQLiteCache("rates", str(tmp_path / "cache.sqlite3"))
+    mocker.patch("controllers.geoloc_controller.shared_rates", shared)
+    rate_store.clear()
+    rate_store.put(RateTable("BRL", {"USD": 0.19}, fetched_at=time.time() - 3600, next_update=time.time() + 60))
+    shared.set("BRL", RateTable("BRL", {"USD": 0.2}, next_update=time.time() + 3600).to_dict(), 3600)
+    mock_fetch = mocker.patch("controllers.geoloc_controller.GeoController.fetch_rate_table")
+
+    assert rate_refresher.refresh("BRL")
+    assert rate_store.get("BRL").rates == {"USD": 0.2}
+    mock_fetch.assert_not_called()
+
+
+def test_get_conversion_as_of_uses_rate_history(mocker):
+    """Testa que a conversão em uma data usa o snapshot do histórico sem chamar o serviço de câmbio."""
+
+    as_of = datetime(2024, 1, 10, tzinfo=timezone.utc)
+    mock_find = mocker.patch.object(rate_history, "find", return_value=RateTable("BRL", {"USD": 0.19}))
+    mock_fetch = mocker.patch("controllers.geoloc_controller.GeoController.fetch_rate_table")
+
+    assert GeoController().get_conversion("BRL", "USD", 100.0, as_of) == pytest.approx(19.0)
+    mock_find.assert_called_once_with("BRL", as_of)
+    mock_fetch.assert_not_called()
+
+
+def test_get_conversion_as_of_without_snapshot(mocker):
+    """Testa o erro quando não há snapshot registrado até a data pedida."""
+
+    mocker.patch.object(rate_history, "find", return_value=None)
+
+    with pytest.raises(TaxNotFound):
+        GeoController().get_conversion("BRL", "USD", 100.0, datetime(2000, 1, 1, tzinfo=timezone.utc))
+
+
+def test_fetched_rate_table_is_recorded(mocker):
+    """Testa que cada tabela buscada no serviço de câmbio é enviada ao histórico."""
+
+    table = RateTable("BRL", {"USD": 0.2}, updated_at=1700000000)
+    mocker.patch("controllers.geoloc_controller.GeoController.fetch_rate_table", return_value=table)
+    mock_record = mocker.patch.object(rate_history, "record")
+
+    GeoController().fetch_rate_table_coalesced("BRL")
+
+    mock_record.assert_called_once_with(table)
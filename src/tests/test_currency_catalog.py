@@ -0,0 +1,69 @@
+from unittest.mock import MagicMock
+import pytest
+from pymongo.errors import OperationFailure
+from database.currency_catalog import ensure_indexes, load_catalog, remove_duplicates, sync_catalog
+from settings import settings
+
+
+def test_bundled_catalog():
+    """Testa que o catálogo incluído cobre os países sem duplicatas."""
+
+    rows = load_catalog(settings.CURRENCY_CATALOG_FILE)
+    countries = [row["country_iso2"] for row in rows]
+
+    assert len(countries) == len(set(countries))
+    assert {"country_iso2": "BR", "currency": "BRL", "country": "Brasil"} in rows
+    assert {"country_iso2": "DE", "currency": "EUR", "country": "Alemanha"} in rows
+
+
+def test_load_catalog_invalid_row(tmp_path):
+    """Testa o erro ao ler um catálogo com linha sem moeda."""
+
+    path = tmp_path / "catalog.csv"
+    path.write_text("country_iso2,currency,country\nbr,,Brasil\n", encoding="utf-8")
+
+    with pytest.raises(ValueError):
+        load_catalog(str(path))
+
+
+def test_ensure_indexes_with_duplicates():
+    """Testa que a falha do índice único por duplicatas não interrompe a inicialização."""
+
+    collection = MagicMock()
+    collection.create_index.side_effect = [None, OperationFailure("E11000 duplicate key")]
+
+    assert ensure_indexes(collection) is False
+    assert collection.create_index.call_count == 2
+
+
+def test_remove_duplicates_keeps_oldest():
+    """Testa que só o documento mais antigo de cada país é mantido."""
+
+    collection = MagicMock()
+    collection.aggregate.return_value = [{"_id": "BR", "ids": [1, 5, 7], "count": 3}]
+    collection.delete_many.return_value.deleted_count = 2
+
+    assert remove_duplicates(collection) == 2
+    collection.delete_many.assert_called_once_with({"_id": {"$in": [5, 7]}})
+
+
+def test_sync_catalog_batches_upserts():
+    """Testa a sincronização com upserts agrupados em lotes e a duração informada."""
+
+    collection = MagicMock()
+    collection.aggregate.return_value = []
+    collection.bulk_write.return_value = MagicMock(matched_count=1, modified_count=0, upserted_count=1)
+    rows = [{"country_iso2": code, "currency": "EUR", "country": code} for code in ["DE", "FR", "IT"]]
+    ticks = iter([10.0, 10.25])
+
+    stats = sync_catalog(collection, rows, batch_size=2, timer=lambda: next(ticks))
+
+    assert collection.bulk_write.call_count == 2
+    operations = collection.bulk_write.call_args_list[0].args[0]
+    assert len(operations) == 2
+    assert operations[0]._filter == {"country_iso2": "DE"}
+    assert operations[0]._upsert is True
+    assert stats == {
+        "rows": 3, "matched": 2, "modified": 0, "upserted": 2,
+        "duplicates_removed": 0, "unique_index": True, "elapsed": 0.25,
+    }
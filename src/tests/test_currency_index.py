@@ -0,0 +1,87 @@
+from pymongo.errors import OperationFailure
+from database import models
+from database.currency_index import CurrencyIndex
+from utils.metrics import mongo_latency
+
+
+class FakeDatabase:
+    def __init__(self, collection):
+        self.collection = collection
+
+    def command(self, name, collections):
+        if self.collection.version is None:
+            raise OperationFailure("dbHash indisponível")
+        return {"collections": {self.collection.name: self.collection.version}}
+
+
+class FakeCollection:
+    name = "currency"
+
+    def __init__(self, items, version="v1"):
+        self.items = items
+        self.version = version
+        self.queries = 0
+        self.database = FakeDatabase(self)
+
+    def find(self, query):
+        self.queries += 1
+        return [dict(item) for item in self.items]
+
+
+def test_index_find_by_country():
+    """Testa a busca de moeda por país no índice em memória."""
+
+    collection = FakeCollection([
+        {"_id": 1, "currency": "EUR", "country_iso2": "FR", "country": "França"},
+        {"_id": 2, "currency": "EUR", "country_iso2": "DE", "country": "Alemanha"},
+    ])
+    index = CurrencyIndex(lambda: collection)
+    index.load()
+
+    assert index.find_by_country("FR") == {"_id": "1", "currency": "EUR", "country_iso2": "FR", "country": "França"}
+    assert index.find_by_country("BR") == {}
+    assert index.countries_by_currency("EUR") == ["FR", "DE"]
+    assert collection.queries == 1
+
+
+def test_index_poll_reloads_on_version_change():
+    """Testa que o índice só é recarregado quando a versão da coleção muda."""
+
+    collection = FakeCollection([{"_id": 1, "currency": "BRL", "country_iso2": "BR", "country": "Brasil"}])
+    index = CurrencyIndex(lambda: collection)
+
+    assert index.poll() is True
+    assert index.poll() is False
+
+    collection.items[0]["currency"] = "USD"
+    collection.version = "v2"
+
+    assert index.poll() is True
+    assert index.find_by_country("BR")["currency"] == "USD"
+    assert index.generation == 2
+    assert index.documents == [{"_id": "1", "currency": "USD", "country_iso2": "BR", "country": "Brasil"}]
+
+
+def test_index_poll_without_version():
+    """Testa que sem versão disponível o índice é recarregado a cada verificação."""
+
+    collection = FakeCollection([{"_id": 1, "currency": "BRL", "country_iso2": "BR", "country": "Brasil"}], version=None)
+    index = CurrencyIndex(lambda: collection)
+    index.load()
+
+    assert index.poll() is True
+    assert collection.queries == 2
+
+
+def test_index_hits_are_not_timed_as_mongo(mocker):
+    """Testa que as consultas atendidas pelo índice em memória não entram na latência do MongoDB."""
+
+    index = CurrencyIndex(lambda: FakeCollection([{"_id": 1, "currency": "EUR", "country_iso2": "FR", "country": "França"}]))
+    index.load()
+    mocker.patch.object(models, "currency_index", index)
+    timings = [mongo_latency.labels(operation) for operation in ("find_by_country", "find_currencies")]
+    before = [sum(timing.counts) for timing in timings]
+
+    assert models.Currency.find_by_country("FR")["currency"] == "EUR"
+    assert models.Currency.find_currencies() == ["EUR"]
+    assert [sum(timing.counts) for timing in timings] == before
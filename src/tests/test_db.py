@@ -0,0 +1,36 @@
+from database.db import MongoDBManager
+
+
+def test_get_client_reused_per_process():
+    """Testa que o cliente do MongoDB é compartilhado dentro do processo."""
+
+    client = MongoDBManager.get_client("mongodb://localhost:27017/?appname=teste")
+
+    assert MongoDBManager.get_client("mongodb://localhost:27017/?appname=teste") is client
+    assert MongoDBManager("mongodb://localhost:27017/?appname=teste", "geoloc-test", "currency").client is client
+
+
+def test_get_client_recreated_after_fork(mocker):
+    """Testa que um novo cliente é criado no processo filho após um fork."""
+
+    client = MongoDBManager.get_client("mongodb://localhost:27017/?appname=teste")
+    mocker.patch("database.db.os.getpid", return_value=-1)
+
+    assert MongoDBManager.get_client("mongodb://localhost:27017/?appname=teste") is not client
+
+
+def test_get_client_pool_options():
+    """Testa que as configurações de pool são aplicadas ao cliente."""
+
+    client = MongoDBManager.get_client("mongodb://localhost:27017/?appname=pool", maxPoolSize=7, minPoolSize=1)
+
+    assert client.options.pool_options.max_pool_size == 7
+    assert client.options.pool_options.min_pool_size == 1
+
+
+def test_ping_unavailable():
+    """Testa a verificação de prontidão com o MongoDB indisponível."""
+
+    MongoDBManager.get_client("mongodb://localhost:1", serverSelectionTimeoutMS=100)
+
+    assert MongoDBManager.ping("mongodb://localhost:1") is False
@@ -0,0 +1,194 @@
+import asyncio
+import threading
+import time
+import pytest
+from pymongo.errors import ExecutionTimeout, PyMongoError
+from utils import deadline
+from utils.admission import Admission, AsyncRouteLimiter, RouteLimiter, parse_limits
+from utils.exceptions import DeadlineExceeded, ServiceOverloaded
+
+
+@pytest.fixture
+def budget():
+    """Fixture para executar o teste com um prazo de requisição ativo."""
+    tokens = []
+
+    def start(seconds):
+        tokens.append(deadline.start(seconds))
+
+    yield start
+    for token in reversed(tokens):
+        deadline.end(token)
+
+
+def test_parse_routes_and_limits():
+    """Testa a leitura dos valores por rota das configurações."""
+
+    assert deadline.parse_routes("/a=1.5, /b=30,,invalido") == {"/a": 1.5, "/b": 30.0}
+    assert parse_limits("/tax_coords/batch=4,/conversion/stream=2:0") == {"/tax_coords/batch": (4, None), "/conversion/stream": (2, 0)}
+
+
+def test_request_timeout_from_header():
+    """Testa o prazo pelo header em milissegundos, limitado ao padrão da rota."""
+
+    header = "X-Request-Timeout"
+
+    assert deadline.request_timeout({header: "1500"}, header, 10) == 1.5
+    assert deadline.request_timeout({header: "60000"}, header, 10) == 10
+    assert deadline.request_timeout({header: "-5"}, header, 10) == 0
+    assert deadline.request_timeout({header: "abc"}, header, 10) == 10
+    assert deadline.request_timeout({header: "nan"}, header, 10) == 10
+    assert deadline.request_timeout({}, header, 10) == 10
+
+
+def test_clamp_without_deadline():
+    """Testa que sem prazo ativo os timeouts não são alterados."""
+
+    assert deadline.remaining() is None
+    assert deadline.clamp((2, 5), "teste") == (2, 5)
+    assert deadline.allows(100)
+
+
+def test_clamp_limits_timeouts_to_remaining(budget):
+    """Testa que os timeouts são limitados ao tempo restante do prazo."""
+
+    budget(1)
+    connect, read = deadline.clamp((2, 5), "teste")
+
+    assert 0.9 < connect <= 1 and connect == pytest.approx(read, abs=0.01)
+    assert deadline.clamp(0.5, "teste") == 0.5
+    assert not deadline.allows(2)
+
+
+def test_clamp_raises_when_expired(budget):
+    """Testa DeadlineExceeded com o prazo esgotado."""
+
+    budget(0)
+
+    assert deadline.expired()
+    with pytest.raises(DeadlineExceeded):
+        deadline.clamp((2, 5), "teste")
+
+
+def test_mongo_budget_translates_timeouts(budget, mocker):
+    """Testa que o timeout do MongoDB com o prazo esgotado vira DeadlineExceeded."""
+
+    budget(0.01)
+    mock_timeout = mocker.patch("utils.deadline.pymongo.timeout", wraps=deadline.pymongo.timeout)
+
+    with pytest.raises(DeadlineExceeded):
+        with deadline.mongo_budget():
+            time.sleep(0.02)
+            raise ExecutionTimeout("operation exceeded time limit")
+
+    assert 0 < mock_timeout.call_args.args[0] <= 0.01
+
+
+def test_mongo_budget_keeps_other_errors(budget):
+    """Testa que outros erros do MongoDB são propagados sem alteração."""
+
+    budget(10)
+
+    with pytest.raises(PyMongoError):
+        with deadline.mongo_budget():
+            raise PyMongoError("falha")
+
+
+def test_bounded_async_function(budget):
+    """Testa o decorador em funções assíncronas com o prazo esgotado."""
+
+    @deadline.bounded
+    async def find():
+        return "BRL"
+
+    assert asyncio.run(find()) == "BRL"
+    budget(0)
+    with pytest.raises(DeadlineExceeded):
+        asyncio.run(find())
+
+
+def test_route_limiter_queue_full_and_timeout():
+    """Testa a recusa com a fila cheia e com o tempo de espera esgotado."""
+
+    limiter = RouteLimiter("/teste", concurrency=1, queue_size=1)
+    limiter.acquire()
+    waiting = threading.Thread(target=lambda: pytest.raises(ServiceOverloaded, limiter.acquire, 0.2))
+    waiting.start()
+    time.sleep(0.05)
+
+    with pytest.raises(ServiceOverloaded) as error:
+        limiter.acquire(1)
+    assert error.value.reason == "queue_full"
+
+    waiting.join()
+    assert limiter.stats() == {"active": 1, "waiting": 0, "concurrency": 1, "queue_size": 1}
+
+
+def test_route_limiter_admits_after_release():
+    """Testa que a requisição na fila é admitida quando uma vaga é liberada."""
+
+    limiter = RouteLimiter("/teste", concurrency=1, queue_size=4)
+    limiter.acquire()
+    admitted = []
+    waiting = threading.Thread(target=lambda: admitted.append(limiter.acquire(1)))
+    waiting.start()
+    time.sleep(0.05)
+    limiter.release()
+    waiting.join()
+
+    assert admitted == [limiter]
+    assert limiter.active == 1
+
+
+def test_async_route_limiter_hands_slot_in_order():
+    """Testa que no limitador assíncrono a vaga passa para a primeira da fila."""
+
+    async def scenario():
+        limiter = AsyncRouteLimiter("/teste", concurrency=1, queue_size=1)
+        await limiter.acquire()
+        waiter = asyncio.ensure_future(limiter.acquire(1))
+        await asyncio.sleep(0)
+        with pytest.raises(ServiceOverloaded) as error:
+            await limiter.acquire(1)
+        limiter.release()
+        await waiter
+        return error.value.reason, limiter.stats()
+
+    reason, stats = asyncio.run(scenario())
+
+    assert reason == "queue_full"
+    assert stats["active"] == 1 and stats["waiting"] == 0
+
+
+def test_async_route_limiter_timeout():
+    """Testa a recusa por tempo de espera no limitador assíncrono."""
+
+    async def scenario():
+        limiter = AsyncRouteLimiter("/teste", concurrency=1, queue_size=2)
+        await limiter.acquire()
+        with pytest.raises(ServiceOverloaded) as error:
+            await limiter.acquire(0.01)
+        limiter.release()
+        return error.value.reason, limiter.stats()
+
+    reason, stats = asyncio.run(scenario())
+
+    assert reason == "queue_timeout"
+    assert stats["active"] == 0 and stats["waiting"] == 0
+
+
+def test_admission_sheds_without_budget():
+    """Testa a recusa imediata quando o prazo restante não comporta o atendimento."""
+
+    controller = Admission(concurrency=1, queue_size=0, min_budget=0.05, route_limits={"/lote": (2, 1)})
+
+    with pytest.raises(ServiceOverloaded) as error:
+        controller.acquire("/teste", 0.01)
+    assert error.value.reason == "deadline"
+
+    limiter = controller.acquire("/teste", 5)
+    assert controller.acquire("/lote", None).concurrency == 2
+    with pytest.raises(ServiceOverloaded):
+        controller.acquire("/teste", 5)
+    limiter.release()
+    assert Admission(enabled=False).acquire("/teste", 5) is None
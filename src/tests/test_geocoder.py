@@ -0,0 +1,56 @@
+import pytest
+from settings import settings
+from utils.geocoder import ReverseGeocoder
+
+
+@pytest.fixture(scope="module")
+def geocoder():
+    """Fixture para carregar a base local de fronteiras uma única vez."""
+    geocoder = ReverseGeocoder(cell_size=5.0, border_margin=0.2)
+    geocoder.load(settings.GEOCODER_BOUNDARIES_FILE)
+    return geocoder
+
+
+@pytest.mark.parametrize("latitude,longitude,country", [
+    ("-16.005031", "-48.052034", "BR"),
+    ("39.7392", "-104.9903", "US"),
+    ("48.8566", "2.3522", "FR"),
+    ("35.6895", "139.6917", "JP"),
+    ("-22.9068", "-43.1729", "BR"),
+    ("-33.8688", "151.2093", "AU"),
+])
+def test_lookup_country(geocoder, latitude, longitude, country):
+    """Testa a geocodificação reversa local dentro de um país."""
+
+    assert geocoder.lookup(latitude, longitude) == country
+
+
+def test_lookup_ocean(geocoder):
+    """Testa a geocodificação reversa local para um ponto no oceano."""
+
+    assert geocoder.lookup("0", "-30") is None
+
+
+def test_lookup_near_border(geocoder):
+    """Testa que pontos na fronteira ficam para o fallback."""
+
+    assert geocoder.lookup("-25.5478", "-54.5882") is None
+
+
+@pytest.mark.parametrize("city,latitude,longitude", [
+    ("Genebra", "46.2044", "6.1432"),
+    ("Singapura", "1.3521", "103.8198"),
+    ("Hong Kong", "22.3193", "114.1694"),
+    ("Windsor", "42.3149", "-83.0364"),
+    ("Vaticano", "41.9029", "12.4534"),
+])
+def test_lookup_ambiguous_cities(geocoder, city, latitude, longitude):
+    """Testa que cidades em fronteiras imprecisas na base ou em territórios pequenos demais para ela ficam para o fallback."""
+
+    assert geocoder.lookup(latitude, longitude) is None
+
+
+def test_lookup_not_loaded():
+    """Testa a geocodificação reversa local sem base carregada."""
+
+    assert ReverseGeocoder().lookup("-16.005031", "-48.052034") is None
@@ -0,0 +1,280 @@
+import asyncio
+import threading
+import time
+import httpx
+import pytest
+import requests
+from utils import deadline
+from utils.circuit_breaker import CLOSED, HALF_OPEN, CircuitBreaker
+from utils.exceptions import CircuitOpenError, DeadlineExceeded, QuotaExceeded
+from utils.hedging import LatencyTracker
+from utils.async_http_client import AsyncUpstreamClient
+from utils.http_client import UpstreamClient, describe_error
+from utils.quota import QuotaLimiter
+
+
+class FakeTimer:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+class FakeResponse:
+    def __init__(self, status_code, body=None):
+        self.status_code = status_code
+        self.body = body
+
+
+@pytest.fixture(autouse=True)
+def no_sleep(mocker):
+    """Fixture para não esperar o backoff entre tentativas."""
+    return mocker.patch("utils.http_client.time").sleep
+
+
+def test_get_with_timeouts(mocker):
+    """Testa que as chamadas usam os timeouts de conexão e leitura configurados."""
+
+    client = UpstreamClient("teste", connect_timeout=1, read_timeout=3)
+    mock_get = mocker.patch.object(client.session, "get", return_value=FakeResponse(200))
+
+    response = client.get("http://upstream/")
+
+    assert response.status_code == 200
+    mock_get.assert_called_once_with("http://upstream/", timeout=(1, 3))
+
+
+def test_get_retries_server_errors(mocker, no_sleep):
+    """Testa novas tentativas para respostas 5xx."""
+
+    client = UpstreamClient("teste", retries=2)
+    mock_get = mocker.patch.object(client.session, "get", side_effect=[FakeResponse(503), FakeResponse(200)])
+
+    assert client.get("http://upstream/").status_code == 200
+    assert mock_get.call_count == 2
+    assert no_sleep.call_count == 1
+
+
+def test_get_does_not_retry_client_errors(mocker):
+    """Testa que respostas 4xx não geram novas tentativas."""
+
+    client = UpstreamClient("teste", retries=2)
+    mock_get = mocker.patch.object(client.session, "get", return_value=FakeResponse(404))
+
+    assert client.get("http://upstream/").status_code == 404
+    assert mock_get.call_count == 1
+
+
+def test_get_raises_after_retries(mocker):
+    """Testa que a falha de conexão é propagada após esgotar as tentativas."""
+
+    client = UpstreamClient("teste", retries=1)
+    mock_get = mocker.patch.object(client.session, "get", side_effect=requests.ConnectionError("recusada"))
+
+    with pytest.raises(requests.ConnectionError):
+        client.get("http://upstream/")
+    assert mock_get.call_count == 2
+
+
+def test_retry_log_hides_api_keys(mocker, caplog):
+    """Testa que o log das novas tentativas traz o tipo do erro e o host, sem a URL com a chave."""
+
+    url = "https://v6.exchangerate-api.com/v6/chave-secreta/latest/USD"
+    client = UpstreamClient("teste", retries=1)
+    error = requests.ConnectionError(f"Max retries exceeded with url: {url}", request=requests.Request("GET", url))
+    mocker.patch.object(client.session, "get", side_effect=[error, FakeResponse(200)])
+
+    assert client.get(url).status_code == 200
+    assert "ConnectionError (v6.exchangerate-api.com)" in caplog.text
+    assert "chave-secreta" not in caplog.text
+
+
+def test_describe_error():
+    """Testa a descrição das exceções para os logs com e sem requisição associada."""
+
+    google = "https://maps.googleapis.com/maps/api/geocode/json?latlng=1,2&key=chave-secreta"
+
+    assert describe_error(httpx.ConnectError(f"falha em {google}", request=httpx.Request("GET", google))) == "ConnectError (maps.googleapis.com)"
+    assert describe_error(httpx.ReadTimeout(f"falha em {google}")) == "ReadTimeout"
+    assert describe_error(requests.Timeout(f"falha em {google}")) == "Timeout"
+    assert describe_error(ValueError("País não encontrado")) == "País não encontrado"
+
+
+def test_get_fails_fast_with_open_circuit(mocker):
+    """Testa que o circuito aberto impede a chamada ao serviço externo."""
+
+    breaker = CircuitBreaker("teste", window=2, min_calls=2)
+    client = UpstreamClient("teste", retries=0, breaker=breaker)
+    mock_get = mocker.patch.object(client.session, "get", return_value=FakeResponse(503))
+
+    client.get("http://upstream/")
+    client.get("http://upstream/")
+    with pytest.raises(CircuitOpenError):
+        client.get("http://upstream/")
+    assert mock_get.call_count == 2
+
+
+def test_get_stops_retrying_when_circuit_opens(mocker):
+    """Testa que as novas tentativas param quando o circuito abre no meio da chamada."""
+
+    breaker = CircuitBreaker("teste", window=2, min_calls=2)
+    client = UpstreamClient("teste", retries=5, breaker=breaker)
+    mock_get = mocker.patch.object(client.session, "get", side_effect=requests.ConnectionError("recusada"))
+
+    with pytest.raises(requests.ConnectionError):
+        client.get("http://upstream/")
+    assert mock_get.call_count == 2
+    assert breaker.state == "open"
+
+
+def test_get_hedges_slow_requests(mocker):
+    """Testa que uma requisição lenta dispara um hedge e a resposta mais rápida é usada."""
+
+    slow = threading.Event()
+    responses = iter([("lenta", slow), ("rapida", None)])
+
+    def fake_get(url, **kwargs):
+        body, wait = next(responses)
+        if wait:
+            wait.wait(2)
+        return FakeResponse(200, body)
+
+    tracker = LatencyTracker(min_samples=1, min_delay=0.01)
+    tracker.record(0.01)
+    client = UpstreamClient("teste", retries=0, hedge=tracker)
+    mocker.patch.object(client.session, "get", side_effect=fake_get)
+
+    response = client.get("http://upstream/")
+    slow.set()
+    client.close()
+
+    assert response.body == "rapida"
+
+
+def test_get_limits_timeouts_to_deadline(mocker):
+    """Testa que os timeouts de cada tentativa respeitam o prazo restante da requisição."""
+
+    client = UpstreamClient("teste", connect_timeout=2, read_timeout=5)
+    mock_get = mocker.patch.object(client.session, "get", return_value=FakeResponse(200))
+
+    token = deadline.start(1)
+    try:
+        client.get("http://upstream/")
+    finally:
+        deadline.end(token)
+
+    connect, read = mock_get.call_args.kwargs["timeout"]
+    assert 0.9 < connect <= 1 and 0.9 < read <= 1
+
+
+def test_get_raises_deadline_exceeded(mocker):
+    """Testa que o timeout causado pelo prazo esgotado não é repetido nem conta como falha do serviço."""
+
+    breaker = CircuitBreaker("teste", min_calls=1)
+    client = UpstreamClient("teste", retries=2, breaker=breaker)
+
+    def slow_get(url, **kwargs):
+        time.sleep(0.02)
+        raise requests.Timeout("tempo esgotado")
+
+    mock_get = mocker.patch.object(client.session, "get", side_effect=slow_get)
+
+    token = deadline.start(0.01)
+    try:
+        with pytest.raises(DeadlineExceeded):
+            client.get("http://upstream/")
+        with pytest.raises(DeadlineExceeded):
+            client.get("http://upstream/")
+    finally:
+        deadline.end(token)
+
+    assert mock_get.call_count == 1
+    assert breaker.stats()["failures"] == 0
+
+
+def test_get_skips_retry_beyond_deadline(mocker, no_sleep):
+    """Testa que não há nova tentativa quando o backoff passaria do prazo."""
+
+    client = UpstreamClient("teste", retries=2, backoff=10)
+    mocker.patch("utils.http_client.random.uniform", return_value=5)
+    mock_get = mocker.patch.object(client.session, "get", return_value=FakeResponse(503))
+
+    token = deadline.start(1)
+    try:
+        assert client.get("http://upstream/").status_code == 503
+    finally:
+        deadline.end(token)
+
+    assert mock_get.call_count == 1
+    assert no_sleep.call_count == 0
+
+
+@pytest.mark.parametrize("failure", ["deadline", "quota"])
+def test_half_open_probe_released_without_result(mocker, failure):
+    """Testa que a chamada de teste interrompida pelo prazo ou pela cota libera o circuito para a próxima."""
+
+    timer = FakeTimer()
+    breaker = CircuitBreaker("teste", window=1, min_calls=1, cooldown=30, timer=timer)
+    quota_timer = FakeTimer()
+    limiter = QuotaLimiter("teste", rate=1, burst=1, max_wait=0, timer=quota_timer)
+    client = UpstreamClient("teste", retries=0, breaker=breaker, quota=limiter)
+    mock_get = mocker.patch.object(client.session, "get", return_value=FakeResponse(200))
+    breaker.record_failure()
+    timer.now = 30
+
+    if failure == "deadline":
+        token = deadline.start(0)
+        try:
+            with pytest.raises(DeadlineExceeded):
+                client.get("http://upstream/")
+        finally:
+            deadline.end(token)
+    else:
+        limiter.acquire(0)
+        with pytest.raises(QuotaExceeded):
+            client.get("http://upstream/")
+    quota_timer.now += 1
+
+    assert breaker.state == HALF_OPEN
+    assert client.get("http://upstream/").status_code == 200
+    assert breaker.state == CLOSED
+    assert mock_get.call_count == 1
+
+
+def test_async_half_open_probe_released_on_deadline(mocker):
+    """Testa a liberação da chamada de teste no cliente assíncrono com o prazo esgotado."""
+
+    timer = FakeTimer()
+    breaker = CircuitBreaker("teste", window=1, min_calls=1, cooldown=30, timer=timer)
+    client = AsyncUpstreamClient("teste", retries=0, breaker=breaker)
+    client._client = mocker.Mock(get=mocker.AsyncMock(return_value=FakeResponse(200)))
+    breaker.record_failure()
+    timer.now = 30
+
+    async def scenario():
+        token = deadline.start(0)
+        try:
+            with pytest.raises(DeadlineExceeded):
+                await client.get("http://upstream/")
+        finally:
+            deadline.end(token)
+        return await client.get("http://upstream/")
+
+    assert asyncio.run(scenario()).status_code == 200
+    assert breaker.state == CLOSED
+
+
+def test_async_client_shares_retry_policy(mocker):
+    """Testa que o cliente assíncrono usa as mesmas decisões de nova tentativa, circuito e cota do síncrono."""
+
+    breaker = CircuitBreaker("teste", window=4, min_calls=4)
+    limiter = QuotaLimiter("teste", rate=10, burst=5)
+    client = AsyncUpstreamClient("teste", retries=2, backoff=0, breaker=breaker, quota=limiter)
+    mock_get = mocker.AsyncMock(side_effect=[FakeResponse(429), FakeResponse(503), FakeResponse(200)])
+    client._client = mocker.Mock(get=mock_get)
+
+    assert asyncio.run(client.get("http://upstream/")).status_code == 200
+    assert mock_get.call_count == 3
+    assert limiter.remaining()[0] < 1
+    assert breaker.state == CLOSED
@@ -0,0 +1,94 @@
+import asyncio
+import pytest
+from utils.metrics import Registry, timed
+
+
+def test_counter_and_gauge_render():
+    """Testa a exposição de contadores e gauges no formato do Prometheus."""
+
+    registry = Registry()
+    counter = registry.counter("geoloc_test_total", "Contador de teste", ["service", "status"])
+    gauge = registry.gauge("geoloc_test_in_flight", "Gauge de teste")
+
+    counter.labels("google", 200).inc()
+    counter.labels("google", "200").inc(2)
+    gauge.inc()
+    gauge.inc()
+    gauge.dec()
+
+    lines = registry.render().splitlines()
+
+    assert "# TYPE geoloc_test_total counter" in lines
+    assert 'geoloc_test_total{service="google",status="200"} 3.0' in lines
+    assert "geoloc_test_in_flight 1.0" in lines
+
+
+def test_histogram_buckets_are_cumulative():
+    """Testa que os buckets do histograma são cumulativos e incluem o limite."""
+
+    registry = Registry()
+    histogram = registry.histogram("geoloc_test_seconds", "Histograma de teste", ["route"], buckets=[0.1, 1])
+
+    for value in (0.05, 0.1, 0.5, 3):
+        histogram.labels("/conversion").observe(value)
+
+    lines = registry.render().splitlines()
+
+    assert 'geoloc_test_seconds_bucket{route="/conversion",le="0.1"} 2' in lines
+    assert 'geoloc_test_seconds_bucket{route="/conversion",le="1.0"} 3' in lines
+    assert 'geoloc_test_seconds_bucket{route="/conversion",le="+Inf"} 4' in lines
+    assert 'geoloc_test_seconds_sum{route="/conversion"} 3.65' in lines
+    assert 'geoloc_test_seconds_count{route="/conversion"} 4' in lines
+
+
+def test_labels_are_escaped_and_validated():
+    """Testa o escape dos valores dos labels e a validação da quantidade de labels."""
+
+    registry = Registry()
+    counter = registry.counter("geoloc_test_total", "Contador de teste", ["exception"])
+
+    counter.labels('Erro "x"\n').inc()
+
+    assert 'geoloc_test_total{exception="Erro \\"x\\"\\n"} 1.0' in registry.render()
+    with pytest.raises(ValueError):
+        counter.labels("a", "b")
+
+
+def test_callback_metric_is_collected_on_render():
+    """Testa que métricas por callback são lidas no momento da coleta."""
+
+    registry = Registry()
+    stats = {"hits": 1}
+    registry.callback("geoloc_test_hits_total", "Acertos", "counter", ["cache"], lambda: {("geocode",): stats["hits"]})
+
+    stats["hits"] = 5
+
+    assert 'geoloc_test_hits_total{cache="geocode"} 5' in registry.render()
+
+
+def test_timed_records_sync_async_and_errors():
+    """Testa o decorador de tempo em funções síncronas, assíncronas e com exceção."""
+
+    registry = Registry()
+    histogram = registry.histogram("geoloc_test_query_seconds", "Consultas", ["operation"])
+
+    @timed(histogram, "find")
+    def find():
+        return "ok"
+
+    @timed(histogram, "find")
+    async def find_async():
+        return "ok"
+
+    @timed(histogram, "fail")
+    def fail():
+        raise RuntimeError("erro")
+
+    assert find() == "ok"
+    assert asyncio.run(find_async()) == "ok"
+    with pytest.raises(RuntimeError):
+        fail()
+
+    output = registry.render()
+    assert 'geoloc_test_query_seconds_count{operation="find"} 2' in output
+    assert 'geoloc_test_query_seconds_count{operation="fail"} 1' in output
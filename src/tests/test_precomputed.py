@@ -0,0 +1,81 @@
+import gzip
+import json
+from flask import Flask, Response, request
+from utils.precomputed import PrecomputedCache, PrecomputedResponse
+
+app = Flask(__name__)
+
+
+def respond(precomputed, headers=None):
+    with app.test_request_context("/currencies", headers=headers or {}):
+        return precomputed.to_response(request, Response, max_age=300)
+
+
+def test_precomputed_response_body_and_etag():
+    """Testa que o corpo é serializado uma vez e o ETag depende apenas do conteúdo."""
+
+    payload = {"result": [{"currency": "BRL", "country_iso2": "BR"}]}
+
+    first, second = PrecomputedResponse(payload), PrecomputedResponse(payload)
+
+    assert json.loads(first.body) == payload
+    assert gzip.decompress(first.gzipped) == first.body
+    assert first.etag == second.etag
+    assert first.gzipped == second.gzipped
+    assert PrecomputedResponse({"result": []}).etag != first.etag
+
+
+def test_precomputed_response_headers():
+    """Testa os cabeçalhos de cache da resposta sem compressão."""
+
+    precomputed = PrecomputedResponse({"result": [1]})
+
+    response = respond(precomputed)
+
+    assert response.status_code == 200
+    assert response.get_data() == precomputed.body
+    assert response.headers["ETag"] == f'"{precomputed.etag}"'
+    assert response.headers["Cache-Control"] == "public, max-age=300"
+    assert "Content-Encoding" not in response.headers
+
+
+def test_precomputed_response_gzip():
+    """Testa que a versão comprimida é enviada quando o cliente aceita gzip."""
+
+    precomputed = PrecomputedResponse({"result": [1]})
+
+    response = respond(precomputed, {"Accept-Encoding": "gzip, deflate"})
+
+    assert response.headers["Content-Encoding"] == "gzip"
+    assert response.headers["Vary"] == "Accept-Encoding"
+    assert response.get_data() == precomputed.gzipped
+    assert response.headers["ETag"] == f'"{precomputed.etag}-gzip"'
+
+
+def test_precomputed_response_not_modified():
+    """Testa a resposta 304 quando o If-None-Match confere com o ETag."""
+
+    precomputed = PrecomputedResponse({"result": [1]})
+
+    response = respond(precomputed, {"If-None-Match": f'"{precomputed.etag}"'})
+
+    assert response.status_code == 304
+    assert response.get_data() == b""
+    assert response.headers["ETag"] == f'"{precomputed.etag}"'
+
+
+def test_precomputed_cache_rebuilds_on_version_change():
+    """Testa que a resposta só é remontada quando a versão dos dados muda."""
+
+    cache = PrecomputedCache()
+    builds = []
+
+    def build():
+        builds.append(1)
+        return {"result": [len(builds)]}
+
+    first = cache.get(1, build)
+    assert cache.get(1, build) is first
+    assert cache.get(2, build) is not first
+    assert len(builds) == 2
+    assert cache.get(3, lambda: None) is None
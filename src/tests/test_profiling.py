@@ -0,0 +1,74 @@
+import json
+from utils.profiling import NULL_SPAN, Profile, Profiler, make_token, record, span, verify_token
+
+
+def test_span_without_profile_is_noop():
+    """Testa que, sem profile ativo, os trechos não registram nada."""
+
+    assert span("validation") is NULL_SPAN
+    record("upstream.google", 0.0, 1.0)
+
+
+def test_verify_token():
+    """Testa a validação do token assinado que ativa o profiling."""
+
+    token = make_token("segredo", ttl=60, now=1000)
+
+    assert verify_token(token, "segredo", now=1030)
+    assert not verify_token(token, "segredo", now=1100)
+    assert not verify_token(token, "outro", now=1030)
+    assert not verify_token("abc.def", "segredo", now=1030)
+    assert not verify_token(token, "", now=1030)
+
+
+def test_profiler_spans_and_outputs(tmp_path):
+    """Testa o registro de trechos aninhados e os arquivos de trace e de pilhas gravados."""
+
+    profiler = Profiler(True, str(tmp_path), secret="segredo")
+    state = profiler.begin({"X-Profile": make_token("segredo"), "X-Profile-Options": "cprofile"}, "POST /conversion_by_country")
+    with span("validation"):
+        pass
+    with span("controller"):
+        with span("currency.find_by_country"):
+            pass
+    profile = profiler.end(state)
+
+    assert span("validation") is NULL_SPAN
+    assert [path for path, *_ in profile.spans] == [("validation",), ("controller", "currency.find_by_country"), ("controller",)]
+    folded = next(tmp_path.glob(f"*{profile.id}.folded")).read_text()
+    assert "POST /conversion_by_country;controller;currency.find_by_country " in folded
+    events = json.loads(next(tmp_path.glob(f"*{profile.id}.trace.json")).read_text())["traceEvents"]
+    assert [event["name"] for event in events][:2] == ["POST /conversion_by_country", "validation"]
+    assert list(tmp_path.glob(f"*{profile.id}.prof"))
+
+
+def test_profiler_disabled_or_unsigned(tmp_path):
+    """Testa que o profiling não é ativado desligado ou sem header válido."""
+
+    assert Profiler(False, str(tmp_path), secret="segredo").begin({"X-Profile": make_token("segredo")}, "GET /") is None
+    assert Profiler(True, str(tmp_path), secret="segredo").begin({"X-Profile": "1.abc"}, "GET /") is None
+
+
+def test_profiler_sampling(tmp_path):
+    """Testa a ativação por amostragem."""
+
+    profiler = Profiler(True, str(tmp_path), sample_rate=0.5, random=lambda: 0.1)
+    state = profiler.begin({}, "GET /currencies")
+
+    assert state is not None
+    profiler.end(state)
+
+
+def test_folded_self_time():
+    """Testa que cada linha de pilha contém apenas o tempo próprio do trecho."""
+
+    profile = Profile("GET /")
+    profile.add(("controller",), 0.0, 0.003)
+    profile.add(("controller", "upstream.exchange"), 0.001, 0.002)
+    profile.started, profile.ended = 0.0, 0.004
+
+    assert profile.folded().splitlines() == [
+        "GET / 1000",
+        "GET /;controller 2000",
+        "GET /;controller;upstream.exchange 1000",
+    ]
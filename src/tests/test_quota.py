@@ -0,0 +1,232 @@
+import asyncio
+import threading
+import time
+import pytest
+from utils import quota
+from utils.exceptions import QuotaExceeded
+from utils.http_client import UpstreamClient
+from settings import settings
+from utils.http_client import create_quota
+from utils.quota import QuotaLimiter, RedisQuotaState, SQLiteQuotaState
+
+
+class FakeTimer:
+    def __init__(self, now=0.0):
+        self.now = now
+
+    def __call__(self):
+        return self.now
+
+
+class FakeResponse:
+    def __init__(self, status_code):
+        self.status_code = status_code
+
+
+def test_disabled_limiter_does_not_limit():
+    """Testa que sem limites configurados o limitador não restringe as chamadas."""
+
+    limiter = QuotaLimiter("teste")
+
+    assert not limiter.enabled
+    assert all(limiter.acquire(0) == 0.0 for _ in range(100))
+    assert limiter.try_acquire()
+
+
+def test_token_bucket_refills_at_rate():
+    """Testa as rajadas até `burst` e a reposição de `rate` chamadas por segundo."""
+
+    timer = FakeTimer()
+    limiter = QuotaLimiter("teste", rate=10, burst=2, timer=timer)
+
+    limiter.acquire(0)
+    limiter.acquire(0)
+    with pytest.raises(QuotaExceeded) as error:
+        limiter.acquire(0)
+    assert error.value.reason == "timeout"
+
+    timer.now += 0.1
+    assert limiter.acquire(0) == 0.0
+    assert limiter.remaining() == (0.0, None)
+
+
+def test_reserve_is_kept_for_interactive_requests():
+    """Testa que lote e segundo plano não consomem a fração reservada do bucket."""
+
+    limiter = QuotaLimiter("teste", rate=10, burst=10, reserve=0.2, timer=FakeTimer())
+
+    with quota.priority(quota.BATCH):
+        for _ in range(8):
+            limiter.acquire(0)
+        with pytest.raises(QuotaExceeded):
+            limiter.acquire(0)
+        assert not limiter.try_acquire()
+
+    limiter.acquire(0)
+    limiter.acquire(0)
+    assert limiter.remaining()[0] == 0
+
+
+def test_monthly_quota_and_reserve():
+    """Testa a cota mensal, a reserva para as requisições interativas e a virada do mês."""
+
+    clock = FakeTimer(1767225600 - 10)  # 31/12/2025 23:59:50 UTC
+    limiter = QuotaLimiter("teste", monthly_quota=4, reserve=0.25, clock=clock)
+
+    with quota.priority(quota.BACKGROUND):
+        limiter.acquire(0)
+        limiter.acquire(0)
+        limiter.acquire(0)
+        with pytest.raises(QuotaExceeded) as error:
+            limiter.acquire(0)
+        assert error.value.reason == "monthly"
+
+    limiter.acquire(0)
+    with pytest.raises(QuotaExceeded):
+        limiter.acquire(0)
+    assert limiter.stats()["remaining_this_month"] == 0
+
+    clock.now += 20
+    limiter.acquire(0)
+    assert limiter.dump() == {"month": "2026-01", "used": 1}
+
+
+def test_interactive_requests_go_first():
+    """Testa que a chamada interativa é atendida antes da de segundo plano que já esperava."""
+
+    limiter = QuotaLimiter("teste", rate=20, burst=1)
+    limiter.acquire(0)
+    order = []
+
+    def call(priority):
+        with quota.priority(priority):
+            limiter.acquire(1)
+        order.append(priority)
+
+    background = threading.Thread(target=call, args=(quota.BACKGROUND,))
+    background.start()
+    time.sleep(0.01)
+    interactive = threading.Thread(target=call, args=(quota.INTERACTIVE,))
+    interactive.start()
+    background.join()
+    interactive.join()
+
+    assert order == [quota.INTERACTIVE, quota.BACKGROUND]
+
+
+def test_async_acquire_waits_for_tokens():
+    """Testa a espera por cota na versão assíncrona."""
+
+    limiter = QuotaLimiter("teste", rate=50, burst=1)
+
+    async def run():
+        await limiter.acquire_async(0)
+        return await limiter.acquire_async(1)
+
+    assert 0 < asyncio.run(run()) < 0.5
+
+
+def test_restore_monthly_usage():
+    """Testa a retomada do consumo mensal a partir do snapshot."""
+
+    limiter = QuotaLimiter("teste", monthly_quota=100)
+    limiter.acquire(0)
+
+    assert limiter.restore({"month": limiter.month, "used": 40}) == 40
+    assert limiter.restore({"month": "2000-01", "used": 90}) == 40
+    assert limiter.remaining() == (None, 60)
+
+
+def test_client_uses_quota_and_backs_off_on_429(mocker):
+    """Testa que cada tentativa consome cota e que a resposta 429 esvazia o bucket."""
+
+    mocker.patch("utils.http_client.time")
+    limiter = QuotaLimiter("teste", rate=1, burst=5, max_wait=0.1)
+    client = UpstreamClient("teste", retries=1, quota=limiter)
+    mocker.patch.object(client.session, "get", side_effect=[FakeResponse(429), FakeResponse(200)])
+    mock_acquire = mocker.spy(limiter, "acquire")
+
+    with pytest.raises(QuotaExceeded):
+        client.get("http://upstream/")
+
+    assert mock_acquire.call_count == 2
+    assert limiter.remaining()[0] < 1
+
+
+def test_sqlite_quota_shared_between_processes(tmp_path):
+    """Testa que dois processos (limitadores) com o mesmo arquivo SQLite dividem o bucket e a cota mensal."""
+
+    path = str(tmp_path / "cache.sqlite3")
+    clock = FakeTimer(1767225600)
+    first = QuotaLimiter("teste", rate=1, burst=2, monthly_quota=3, state=SQLiteQuotaState("teste", path, clock=clock))
+    second = QuotaLimiter("teste", rate=1, burst=2, monthly_quota=3, state=SQLiteQuotaState("teste", path, clock=clock))
+
+    assert first.try_acquire()
+    assert second.try_acquire()
+    assert not first.try_acquire()
+
+    clock.now += 1
+    assert second.try_acquire()
+    clock.now += 1
+    with pytest.raises(QuotaExceeded) as error:
+        first.acquire(0)
+    assert error.value.reason == "monthly"
+    assert second.dump() == {"month": "2026-01", "used": 3}
+    assert QuotaLimiter("outro", rate=1, state=SQLiteQuotaState("outro", path, clock=clock)).try_acquire()
+
+
+def test_redis_quota_state(mocker):
+    """Testa a leitura da resposta do script do Redis e que a falha de conexão libera a chamada."""
+
+    client = mocker.Mock()
+    state = RedisQuotaState("teste", client=client, clock=FakeTimer(1767225600))
+
+    client.eval.return_value = [0, b"0.5", b"0.5", 2]
+    assert state.take(1, 2, 0, 0.0) == (False, 0.5)
+    assert client.eval.call_args.args[2:5] == ("quota:teste", "take", 1767225600)
+    client.eval.return_value = [0, b"month", b"2", 10]
+    assert state.take(1, 2, 10, 0.0) == (False, None)
+    assert state.read(1, 2) == (2.0, "2026-01", 10)
+
+    client.eval.side_effect = ConnectionError
+    assert state.take(1, 2, 10, 0.0) == (True, 0.0)
+
+
+def test_memory_quota_divided_between_workers(mocker):
+    """Testa que, sem backend compartilhado, cada worker fica com a sua parte das cotas."""
+
+    mocker.patch.object(settings, "CACHE_BACKEND", "memory")
+    mocker.patch.object(settings, "QUOTA_PROCESSES", 4)
+
+    limiter = create_quota("teste", 50, 0, 1000)
+
+    assert (limiter.rate, limiter.burst, limiter.monthly_quota) == (12.5, 12, 250)
+    assert create_quota("teste", 1, 2, 3).monthly_quota == 1
+
+
+def test_memory_quota_divided_by_gunicorn_workers(mocker, monkeypatch):
+    """Testa que, sem QUOTA_PROCESSES, as cotas são divididas pelos workers informados pelo gunicorn."""
+
+    mocker.patch.object(settings, "CACHE_BACKEND", "memory")
+    mocker.patch.object(settings, "QUOTA_PROCESSES", 0)
+    monkeypatch.setenv("GUNICORN_WORKERS", "5")
+
+    assert create_quota("teste", 50, 0, 1000).rate == 10
+
+
+def test_async_acquire_runs_shared_state_off_the_event_loop(tmp_path, mocker):
+    """Testa que, com o estado da cota compartilhado, as operações no SQLite rodam fora do event loop."""
+
+    state = SQLiteQuotaState("teste", str(tmp_path / "cache.sqlite3"))
+    limiter = QuotaLimiter("teste", rate=10, burst=2, state=state)
+    take = mocker.spy(state, "take")
+    threads = []
+    take.side_effect = lambda *args: threads.append(threading.get_ident()) or (True, 0.0)
+
+    async def run():
+        await limiter.acquire_async(0)
+        return await limiter.try_acquire_async()
+
+    assert asyncio.run(run())
+    assert len(threads) == 2
+    assert threading.get_ident() not in threads
@@ -0,0 +1,107 @@
+from datetime import datetime, timezone
+from unittest.mock import MagicMock
+from database.rate_history import CurrencyOrder, RateHistory, pack_rates, to_datetime, unpack_rates
+from utils.rates import RateTable
+
+
+class FakeOrderCollection:
+    def __init__(self, currencies=None):
+        self.currencies = list(currencies or [])
+
+    def find_one(self, query):
+        return {"_id": "rates", "currencies": list(self.currencies)} if self.currencies else None
+
+    def find_one_and_update(self, query, update, upsert, return_document):
+        self.currencies.extend(update["$push"]["currencies"]["$each"])
+        return {"_id": "rates", "currencies": list(self.currencies)}
+
+
+def test_pack_and_unpack_rates():
+    """Testa o vetor compacto de taxas na ordem compartilhada, sem as moedas ausentes."""
+
+    positions = {"BRL": 0, "EUR": 1, "USD": 2}
+    data = pack_rates({"BRL": 1.0, "USD": 0.2}, positions)
+
+    assert len(data) == 3 * 8
+    assert unpack_rates(data, ["BRL", "EUR", "USD"]) == {"BRL": 1.0, "USD": 0.2}
+
+
+def test_currency_order_only_grows():
+    """Testa que novas moedas vão para o fim da ordem e as posições existentes não mudam."""
+
+    collection = FakeOrderCollection(["BRL", "USD"])
+    order = CurrencyOrder(lambda: collection)
+
+    order.extend({"USD": 1, "EUR": 1, "ARS": 1})
+
+    assert order.currencies == ["BRL", "USD", "ARS", "EUR"]
+    assert order.positions["USD"] == 1
+
+
+def test_currency_order_duplicates_keep_first_position():
+    """Testa que moedas acrescentadas duas vezes por processos diferentes mantêm a primeira posição."""
+
+    order = CurrencyOrder(lambda: None)
+    order.update(["BRL", "USD", "USD"])
+
+    assert order.positions == {"BRL": 0, "USD": 1}
+    assert unpack_rates(pack_rates({"USD": 0.2}, order.positions), order.currencies) == {"USD": 0.2}
+
+
+def test_rate_history_save_and_find():
+    """Testa a gravação de um snapshot e a consulta do snapshot em vigor em uma data."""
+
+    order = FakeOrderCollection()
+    snapshots = MagicMock()
+    snapshots.find_one.return_value = None
+    db = {"rate_snapshots": snapshots, "rate_currency_order": order}
+    history = RateHistory(lambda: db)
+
+    assert history.save(RateTable("BRL", {"BRL": 1.0, "USD": 0.2}, fetched_at=1700000100, updated_at=1700000000))
+    document = snapshots.insert_one.call_args.args[0]
+    assert document["timestamp"] == to_datetime(1700000000)
+    assert document["base"] == "BRL"
+
+    snapshots.find_one.return_value = dict(document, timestamp=document["timestamp"].replace(tzinfo=None))
+    table = history.find("BRL", datetime(2023, 11, 20, tzinfo=timezone.utc))
+
+    assert table.rates == {"BRL": 1.0, "USD": 0.2}
+    assert table.updated_at == 1700000000
+    query = snapshots.find_one.call_args.args[0]
+    assert query == {"base": "BRL", "timestamp": {"$lte": datetime(2023, 11, 20, tzinfo=timezone.utc)}}
+    assert snapshots.find_one.call_args.kwargs["sort"] == [("timestamp", -1)]
+
+
+def test_rate_history_save_skips_existing_snapshot():
+    """Testa que a mesma atualização do serviço de câmbio não é gravada duas vezes."""
+
+    snapshots = MagicMock()
+    snapshots.find_one.return_value = {"_id": 1}
+    history = RateHistory(lambda: {"rate_snapshots": snapshots, "rate_currency_order": FakeOrderCollection()})
+
+    assert not history.save(RateTable("BRL", {"USD": 0.2}, updated_at=1700000000))
+    snapshots.insert_one.assert_not_called()
+
+
+def test_rate_history_record_once_per_update(mocker):
+    """Testa que cada atualização é enfileirada uma única vez e nada é enfileirado sem a thread."""
+
+    history = RateHistory(lambda: None)
+    table = RateTable("BRL", {"USD": 0.2}, updated_at=1700000000)
+
+    assert not history.record(table)
+
+    mocker.patch.object(RateHistory, "running", True)
+    assert history.record(table)
+    assert not history.record(RateTable("BRL", {"USD": 0.21}, updated_at=1700000000))
+    assert history.record(RateTable("BRL", {"USD": 0.21}, updated_at=1700086400))
+    assert history._queue.qsize() == 2
+
+
+def test_rate_table_updated_at_from_response():
+    """Testa que a data da atualização do serviço de câmbio é guardada na tabela."""
+
+    table = RateTable.from_response("BRL", {"conversion_rates": {"USD": 0.2}, "time_last_update_unix": 1700000000})
+
+    assert table.updated_at == 1700000000
+    assert RateTable.from_dict(table.to_dict()).updated_at == 1700000000
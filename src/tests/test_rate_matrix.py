@@ -0,0 +1,63 @@
+import pytest
+from utils.rate_matrix import RateMatrix, RateMatrixCache
+from utils.rates import RateStore, RateTable
+
+
+def test_matrix_cross_rates_by_pivot():
+    """Testa as taxas cruzadas calculadas pela moeda pivô."""
+
+    tables = {"USD": RateTable("USD", {"USD": 1, "BRL": 5.0, "EUR": 0.8})}
+
+    matrix = RateMatrix.build(tables, pivot="USD")
+
+    assert matrix.convert("BRL", [10.0], ["EUR", "USD"]) == {
+        "EUR": [pytest.approx(1.6)],
+        "USD": [pytest.approx(2.0)],
+    }
+
+
+def test_matrix_prefers_direct_rates():
+    """Testa que a taxa da própria tabela da moeda base tem prioridade sobre a cruzada."""
+
+    tables = {
+        "USD": RateTable("USD", {"USD": 1, "BRL": 5.0, "EUR": 0.8}),
+        "BRL": RateTable("BRL", {"BRL": 1, "EUR": 0.17}),
+    }
+
+    matrix = RateMatrix.build(tables, pivot="USD")
+
+    assert matrix.convert("BRL", [100.0, 200.0], ["EUR"]) == {"EUR": [pytest.approx(17.0), pytest.approx(34.0)]}
+
+
+def test_matrix_all_currencies_and_unknown():
+    """Testa a conversão para todas as moedas e para moedas sem taxa."""
+
+    matrix = RateMatrix.build({"USD": RateTable("USD", {"USD": 1, "BRL": 5.0})}, pivot="USD")
+
+    assert matrix.convert("USD", [2.0]) == {"BRL": [10.0], "USD": [2.0]}
+    assert matrix.convert("USD", [2.0], ["XYZ"]) == {"XYZ": None}
+    assert matrix.convert("XYZ", [2.0]) == {}
+
+
+def test_matrix_normalizes_currency_codes():
+    """Testa que moedas em minúsculas encontram as taxas, mantendo as chaves pedidas."""
+
+    matrix = RateMatrix.build({"USD": RateTable("USD", {"USD": 1, "BRL": 5.0})}, pivot="USD")
+
+    assert matrix.convert("usd", [2.0], ["brl"]) == {"brl": [10.0]}
+
+
+def test_matrix_cache_rebuilds_on_store_change():
+    """Testa que a matriz é reconstruída apenas quando as tabelas mudam."""
+
+    store = RateStore(pivot="USD")
+    store.put(RateTable("USD", {"USD": 1, "BRL": 5.0}))
+    cache = RateMatrixCache(store)
+
+    matrix = cache.get()
+    assert cache.get() is matrix
+
+    store.put(RateTable("USD", {"USD": 1, "BRL": 4.0}))
+
+    assert cache.get() is not matrix
+    assert cache.get().convert("USD", [1.0], ["BRL"]) == {"BRL": [4.0]}
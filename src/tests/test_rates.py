@@ -0,0 +1,66 @@
+from utils.rates import RateStore, RateTable
+
+
+def test_rate_from_base_table():
+    """Testa a taxa obtida diretamente da tabela da moeda base."""
+
+    store = RateStore(pivot="USD", timer=lambda: 100)
+    store.put(RateTable("BRL", {"BRL": 1, "USD": 0.2}, fetched_at=0, next_update=200))
+
+    assert store.rate("BRL", "USD") == 0.2
+    assert store.rate("BRL", "BRL") == 1.0
+
+
+def test_cross_rate_by_pivot():
+    """Testa a taxa cruzada calculada pela moeda pivô."""
+
+    store = RateStore(pivot="USD", timer=lambda: 100)
+    store.put(RateTable("USD", {"USD": 1, "BRL": 5.0, "EUR": 0.9}, fetched_at=0, next_update=200))
+
+    assert store.rate("BRL", "EUR") == 0.9 / 5.0
+
+
+def test_table_expires_at_next_update():
+    """Testa que a tabela expira no próximo horário de atualização do serviço."""
+
+    now = [100]
+    store = RateStore(pivot="USD", timer=lambda: now[0])
+    store.put(RateTable("BRL", {"USD": 0.2}, fetched_at=0, next_update=200))
+
+    now[0] = 201
+
+    assert store.get("BRL") is None
+    assert store.rate("BRL", "USD") is None
+
+
+def test_table_default_ttl():
+    """Testa o TTL padrão quando o serviço não informa a próxima atualização."""
+
+    store = RateStore(default_ttl=60, timer=lambda: 61)
+    store.put(RateTable("BRL", {"USD": 0.2}, fetched_at=0))
+
+    assert store.get("BRL") is None
+
+
+def test_currency_codes_are_normalized():
+    """Testa que as tabelas são guardadas e consultadas pelo código em maiúsculas."""
+
+    store = RateStore(pivot="USD", timer=lambda: 100)
+    store.put(RateTable.from_response("brl", {"base_code": "BRL", "conversion_rates": {"BRL": 1, "USD": 0.2}, "time_next_update_unix": 200}))
+    store.put(RateTable("usd", {"USD": 1, "BRL": 5.0, "EUR": 0.9}, fetched_at=0, next_update=200))
+
+    assert store.get("brl") is store.peek("BRL")
+    assert store.rate("brl", "usd") == 0.2
+    assert store.rate("eur", "brl") == 5.0 / 0.9
+    assert sorted(store.bases()) == ["BRL", "USD"]
+
+
+def test_same_currency_rate_requires_known_code():
+    """Testa que a taxa de uma moeda para ela mesma só é 1.0 para moedas conhecidas."""
+
+    store = RateStore(pivot="USD", timer=lambda: 100)
+    store.put(RateTable("USD", {"USD": 1, "BRL": 5.0}, fetched_at=0, next_update=200))
+
+    assert store.rate("BRL", "brl") == 1.0
+    assert store.rate("XYZ", "XYZ") is None
+    assert RateStore().rate("BRL", "BRL") is None
@@ -0,0 +1,90 @@
+from utils.rates import RateStore, RateTable
+from utils.refresher import RateRefresher
+
+
+def test_refresh_due_only_expiring_tables():
+    """Testa que apenas as tabelas perto de expirar são atualizadas."""
+
+    store = RateStore(timer=lambda: 1000)
+    store.put(RateTable("BRL", {"USD": 0.2}, next_update=5000))
+    store.put(RateTable("USD", {"BRL": 5.0}, next_update=1100))
+    fetched = []
+
+    def fetch(currency):
+        fetched.append(currency)
+        return RateTable(currency, {}, next_update=9000)
+
+    refresher = RateRefresher(store, fetch, lambda: ["BRL", "EUR"], refresh_ahead=300)
+    refresher.refresh_due()
+
+    assert fetched == ["EUR", "USD"]
+    assert store.peek("USD").next_update == 9000
+
+
+def test_refresh_backs_off_until_next_update():
+    """Testa que a tabela sem nova atualização publicada não é buscada de novo a cada ciclo."""
+
+    clock = [1000]
+    store = RateStore(timer=lambda: clock[0])
+    store.put(RateTable("BRL", {"USD": 0.2}, next_update=1100))
+    fetched = []
+
+    def fetch(currency):
+        fetched.append(currency)
+        return RateTable(currency, {"USD": 0.2}, next_update=1100 if clock[0] < 1100 else 4700)
+
+    refresher = RateRefresher(store, fetch, lambda: ["BRL"], interval=60, refresh_ahead=300)
+    refresher.refresh_due()
+    clock[0] = 1060
+    refresher.refresh_due()
+    assert fetched == ["BRL"]
+
+    clock[0] = 1100
+    refresher.refresh_due()
+    clock[0] = 1160
+    refresher.refresh_due()
+    assert fetched == ["BRL", "BRL"]
+    assert store.peek("BRL").next_update == 4700
+
+
+def test_refresh_keeps_last_snapshot_on_error():
+    """Testa que a última tabela válida é mantida quando o serviço falha."""
+
+    store = RateStore(timer=lambda: 1000)
+    table = RateTable("BRL", {"USD": 0.2}, next_update=1100)
+    store.put(table)
+
+    def fetch(currency):
+        raise Exception("Serviço indisponível")
+
+    refresher = RateRefresher(store, fetch, lambda: ["BRL"])
+
+    assert refresher.refresh("BRL") is False
+    assert store.peek("BRL") is table
+
+
+def test_request_refresh_when_stopped():
+    """Testa que pedidos de atualização são recusados sem a thread rodando."""
+
+    refresher = RateRefresher(RateStore(), lambda currency: None, lambda: [])
+
+    assert refresher.request_refresh("BRL") is False
+
+
+def test_refresh_backs_off_after_errors():
+    """Testa o recuo entre as tentativas de uma moeda cujo serviço está falhando."""
+
+    clock = [1000]
+    store = RateStore(timer=lambda: clock[0])
+    calls = []
+
+    def fetch(currency):
+        calls.append(clock[0])
+        raise Exception("Serviço indisponível")
+
+    refresher = RateRefresher(store, fetch, lambda: ["BRL"], interval=60, refresh_ahead=300)
+    for now in range(1000, 1700, 60):
+        clock[0] = now
+        refresher.refresh_due()
+
+    assert calls == [1000, 1120, 1360, 1660]
@@ -0,0 +1,53 @@
+import os
+import runpy
+from main import create_app, init_worker
+from settings import settings
+from utils.http_client import exchange_client, google_client
+
+CONFIG_FILE = os.path.join(os.path.dirname(os.path.dirname(__file__)), "gunicorn.conf.py")
+
+
+def test_create_app_without_background_services(mocker):
+    """Testa que a aplicação criada para o servidor de produção não inicia threads no master."""
+
+    start_index = mocker.patch("main.currency_index.start")
+    start_refresher = mocker.patch("main.rate_refresher.start")
+    mocker.patch.object(settings, "RATES_REFRESHER_ENABLED", True)
+
+    create_app(background=False)
+
+    start_index.assert_not_called()
+    start_refresher.assert_not_called()
+
+
+def test_init_worker_resets_pools_and_starts_services(mocker):
+    """Testa a inicialização do worker após o fork."""
+
+    start_refresher = mocker.patch("main.rate_refresher.start")
+    start_index = mocker.patch("main.currency_index.start")
+    mocker.patch.object(settings, "RATES_REFRESHER_ENABLED", True)
+    mocker.patch.object(settings, "CURRENCY_INDEX_ENABLED", True)
+    google_session, exchange_session = google_client.session, exchange_client.session
+
+    init_worker()
+
+    assert google_client.session is not google_session
+    assert exchange_client.session is not exchange_session
+    start_refresher.assert_called_once()
+    start_index.assert_called_once()
+
+
+def test_gunicorn_config_workers_from_cpu(mocker):
+    """Testa que o número de workers é calculado pelos núcleos de CPU quando não configurado."""
+
+    mocker.patch("multiprocessing.cpu_count", return_value=4)
+    mocker.patch.object(settings, "SERVER_WORKERS", 0)
+    mocker.patch.object(settings, "SERVER_THREADS", 4)
+
+    config = runpy.run_path(CONFIG_FILE)
+
+    assert config["workers"] == 9
+    assert config["raw_env"] == ["GUNICORN_WORKERS=9"]
+    assert settings.QUOTA_PROCESSES == 0
+    assert config["worker_class"] == "gthread"
+    assert config["max_requests"] == settings.SERVER_MAX_REQUESTS
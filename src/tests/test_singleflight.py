@@ -0,0 +1,178 @@
+import asyncio
+import threading
+import time
+import pytest
+from utils import deadline
+from utils.exceptions import DeadlineExceeded, QuotaExceeded
+from utils.singleflight import AsyncSingleFlight, SingleFlight
+
+
+def test_concurrent_calls_are_coalesced():
+    """Testa que chamadas simultâneas com a mesma chave executam uma única vez."""
+
+    flights = SingleFlight()
+    calls = []
+    results = []
+
+    def fetch():
+        calls.append(1)
+        time.sleep(0.05)
+        return "BRL"
+
+    threads = [threading.Thread(target=lambda: results.append(flights.do(("exchange", "BRL"), fetch))) for _ in range(5)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert results == ["BRL"] * 5
+    assert len(calls) == 1
+    assert flights.stats() == {"exchange": {"calls": 1, "coalesced": 4}}
+
+
+def test_error_is_shared_and_not_cached():
+    """Testa que a exceção é compartilhada e a chave é liberada ao final."""
+
+    flights = SingleFlight()
+
+    def fail():
+        raise ValueError("Serviço indisponível")
+
+    with pytest.raises(ValueError):
+        flights.do(("exchange", "BRL"), fail)
+
+    assert flights.do(("exchange", "BRL"), lambda: "BRL") == "BRL"
+    assert flights.stats()["exchange"]["calls"] == 2
+
+
+def test_async_calls_are_coalesced():
+    """Testa a versão assíncrona com corrotinas simultâneas."""
+
+    flights = AsyncSingleFlight()
+    calls = []
+
+    async def fetch():
+        calls.append(1)
+        await asyncio.sleep(0.01)
+        return "BR"
+
+    async def run():
+        return await asyncio.gather(*(flights.do(("google", (1, 2)), fetch) for _ in range(3)))
+
+    assert asyncio.run(run()) == ["BR"] * 3
+    assert len(calls) == 1
+    assert flights.stats() == {"google": {"calls": 1, "coalesced": 2}}
+
+
+def test_waiting_call_respects_deadline():
+    """Testa que quem espera a chamada em andamento desiste quando o prazo da requisição acaba."""
+
+    flights = SingleFlight()
+    started = threading.Event()
+    release = threading.Event()
+
+    def fetch():
+        started.set()
+        release.wait(1)
+        return "BRL"
+
+    leader = threading.Thread(target=lambda: flights.do(("exchange", "BRL"), fetch))
+    leader.start()
+    started.wait(1)
+
+    token = deadline.start(0.02)
+    try:
+        with pytest.raises(DeadlineExceeded):
+            flights.do(("exchange", "BRL"), fetch)
+    finally:
+        deadline.end(token)
+        release.set()
+        leader.join()
+
+
+def test_async_waiting_call_respects_deadline():
+    """Testa o prazo na versão assíncrona; a chamada continua para as demais."""
+
+    flights = AsyncSingleFlight()
+
+    async def fetch():
+        await asyncio.sleep(0.05)
+        return "BR"
+
+    async def run():
+        leader = asyncio.ensure_future(flights.do(("google", (1, 2)), fetch))
+        await asyncio.sleep(0)
+        token = deadline.start(0.01)
+        try:
+            with pytest.raises(DeadlineExceeded):
+                await flights.do(("google", (1, 2)), fetch)
+        finally:
+            deadline.end(token)
+        return await leader
+
+    assert asyncio.run(run()) == "BR"
+
+
+@pytest.mark.parametrize("error", [DeadlineExceeded, QuotaExceeded])
+def test_follower_retries_after_caller_error(error):
+    """Testa que o prazo ou a cota esgotados de quem fez a chamada não são repassados a quem esperava."""
+
+    flights = SingleFlight()
+    started = threading.Event()
+    release = threading.Event()
+    calls = []
+
+    def fetch():
+        calls.append(1)
+        if len(calls) == 1:
+            started.set()
+            release.wait(1)
+            raise error()
+        return "BRL"
+
+    errors = []
+    leader = threading.Thread(target=lambda: errors.append(pytest.raises(error, flights.do, ("exchange", "BRL"), fetch)))
+    leader.start()
+    started.wait(1)
+    follower = []
+    waiting = threading.Thread(target=lambda: follower.append(flights.do(("exchange", "BRL"), fetch)))
+    waiting.start()
+    time.sleep(0.02)
+    release.set()
+    leader.join()
+    waiting.join()
+
+    assert len(errors) == 1
+    assert follower == ["BRL"]
+    assert len(calls) == 2
+
+
+def test_async_follower_retries_after_leader_deadline():
+    """Testa na versão assíncrona que quem esperava refaz a chamada com o próprio prazo."""
+
+    flights = AsyncSingleFlight()
+    calls = []
+
+    async def fetch():
+        calls.append(1)
+        await asyncio.sleep(0.02)
+        deadline.check("teste")
+        return "BR"
+
+    async def leader():
+        token = deadline.start(0.01)
+        try:
+            return await flights.do(("google", (1, 2)), fetch)
+        finally:
+            deadline.end(token)
+
+    async def run():
+        first = asyncio.ensure_future(leader())
+        await asyncio.sleep(0)
+        second = await flights.do(("google", (1, 2)), fetch)
+        with pytest.raises(DeadlineExceeded):
+            await first
+        return second
+
+    assert asyncio.run(run()) == "BR"
+    assert len(calls) == 2
@@ -0,0 +1,98 @@
+import time
+import pytest
+from controllers.geoloc_controller import geocode_cache, rate_store, warm_start
+from database.models import currency_index
+from utils.cache import TTLCache
+from utils.rates import RateTable
+from utils.snapshot import HEADER, SnapshotError, WarmStart, read_snapshot, write_snapshot
+
+
+def test_write_and_read_snapshot(tmp_path):
+    """Testa a gravação e a leitura do arquivo de snapshot."""
+
+    path = str(tmp_path / "snapshot.bin")
+
+    size = write_snapshot(path, {"rates": [{"base": "BRL"}]}, created_at=1700000000.0)
+
+    assert size == (tmp_path / "snapshot.bin").stat().st_size
+    assert read_snapshot(path) == (1700000000.0, {"rates": [{"base": "BRL"}]})
+
+
+def test_read_snapshot_rejects_corrupted_file(tmp_path):
+    """Testa que um snapshot com conteúdo alterado é rejeitado pelo crc32."""
+
+    path = tmp_path / "snapshot.bin"
+    write_snapshot(str(path), {"geocode": []})
+    data = bytearray(path.read_bytes())
+    data[HEADER.size] ^= 0xFF
+    path.write_bytes(bytes(data))
+
+    with pytest.raises(SnapshotError):
+        read_snapshot(str(path))
+
+
+def test_warm_start_ignores_old_snapshot(tmp_path):
+    """Testa que snapshots mais velhos que o limite não são restaurados."""
+
+    path = str(tmp_path / "snapshot.bin")
+    restored = []
+    writer = WarmStart(path, max_age=60, timer=lambda: 1000.0)
+    writer.register("items", lambda: [1, 2], lambda data, age: restored.extend(data) or len(data))
+    writer.save()
+
+    reader = WarmStart(path, max_age=60, timer=lambda: 1100.0)
+    reader.register("items", lambda: [], lambda data, age: restored.extend(data) or len(data))
+
+    assert reader.restore() == {}
+    assert restored == []
+
+
+def test_warm_start_missing_file(tmp_path):
+    """Testa a inicialização sem snapshot gravado."""
+
+    assert WarmStart(str(tmp_path / "nada.bin")).restore() == {}
+
+
+def test_ttl_cache_items_and_restore():
+    """Testa a exportação das entradas válidas do cache com o tempo restante."""
+
+    now = [100.0]
+    cache = TTLCache(ttl=60, timer=lambda: now[0])
+    cache.set("a", 1)
+    cache.set("b", 2, ttl=10)
+    now[0] = 105.0
+
+    items = cache.items()
+    assert items == [("a", 1, 55.0), ("b", 2, 5.0)]
+
+    restored = TTLCache(ttl=60, timer=lambda: now[0])
+    restored.restore(items)
+    now[0] = 111.0
+    assert restored.get("a") == 1
+    assert restored.get("b") is None
+
+
+def test_warm_start_round_trip(tmp_path, mocker):
+    """Testa que países, tabelas de câmbio e moedas voltam após reiniciar o processo."""
+
+    mocker.patch.object(warm_start, "path", str(tmp_path / "snapshot.bin"))
+    mocker.patch.object(currency_index, "loaded", True)
+    mocker.patch.object(currency_index, "documents", [{"_id": "1", "currency": "BRL", "country_iso2": "BR"}])
+    geocode_cache.clear()
+    rate_store.clear()
+    geocode_cache.set((-16.01, -48.05), "BR")
+    rate_store.put(RateTable("BRL", {"USD": 0.2}, next_update=time.time() + 3600))
+    warm_start.save()
+
+    geocode_cache.clear()
+    rate_store.clear()
+    currency_index.loaded = False
+    mock_restore = mocker.patch.object(currency_index, "restore")
+
+    counts = warm_start.restore()
+
+    assert counts == {"geocode": 1, "rates": 1, "currencies": 1, "quotas": 2}
+    assert geocode_cache.get((-16.01, -48.05)) == "BR"
+    assert rate_store.get("BRL").rates == {"USD": 0.2}
+    mock_restore.assert_called_once_with([{"_id": "1", "currency": "BRL", "country_iso2": "BR"}])
+    assert warm_start.last_restore["entries"] == counts
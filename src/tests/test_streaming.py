@@ -0,0 +1,155 @@
+import asyncio
+import io
+import json
+from contextlib import contextmanager
+from bulk_convert import convert
+from controllers.async_geoloc_controller import AsyncStreamConverter
+from controllers.geoloc_controller import rate_store
+from controllers.stream_controller import StreamConverter
+from utils import deadline
+from utils.exceptions import ExchangeApiError, ServiceOverloaded
+from utils.streaming import RowParser, aiter_lines, chunked, detect_format
+
+
+def test_row_parser_csv():
+    """Testa a leitura de CSV com cabeçalho, ignorando linhas em branco."""
+
+    parser = RowParser("csv")
+    lines = ["id,sender_currency,receiver_currency,value\r\n", "a,BRL,USD,10\n", "\n", "b,BRL\n"]
+
+    rows = list(parser.rows(lines))
+
+    assert rows[0] == (1, {"id": "a", "sender_currency": "BRL", "receiver_currency": "USD", "value": "10"})
+    assert rows[1][0] == 2
+    assert str(rows[1][1]) == "Número de colunas diferente do cabeçalho"
+
+
+def test_row_parser_ndjson_invalid_lines():
+    """Testa que linhas NDJSON inválidas viram erros sem interromper a leitura."""
+
+    rows = list(RowParser("ndjson").rows(['{"value": 1}\n', "{quebrado\n", "[1, 2]\n"]))
+
+    assert rows[0] == (1, {"value": 1})
+    assert str(rows[1][1]) == "JSON inválido"
+    assert str(rows[2][1]) == "A linha deve ser um objeto JSON"
+
+
+def test_detect_format_and_chunked():
+    """Testa a detecção do formato e a divisão em blocos."""
+
+    assert detect_format("text/csv") == "csv"
+    assert detect_format(filename="VALORES.CSV") == "csv"
+    assert detect_format("application/x-ndjson") == "ndjson"
+    assert list(chunked(range(5), 2)) == [[0, 1], [2, 3], [4]]
+
+
+def test_aiter_lines():
+    """Testa a divisão em linhas de um corpo recebido em pedaços."""
+
+    async def chunks():
+        for chunk in [b'{"a"', b': 1}\n{"b": 2', b"}\n", b'{"c": 3}']:
+            yield chunk
+
+    async def collect():
+        return [line async for line in aiter_lines(chunks())]
+
+    assert asyncio.run(collect()) == ['{"a": 1}', '{"b": 2}', '{"c": 3}']
+
+
+def test_stream_converter_prefetches_once_per_chunk(mocker):
+    """Testa que cada bloco busca a tabela de câmbio uma única vez e que erros ficam na linha."""
+
+    rate_store.clear()
+    mock_exchanges = mocker.patch("controllers.geoloc_controller.GeoController.get_exchanges", return_value={"USD": 0.2})
+    rows = [
+        (1, {"id": "a", "sender_currency": "BRL", "receiver_currency": "USD", "value": "10"}),
+        (2, {"sender_currency": "BRL", "receiver_currency": "USD"}),
+        (3, {"sender_currency": "BRL", "receiver_currency": "XYZ", "value": 5}),
+        (4, {"sender_currency": "BRL", "receiver_currency": "USD", "value": 20}),
+    ]
+
+    results = list(StreamConverter(chunk_size=2, max_workers=2).convert(iter(rows)))
+
+    assert results[0] == {"row": 1, "id": "a", "status": 200, "result": 2.0}
+    assert results[1]["status"] == 422
+    assert results[2] == {"row": 3, "status": 404, "message": "Conversão não encontrada"}
+    assert results[3] == {"row": 4, "status": 200, "result": 4.0}
+    assert mock_exchanges.call_count == 2
+
+
+def test_stream_converter_exchange_error(mocker):
+    """Testa que a falha do serviço de câmbio é reportada em cada linha afetada."""
+
+    rate_store.clear()
+    mocker.patch("controllers.geoloc_controller.GeoController.get_exchanges", side_effect=ExchangeApiError("Taxas das moedas está indisponível"))
+
+    results = list(StreamConverter().convert(iter([(1, {"sender_currency": "BRL", "receiver_currency": "USD", "value": 1})])))
+
+    assert results == [{"row": 1, "status": 500, "message": "Taxas das moedas está indisponível"}]
+
+
+def test_stream_converter_budget_per_chunk(mocker):
+    """Testa que cada bloco roda com o próprio prazo e que o bloco recusado responde 503 sem interromper o fluxo."""
+
+    rate_store.clear()
+    mocker.patch("controllers.geoloc_controller.GeoController.get_exchanges", return_value={"USD": 0.2})
+    budgets = []
+
+    @contextmanager
+    def chunk_budget():
+        if len(budgets) == 1:
+            budgets.append(None)
+            raise ServiceOverloaded(reason="queue_full")
+        token = deadline.start(5)
+        try:
+            yield
+        finally:
+            budgets.append(deadline.remaining())
+            deadline.end(token)
+
+    rows = [(number, {"sender_currency": "BRL", "receiver_currency": "USD", "value": 10}) for number in range(1, 6)]
+
+    results = list(StreamConverter(chunk_size=2, chunk_budget=chunk_budget).convert(iter(rows)))
+
+    assert [result["status"] for result in results] == [200, 200, 503, 503, 200]
+    assert budgets[1] is None and all(4 < budget <= 5 for budget in (budgets[0], budgets[2]))
+    assert deadline.remaining() is None
+
+
+def test_async_stream_converter(mocker):
+    """Testa a conversão assíncrona em blocos, por moeda e por país."""
+
+    rate_store.clear()
+    mocker.patch(
+        "database.async_models.AsyncCurrency.find_by_country",
+        side_effect=lambda country: {"BR": {"currency": "BRL"}, "US": {"currency": "USD"}}[country],
+    )
+    mocker.patch("controllers.async_geoloc_controller.AsyncGeoController.get_exchanges", return_value={"USD": 0.2})
+
+    async def rows():
+        yield 1, {"sender_currency": "BRL", "receiver_currency": "USD", "value": 10}
+        yield 2, {"sender_country": "BR", "receiver_country": "US", "value": 5}
+        yield 3, {"value": 5}
+
+    async def collect():
+        return [result async for result in AsyncStreamConverter(chunk_size=2).convert(rows())]
+
+    results = asyncio.run(collect())
+
+    assert results[0] == {"row": 1, "status": 200, "result": 2.0}
+    assert results[1] == {"row": 2, "status": 200, "result": 1.0}
+    assert results[2]["status"] == 422
+
+
+def test_bulk_convert_cli(mocker):
+    """Testa a conversão de um arquivo CSV para NDJSON pela linha de comando."""
+
+    rate_store.clear()
+    mocker.patch("controllers.geoloc_controller.GeoController.get_exchanges", return_value={"USD": 0.2})
+    source = io.StringIO("sender_currency,receiver_currency,value\nBRL,USD,10\nBRL,USD,abc\n")
+    output = io.StringIO()
+
+    assert convert(source, output, "csv", 500, 2) == 2
+    lines = [json.loads(line) for line in output.getvalue().splitlines()]
+    assert lines[0] == {"row": 1, "status": 200, "result": 2.0}
+    assert lines[1]["status"] == 422
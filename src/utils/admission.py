@@ -0,0 +1,189 @@
+import asyncio
+import threading
+import time
+from collections import deque
+from settings import settings
+from utils.deadline import parse_routes
+from utils.exceptions import ServiceOverloaded
+from utils.metrics import admission_rejections, admission_wait, registry
+
+
+def parse_limits(value):
+    """Limites por rota no formato `/rota=concorrência[:fila],...`."""
+    def parse(setting):
+        concurrency, _, queue_size = setting.partition(":")
+        return int(concurrency), int(queue_size) if queue_size else None
+
+    return parse_routes(value, parse)
+
+
+class RouteLimiter:
+    """Limite de requisições simultâneas de uma rota com fila de espera
+    limitada: acima de `concurrency` as requisições esperam na fila, e com a
+    fila cheia ou o tempo de espera esgotado são recusadas com
+    ServiceOverloaded."""
+
+    def __init__(self, route, concurrency, queue_size, timer=time.perf_counter):
+        self.route = route
+        self.concurrency = concurrency
+        self.queue_size = queue_size
+        self.timer = timer
+        self.active = 0
+        self.waiting = 0
+        self._condition = threading.Condition()
+
+    def acquire(self, timeout=None):
+        started = self.timer()
+        with self._condition:
+            if self.active < self.concurrency and not self.waiting:
+                self.active += 1
+                admission_wait.labels(self.route).observe(0.0)
+                return self
+            self._check_queue()
+            self.waiting += 1
+            try:
+                admitted = self._condition.wait_for(lambda: self.active < self.concurrency, timeout)
+                if not admitted:
+                    raise self._rejected("queue_timeout")
+                self.active += 1
+            finally:
+                self.waiting -= 1
+        admission_wait.labels(self.route).observe(self.timer() - started)
+        return self
+
+    def release(self):
+        with self._condition:
+            self.active -= 1
+            self._condition.notify()
+
+    def _check_queue(self):
+        if self.waiting >= self.queue_size:
+            raise self._rejected("queue_full")
+
+    def _rejected(self, reason):
+        admission_rejections.labels(self.route, reason).inc()
+        return ServiceOverloaded(reason=reason)
+
+    def stats(self):
+        return {"active": self.active, "waiting": self.waiting, "concurrency": self.concurrency, "queue_size": self.queue_size}
+
+
+class AsyncRouteLimiter(RouteLimiter):
+    """RouteLimiter para o event loop: quem espera na fila recebe a vaga
+    diretamente de quem a libera, em ordem de chegada."""
+
+    def __init__(self, route, concurrency, queue_size, timer=time.perf_counter):
+        super().__init__(route, concurrency, queue_size, timer)
+        self._waiters = deque()
+
+    async def acquire(self, timeout=None):
+        started = self.timer()
+        if self.active < self.concurrency and not self._waiters:
+            self.active += 1
+            admission_wait.labels(self.route).observe(0.0)
+            return self
+        self._check_queue()
+        waiter = asyncio.get_running_loop().create_future()
+        self._waiters.append(waiter)
+        self.waiting += 1
+        try:
+            await asyncio.wait_for(waiter, timeout)
+        except asyncio.TimeoutError:
+            raise self._rejected("queue_timeout")
+        except asyncio.CancelledError:
+            if waiter.done() and not waiter.cancelled():
+                self.release()
+            raise
+        finally:
+            self.waiting -= 1
+            if waiter in self._waiters:
+                self._waiters.remove(waiter)
+        admission_wait.labels(self.route).observe(self.timer() - started)
+        return self
+
+    def release(self):
+        while self._waiters:
+            waiter = self._waiters.popleft()
+            if not waiter.done():
+                waiter.set_result(None)
+                return
+        self.active -= 1
+
+
+class Admission:
+    """Controle de admissão por rota: aplica o limite de concorrência e a
+    fila de cada rota e recusa de imediato as requisições cujo prazo já não
+    comporta o atendimento. `acquire` retorna o limitador a ser liberado ao
+    final da requisição (None sem limite)."""
+
+    def __init__(self, enabled=True, concurrency=32, queue_size=64, queue_timeout=1.0, route_limits=None, min_budget=0.0,
+                 limiter=RouteLimiter):
+        self.enabled = enabled
+        self.concurrency = concurrency
+        self.queue_size = queue_size
+        self.queue_timeout = queue_timeout
+        self.route_limits = route_limits or {}
+        self.min_budget = min_budget
+        self.limiter_class = limiter
+        self.limiters = {}
+        self._lock = threading.Lock()
+
+    def limiter(self, route):
+        limiter = self.limiters.get(route)
+        if limiter is None:
+            concurrency, queue_size = self.route_limits.get(route, (self.concurrency, None))
+            with self._lock:
+                limiter = self.limiters.setdefault(
+                    route, self.limiter_class(route, concurrency, self.queue_size if queue_size is None else queue_size)
+                )
+        return limiter
+
+    def wait_timeout(self, route, budget):
+        if budget is not None and budget <= self.min_budget:
+            admission_rejections.labels(route, "deadline").inc()
+            raise ServiceOverloaded("Tempo limite da requisição esgotado", "deadline")
+        if budget is None:
+            return self.queue_timeout
+        return min(self.queue_timeout, budget - self.min_budget)
+
+    def acquire(self, route, budget=None):
+        timeout = self.wait_timeout(route, budget)
+        if not self.enabled:
+            return None
+        return self.limiter(route).acquire(timeout)
+
+    async def acquire_async(self, route, budget=None):
+        timeout = self.wait_timeout(route, budget)
+        if not self.enabled:
+            return None
+        return await self.limiter(route).acquire(timeout)
+
+    def stats(self):
+        return {route: limiter.stats() for route, limiter in sorted(self.limiters.items())}
+
+
+def create_admission(limiter=RouteLimiter):
+    return Admission(
+        settings.ADMISSION_ENABLED,
+        settings.ADMISSION_CONCURRENCY,
+        settings.ADMISSION_QUEUE_SIZE,
+        settings.ADMISSION_QUEUE_TIMEOUT,
+        parse_limits(settings.ADMISSION_ROUTE_LIMITS),
+        settings.REQUEST_MIN_BUDGET,
+        limiter,
+    )
+
+
+admission = create_admission()
+async_admission = create_admission(AsyncRouteLimiter)
+
+registry.callback(
+    "geoloc_admission_requests", "Requisições em atendimento (active) e na fila (waiting) por rota",
+    "gauge", ["route", "state"],
+    lambda: {
+        (route, state): limiter_stats[state]
+        for controller in (admission, async_admission)
+        for route, limiter_stats in controller.stats().items()
+        for state in ("active", "waiting")
+    },
+)
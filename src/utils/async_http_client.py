@@ -0,0 +1,106 @@
+import asyncio
+import httpx
+from time import perf_counter
+from settings import settings
+from utils import deadline
+from utils.http_client import UpstreamPolicy, create_latency_tracker, exchange_breaker, exchange_quota, google_breaker, google_quota
+
+
+class AsyncUpstreamClient(UpstreamPolicy):
+    def __init__(self, name, connect_timeout=2.0, read_timeout=5.0, retries=2, backoff=0.2, pool_size=10, max_connections=200, breaker=None, hedge=None, quota=None):
+        super().__init__(name, connect_timeout, read_timeout, retries, backoff, pool_size, breaker, hedge, quota)
+        self.max_connections = max_connections
+        self._client = None
+
+    @property
+    def client(self):
+        if self._client is None:
+            self._client = httpx.AsyncClient(
+                timeout=httpx.Timeout(self.read_timeout, connect=self.connect_timeout),
+                limits=httpx.Limits(max_connections=self.max_connections, max_keepalive_connections=self.pool_size),
+            )
+        return self._client
+
+    async def get(self, url, **kwargs):
+        """Versão assíncrona de UpstreamClient.get, com as mesmas decisões de UpstreamPolicy."""
+        probe = self.breaker.check()
+        try:
+            for attempt in range(self.retries + 1):
+                await self.quota.acquire_async(deadline.remaining())
+                connect_timeout, read_timeout = deadline.clamp((self.connect_timeout, self.read_timeout), self.stage)
+                kwargs["timeout"] = httpx.Timeout(read_timeout, connect=connect_timeout)
+                started = perf_counter()
+                delay = self._backoff(attempt)
+                try:
+                    response = await self._send(url, kwargs)
+                except httpx.TransportError as e:
+                    if self._connection_failed(e, started, attempt, delay):
+                        raise
+                except httpx.HTTPError:
+                    self._record(started, "error")
+                    raise
+                else:
+                    if self._accepted(response, started, attempt, delay):
+                        return response
+                await asyncio.sleep(delay)
+        finally:
+            self._release(probe)
+
+    async def _send(self, url, kwargs):
+        delay = self._hedge_delay()
+        if delay is None:
+            return await self.client.get(url, **kwargs)
+        return await self._hedged(url, kwargs, delay)
+
+    async def _hedged(self, url, kwargs, delay):
+        primary = asyncio.ensure_future(self.client.get(url, **kwargs))
+        tasks = {primary}
+        try:
+            done, _ = await asyncio.wait(tasks, timeout=delay)
+            if done or not self._fire_hedge(await self.quota.try_acquire_async()):
+                return await primary
+
+            secondary = asyncio.ensure_future(self.client.get(url, **kwargs))
+            tasks.add(secondary)
+            pending = set(tasks)
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    if task.exception() is None and self._hedge_won(task.result(), task is secondary):
+                        return task.result()
+            return primary.result()
+        finally:
+            for task in tasks:
+                if not task.done():
+                    task.cancel()
+
+    async def close(self):
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+
+
+async_google_client = AsyncUpstreamClient(
+    "google",
+    settings.GOOGLE_CONNECT_TIMEOUT,
+    settings.GOOGLE_READ_TIMEOUT,
+    settings.GOOGLE_RETRIES,
+    settings.GOOGLE_RETRY_BACKOFF,
+    settings.GOOGLE_POOL_SIZE,
+    settings.ASYNC_MAX_CONNECTIONS,
+    google_breaker,
+    create_latency_tracker(),
+    google_quota,
+)
+async_exchange_client = AsyncUpstreamClient(
+    "exchange",
+    settings.CURRENCY_CONNECT_TIMEOUT,
+    settings.CURRENCY_READ_TIMEOUT,
+    settings.CURRENCY_RETRIES,
+    settings.CURRENCY_RETRY_BACKOFF,
+    settings.CURRENCY_POOL_SIZE,
+    settings.ASYNC_MAX_CONNECTIONS,
+    exchange_breaker,
+    create_latency_tracker(),
+    exchange_quota,
+)
@@ -0,0 +1,346 @@
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from settings import settings
+
+logger = logging.getLogger(__name__)
+logger.setLevel(logging.INFO)
+
+# Intervalo mínimo, em segundos, entre as contagens das entradas do SQLite em stats()
+SIZE_SAMPLE_INTERVAL = 30
+
+
+class TTLCache:
+    def __init__(self, maxsize=1024, ttl=3600, timer=time.monotonic):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.timer = timer
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key, default=None):
+        with self._lock:
+            item = self._data.get(key)
+            if item is None:
+                self.misses += 1
+                return default
+            value, expires_at = item
+            if expires_at is not None and expires_at <= self.timer():
+                del self._data[key]
+                self.misses += 1
+                return default
+            self._data.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def set(self, key, value, ttl=None):
+        ttl = self.ttl if ttl is None else ttl
+        expires_at = self.timer() + ttl if ttl else None
+        with self._lock:
+            self._data[key] = (value, expires_at)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+                self.evictions += 1
+
+    def delete(self, key):
+        with self._lock:
+            self._data.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+            self.hits = 0
+            self.misses = 0
+            self.evictions = 0
+
+    def __len__(self):
+        return len(self._data)
+
+    def items(self):
+        """Entradas válidas como (chave, valor, segundos restantes ou None)."""
+        now = self.timer()
+        with self._lock:
+            return [
+                (key, value, None if expires_at is None else expires_at - now)
+                for key, (value, expires_at) in self._data.items()
+                if expires_at is None or expires_at > now
+            ]
+
+    def restore(self, items):
+        for key, value, ttl in items:
+            self.set(key, value, 0 if ttl is None else ttl)
+
+    def stats(self):
+        with self._lock:
+            return {
+                "size": len(self._data),
+                "maxsize": self.maxsize,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+            }
+
+
+def encode_key(namespace, key):
+    return f"{namespace}:{json.dumps(key, separators=(',', ':'))}"
+
+
+class SQLiteCache:
+    """Cache compartilhado entre os processos do mesmo host em um arquivo
+    SQLite (modo WAL). Os valores são guardados em JSON; cada thread de cada
+    processo usa a própria conexão. Falhas do SQLite viram misses."""
+
+    def __init__(self, namespace, path, maxsize=10000, ttl=3600, timer=time.time):
+        self.namespace = namespace
+        self.path = path
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.timer = timer
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._writes = 0
+        self._size = None
+        self._sized_at = 0.0
+        self._local = threading.local()
+
+    def _connection(self):
+        connection = getattr(self._local, "connection", None)
+        if connection is None or self._local.pid != os.getpid():
+            connection = sqlite3.connect(self.path, timeout=5, isolation_level=None, check_same_thread=False)
+            connection.execute("PRAGMA journal_mode=WAL")
+            connection.execute("PRAGMA synchronous=NORMAL")
+            connection.execute(
+                "CREATE TABLE IF NOT EXISTS cache ("
+                "key TEXT PRIMARY KEY, value TEXT NOT NULL, expires_at REAL) WITHOUT ROWID"
+            )
+            connection.execute("CREATE INDEX IF NOT EXISTS cache_expires_at ON cache (expires_at)")
+            self._local.connection = connection
+            self._local.pid = os.getpid()
+        return connection
+
+    def get(self, key, default=None):
+        try:
+            row = self._connection().execute(
+                "SELECT value, expires_at FROM cache WHERE key = ?", (encode_key(self.namespace, key),)
+            ).fetchone()
+        except sqlite3.Error as e:
+            logger.error(f"Erro ao ler o cache {self.namespace}: {str(e)}")
+            row = None
+        if row is None or (row[1] is not None and row[1] <= self.timer()):
+            self.misses += 1
+            return default
+        self.hits += 1
+        return json.loads(row[0])
+
+    def set(self, key, value, ttl=None):
+        ttl = self.ttl if ttl is None else ttl
+        expires_at = self.timer() + ttl if ttl else None
+        try:
+            self._connection().execute(
+                "INSERT OR REPLACE INTO cache (key, value, expires_at) VALUES (?, ?, ?)",
+                (encode_key(self.namespace, key), json.dumps(value), expires_at),
+            )
+            self._writes += 1
+            if self._writes % 1000 == 0:
+                self.evict()
+        except sqlite3.Error as e:
+            logger.error(f"Erro ao gravar no cache {self.namespace}: {str(e)}")
+
+    def evict(self):
+        """Remove as entradas expiradas e, acima de `maxsize`, as que expiram primeiro."""
+        connection = self._connection()
+        prefix = f"{self.namespace}:%"
+        connection.execute("DELETE FROM cache WHERE key LIKE ? AND expires_at <= ?", (prefix, self.timer()))
+        excess = len(self) - self.maxsize
+        if excess > 0:
+            connection.execute(
+                "DELETE FROM cache WHERE key IN (SELECT key FROM cache WHERE key LIKE ? ORDER BY expires_at LIMIT ?)",
+                (prefix, excess),
+            )
+            self.evictions += excess
+
+    def delete(self, key):
+        try:
+            self._connection().execute("DELETE FROM cache WHERE key = ?", (encode_key(self.namespace, key),))
+        except sqlite3.Error as e:
+            logger.error(f"Erro ao remover do cache {self.namespace}: {str(e)}")
+
+    def clear(self):
+        try:
+            self._connection().execute("DELETE FROM cache WHERE key LIKE ?", (f"{self.namespace}:%",))
+        except sqlite3.Error as e:
+            logger.error(f"Erro ao limpar o cache {self.namespace}: {str(e)}")
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._size = None
+
+    def __len__(self):
+        try:
+            return self._connection().execute(
+                "SELECT COUNT(*) FROM cache WHERE key LIKE ?", (f"{self.namespace}:%",)
+            ).fetchone()[0]
+        except sqlite3.Error as e:
+            logger.error(f"Erro ao contar as entradas do cache {self.namespace}: {str(e)}")
+            return 0
+
+    def size(self):
+        """Número de entradas, recontado no máximo a cada SIZE_SAMPLE_INTERVAL
+        segundos: a contagem percorre o índice a cada chamada."""
+        now = time.monotonic()
+        if self._size is None or now - self._sized_at >= SIZE_SAMPLE_INTERVAL:
+            self._size, self._sized_at = len(self), now
+        return self._size
+
+    def stats(self):
+        return {
+            "size": self.size(),
+            "maxsize": self.maxsize,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+        }
+
+
+class RedisCache:
+    """Cache compartilhado em um Redis (ou outro servidor com a mesma API,
+    passado em `client`). O TTL e o limite de memória ficam a cargo do
+    servidor. Falhas de conexão viram misses."""
+
+    def __init__(self, namespace, url=None, ttl=3600, client=None):
+        if client is None:
+            import redis
+
+            client = redis.Redis.from_url(url, socket_timeout=0.5, socket_connect_timeout=0.5)
+        self.namespace = namespace
+        self.ttl = ttl
+        self.client = client
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key, default=None):
+        try:
+            value = self.client.get(encode_key(self.namespace, key))
+        except Exception as e:
+            logger.error(f"Erro ao ler o cache {self.namespace}: {str(e)}")
+            value = None
+        if value is None:
+            self.misses += 1
+            return default
+        self.hits += 1
+        return json.loads(value)
+
+    def set(self, key, value, ttl=None):
+        ttl = self.ttl if ttl is None else ttl
+        try:
+            self.client.set(encode_key(self.namespace, key), json.dumps(value), px=int(ttl * 1000) if ttl else None)
+        except Exception as e:
+            logger.error(f"Erro ao gravar no cache {self.namespace}: {str(e)}")
+
+    def delete(self, key):
+        try:
+            self.client.delete(encode_key(self.namespace, key))
+        except Exception as e:
+            logger.error(f"Erro ao remover do cache {self.namespace}: {str(e)}")
+
+    def clear(self):
+        try:
+            keys = list(self.client.scan_iter(match=f"{self.namespace}:*"))
+            if keys:
+                self.client.delete(*keys)
+        except Exception as e:
+            logger.error(f"Erro ao limpar o cache {self.namespace}: {str(e)}")
+        self.hits = 0
+        self.misses = 0
+
+    def __len__(self):
+        try:
+            return sum(1 for _ in self.client.scan_iter(match=f"{self.namespace}:*"))
+        except Exception as e:
+            logger.error(f"Erro ao contar as entradas do cache {self.namespace}: {str(e)}")
+            return 0
+
+    def stats(self):
+        return {"hits": self.hits, "misses": self.misses}
+
+
+class TieredCache:
+    """Cache local em memória na frente de um cache compartilhado: um miss
+    local consulta o compartilhado e guarda o valor localmente, e cada
+    gravação vai para os dois, de modo que o preenchimento feito por um
+    processo serve a todos."""
+
+    def __init__(self, local, shared):
+        self.local = local
+        self.shared = shared
+
+    def get(self, key, default=None):
+        value = self.local.get(key)
+        if value is not None:
+            return value
+        value = self.shared.get(key)
+        if value is None:
+            return default
+        self.local.set(key, value)
+        return value
+
+    def set(self, key, value, ttl=None):
+        self.local.set(key, value, ttl)
+        self.shared.set(key, value, ttl)
+
+    def delete(self, key):
+        self.local.delete(key)
+        self.shared.delete(key)
+
+    def clear(self):
+        self.local.clear()
+        self.shared.clear()
+
+    def __len__(self):
+        return len(self.local)
+
+    def items(self):
+        return self.local.items()
+
+    def restore(self, items):
+        self.local.restore(items)
+
+    def stats(self):
+        local, shared = self.local.stats(), self.shared.stats()
+        return {
+            "size": local["size"],
+            "maxsize": local["maxsize"],
+            "hits": local["hits"] + shared["hits"],
+            "misses": shared["misses"],
+            "evictions": local["evictions"],
+            "shared": shared,
+        }
+
+
+def create_shared_cache(namespace, maxsize, ttl, backend=None):
+    """Cache compartilhado entre processos conforme CACHE_BACKEND, ou None
+    quando o backend é apenas em memória."""
+    backend = backend or settings.CACHE_BACKEND
+    if backend == "sqlite":
+        return SQLiteCache(namespace, settings.CACHE_SQLITE_PATH, maxsize, ttl)
+    if backend == "redis":
+        return RedisCache(namespace, settings.CACHE_REDIS_URL, ttl)
+    if backend != "memory":
+        raise ValueError(f"CACHE_BACKEND inválido: {backend}")
+    return None
+
+
+def create_cache(namespace, maxsize, ttl, backend=None):
+    """TTLCache em memória, com o cache compartilhado atrás quando configurado."""
+    local = TTLCache(maxsize, ttl)
+    shared = create_shared_cache(namespace, maxsize, ttl, backend)
+    return TieredCache(local, shared) if shared is not None else local
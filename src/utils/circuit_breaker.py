@@ -0,0 +1,100 @@
+import threading
+import time
+from collections import deque
+from utils.exceptions import CircuitOpenError
+
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half_open"
+# Retorno de `allow` para a chamada de teste do estado meio-aberto
+PROBE = "probe"
+
+
+class CircuitBreaker:
+    """Circuit breaker por taxa de falhas: abre quando, entre as últimas `window`
+    chamadas (com pelo menos `min_calls`), a fração de falhas chega a
+    `failure_rate`; fica aberto por `cooldown` segundos e então deixa passar uma
+    chamada de teste (meio-aberto), que fecha o circuito se der certo. A
+    chamada de teste que termina sem resultado (prazo ou cota esgotados antes
+    da resposta) deve devolver a vaga com `release_probe`."""
+
+    def __init__(self, name, failure_rate=0.5, window=20, min_calls=10, cooldown=30.0, enabled=True, timer=time.monotonic):
+        self.name = name
+        self.failure_rate = failure_rate
+        self.min_calls = min_calls
+        self.cooldown = cooldown
+        self.enabled = enabled
+        self.timer = timer
+        self.state = CLOSED
+        self.opened_at = None
+        self._outcomes = deque(maxlen=window)
+        self._probing = False
+        self._lock = threading.Lock()
+
+    def allow(self):
+        """Diz se a chamada pode seguir: False com o circuito aberto, PROBE
+        quando ela é a chamada de teste do estado meio-aberto e True nos
+        demais casos."""
+        if not self.enabled:
+            return True
+        with self._lock:
+            if self.state == CLOSED:
+                return True
+            if self.state == OPEN and self.timer() - self.opened_at >= self.cooldown:
+                self.state = HALF_OPEN
+            if self.state == HALF_OPEN and not self._probing:
+                self._probing = True
+                return PROBE
+            return False
+
+    def check(self):
+        """Lança CircuitOpenError com o circuito aberto; retorna True quando a
+        chamada é a de teste do estado meio-aberto."""
+        allowed = self.allow()
+        if not allowed:
+            raise CircuitOpenError(f"Circuito de {self.name} aberto")
+        return allowed == PROBE
+
+    def release_probe(self):
+        """Libera a chamada de teste que terminou sem registrar sucesso nem
+        falha, para a próxima chamada poder testar o serviço."""
+        with self._lock:
+            if self.state == HALF_OPEN:
+                self._probing = False
+
+    def record_success(self):
+        with self._lock:
+            if self.state == HALF_OPEN:
+                self._close()
+            self._outcomes.append(True)
+
+    def record_failure(self):
+        with self._lock:
+            if self.state == HALF_OPEN:
+                self._open()
+                return
+            self._outcomes.append(False)
+            if self.state == CLOSED and self._should_open():
+                self._open()
+
+    def _should_open(self):
+        if len(self._outcomes) < self.min_calls:
+            return False
+        failures = sum(1 for ok in self._outcomes if not ok)
+        return failures / len(self._outcomes) >= self.failure_rate
+
+    def _open(self):
+        self.state = OPEN
+        self.opened_at = self.timer()
+        self._probing = False
+
+    def _close(self):
+        self.state = CLOSED
+        self.opened_at = None
+        self._probing = False
+        self._outcomes.clear()
+
+    def stats(self):
+        with self._lock:
+            failures = sum(1 for ok in self._outcomes if not ok)
+            return {"state": self.state, "calls": len(self._outcomes), "failures": failures}
@@ -0,0 +1,122 @@
+import functools
+import inspect
+import math
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+import pymongo
+from pymongo.errors import PyMongoError
+from settings import settings
+from utils.exceptions import DeadlineExceeded
+from utils.metrics import deadlines_exceeded
+
+_deadline = ContextVar("geoloc_deadline", default=None)
+
+
+def parse_routes(value, parse=float):
+    """Lê valores por rota no formato `/rota=valor,/outra=valor`."""
+    routes = {}
+    for item in (value or "").split(","):
+        route, _, setting = item.strip().partition("=")
+        if route and setting:
+            routes[route.strip()] = parse(setting.strip())
+    return routes
+
+
+def request_timeout(headers, header, default):
+    """Prazo da requisição em segundos: o header do cliente (em milissegundos)
+    quando presente e válido, limitado ao padrão da rota."""
+    try:
+        timeout = float(headers.get(header)) / 1000
+    except (TypeError, ValueError):
+        return default
+    if math.isnan(timeout):
+        return default
+    return max(0.0, min(timeout, default))
+
+
+def start(timeout, timer=time.monotonic):
+    return _deadline.set(timer() + timeout)
+
+
+def end(token):
+    _deadline.reset(token)
+
+
+def remaining(timer=time.monotonic):
+    """Tempo restante do prazo da requisição atual; None sem prazo."""
+    deadline = _deadline.get()
+    if deadline is None:
+        return None
+    return deadline - timer()
+
+
+def expired():
+    budget = remaining()
+    return budget is not None and budget <= 0
+
+
+def allows(delay):
+    budget = remaining()
+    return budget is None or budget > delay
+
+
+def exceeded(stage):
+    deadlines_exceeded.labels(stage).inc()
+    return DeadlineExceeded()
+
+
+def check(stage):
+    if expired():
+        raise exceeded(stage)
+
+
+def clamp(timeout, stage):
+    """Limita um timeout (número ou tupla de conexão e leitura) ao tempo
+    restante; com o prazo esgotado lança DeadlineExceeded."""
+    budget = remaining()
+    if budget is None:
+        return timeout
+    if budget <= 0:
+        raise exceeded(stage)
+    if isinstance(timeout, tuple):
+        return tuple(budget if value is None else min(value, budget) for value in timeout)
+    return budget if timeout is None else min(timeout, budget)
+
+
+@contextmanager
+def mongo_budget(stage="mongo"):
+    """Executa as operações do MongoDB do bloco com o tempo restante da
+    requisição (pymongo.timeout); o erro de timeout vira DeadlineExceeded.
+    Dentro de pymongo.timeout o serverSelectionTimeoutMS deixa de valer, por
+    isso o tempo também é limitado a ele: com o MongoDB fora do ar a
+    requisição falha como antes, sem esperar o prazo inteiro."""
+    budget = remaining()
+    if budget is None:
+        yield
+        return
+    if budget <= 0:
+        raise exceeded(stage)
+    try:
+        with pymongo.timeout(min(budget, settings.MONGO_SERVER_SELECTION_TIMEOUT_MS / 1000)):
+            yield
+    except PyMongoError as e:
+        if expired():
+            raise exceeded(stage) from e
+        raise
+
+
+def bounded(fn):
+    """Decorador que aplica `mongo_budget` a uma função síncrona ou assíncrona."""
+    if inspect.iscoroutinefunction(fn):
+        @functools.wraps(fn)
+        async def async_wrapper(*args, **kwargs):
+            with mongo_budget():
+                return await fn(*args, **kwargs)
+        return async_wrapper
+
+    @functools.wraps(fn)
+    def wrapper(*args, **kwargs):
+        with mongo_budget():
+            return fn(*args, **kwargs)
+    return wrapper
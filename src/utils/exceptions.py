@@ -14,4 +14,29 @@ class DesiredCurrencyNotFound(Exception):
     pass
 
 class TaxNotFound(Exception):
-    pass
\ No newline at end of file
+    pass
+
+class CircuitOpenError(Exception):
+    pass
+
+class ServiceOverloaded(Exception):
+    """Requisição recusada para proteger o serviço (respondida com 503 e Retry-After)."""
+
+    reason = "overloaded"
+
+    def __init__(self, message="Serviço sobrecarregado, tente novamente", reason=None):
+        super().__init__(message)
+        if reason:
+            self.reason = reason
+
+class DeadlineExceeded(ServiceOverloaded):
+    reason = "deadline"
+
+    def __init__(self, message="Tempo limite da requisição esgotado", reason=None):
+        super().__init__(message, reason)
+
+class QuotaExceeded(ServiceOverloaded):
+    reason = "quota"
+
+    def __init__(self, message="Cota do serviço externo esgotada, tente novamente", reason=None):
+        super().__init__(message, reason)
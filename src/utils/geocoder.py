@@ -0,0 +1,147 @@
+import json
+import logging
+import math
+from settings import settings
+
+logger = logging.getLogger(__name__)
+logger.setLevel(logging.INFO)
+
+
+class CountryPolygon:
+    def __init__(self, iso2, rings):
+        self.iso2 = iso2
+        self.rings = []
+        for ring in rings:
+            xs = [point[0] for point in ring]
+            ys = [point[1] for point in ring]
+            self.rings.append(((min(xs), min(ys), max(xs), max(ys)), ring))
+        self.bbox = (
+            min(bbox[0] for bbox, _ in self.rings),
+            min(bbox[1] for bbox, _ in self.rings),
+            max(bbox[2] for bbox, _ in self.rings),
+            max(bbox[3] for bbox, _ in self.rings),
+        )
+
+    def locate(self, x, y, margin):
+        """Retorna (dentro, perto_da_borda) usando a regra par-ímpar sobre todos os anéis."""
+        inside = False
+        near_border = False
+        for (min_x, min_y, max_x, max_y), ring in self.rings:
+            if x < min_x - margin or x > max_x + margin or y < min_y - margin or y > max_y + margin:
+                continue
+            x1, y1 = ring[-1]
+            for x2, y2 in ring:
+                if (y1 > y) != (y2 > y) and x < (x2 - x1) * (y - y1) / (y2 - y1) + x1:
+                    inside = not inside
+                if (
+                    margin
+                    and not near_border
+                    and (x1 if x1 < x2 else x2) - margin <= x <= (x2 if x1 < x2 else x1) + margin
+                    and (y1 if y1 < y2 else y2) - margin <= y <= (y2 if y1 < y2 else y1) + margin
+                    and _segment_distance(x, y, x1, y1, x2, y2) < margin
+                ):
+                    near_border = True
+                x1, y1 = x2, y2
+        return inside, near_border
+
+
+class SmallTerritory:
+    """País ou território pequeno demais para a resolução da base (ex.:
+    Vaticano, Singapura): dentro de `radius` graus do ponto o resultado
+    local não é confiável."""
+
+    def __init__(self, iso2, x, y, radius):
+        self.iso2 = iso2
+        self.x = x
+        self.y = y
+        self.radius = radius
+        self.bbox = (x - radius, y - radius, x + radius, y + radius)
+
+    def locate(self, x, y, margin):
+        return False, math.hypot(x - self.x, y - self.y) < self.radius
+
+
+def _segment_distance(x, y, x1, y1, x2, y2):
+    dx = x2 - x1
+    dy = y2 - y1
+    if dx == 0 and dy == 0:
+        return math.hypot(x - x1, y - y1)
+    t = max(0.0, min(1.0, ((x - x1) * dx + (y - y1) * dy) / (dx * dx + dy * dy)))
+    return math.hypot(x - (x1 + t * dx), y - (y1 + t * dy))
+
+
+class ReverseGeocoder:
+    def __init__(self, cell_size=5.0, border_margin=0.0):
+        self.cell_size = cell_size
+        self.border_margin = border_margin
+        self._index = ([], {})
+
+    @property
+    def loaded(self):
+        return bool(self._index[0])
+
+    def load(self, path):
+        with open(path, encoding="utf-8") as file:
+            data = json.load(file)
+
+        polygons = []
+        for feature in data.get("features", []):
+            properties = feature.get("properties", {})
+            iso2 = properties.get("iso_a2")
+            geometry = feature.get("geometry") or {}
+            if iso2 and geometry.get("type") == "Point":
+                x, y = geometry["coordinates"][:2]
+                polygons.append(SmallTerritory(iso2, x, y, float(properties.get("radius", self.border_margin))))
+                continue
+            if not iso2 or geometry.get("type") not in ("Polygon", "MultiPolygon"):
+                continue
+            parts = geometry["coordinates"] if geometry["type"] == "MultiPolygon" else [geometry["coordinates"]]
+            rings = [[tuple(point) for point in ring] for part in parts for ring in part if ring]
+            if rings:
+                polygons.append(CountryPolygon(iso2, rings))
+
+        # As células cobrem também a margem, para a busca enxergar fronteiras de células vizinhas
+        grid = {}
+        margin = self.border_margin
+        for index, polygon in enumerate(polygons):
+            min_x, min_y, max_x, max_y = polygon.bbox
+            min_x, min_y, max_x, max_y = min_x - margin, min_y - margin, max_x + margin, max_y + margin
+            for cell_x in range(self._cell(min_x), self._cell(max_x) + 1):
+                for cell_y in range(self._cell(min_y), self._cell(max_y) + 1):
+                    grid.setdefault((cell_x, cell_y), []).append(index)
+
+        self._index = (polygons, grid)
+        logger.info(f"Geocodificação local carregada com {len(polygons)} países de {path}")
+
+    def lookup(self, latitude, longitude):
+        """Retorna o código ISO-2 do país ou None quando o ponto não cai em nenhum
+        polígono ou quando outro país (ou território pequeno demais para a base)
+        está a menos de `border_margin` graus: só a fronteira entre países torna
+        o resultado duvidoso, o litoral não."""
+        y = float(latitude)
+        x = float(longitude)
+        polygons, grid = self._index
+        margin = self.border_margin
+        found = None
+        nearby = set()
+        for index in grid.get((self._cell(x), self._cell(y)), ()):
+            polygon = polygons[index]
+            min_x, min_y, max_x, max_y = polygon.bbox
+            if x < min_x - margin or x > max_x + margin or y < min_y - margin or y > max_y + margin:
+                continue
+            inside, near_border = polygon.locate(x, y, margin)
+            if inside:
+                if found and found != polygon.iso2:
+                    return None
+                found = polygon.iso2
+            if inside or near_border:
+                nearby.add(polygon.iso2)
+        if found is None or nearby != {found}:
+            return None
+        return found
+
+    def _cell(self, value):
+        return int(math.floor(value / self.cell_size))
+
+
+reverse_geocoder = ReverseGeocoder(settings.GEOCODER_GRID_CELL_SIZE, settings.GEOCODER_BORDER_MARGIN)
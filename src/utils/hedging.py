@@ -0,0 +1,29 @@
+import math
+import threading
+from collections import deque
+
+
+class LatencyTracker:
+    """Mantém as latências recentes de um serviço externo e calcula a espera
+    antes de disparar uma requisição de hedge: o percentil `percentile` das
+    últimas `window` respostas, com piso `min_delay`. Retorna None enquanto não
+    houver amostras suficientes."""
+
+    def __init__(self, percentile=0.95, window=200, min_samples=20, min_delay=0.05):
+        self.percentile = percentile
+        self.min_samples = min_samples
+        self.min_delay = min_delay
+        self._latencies = deque(maxlen=window)
+        self._lock = threading.Lock()
+
+    def record(self, latency):
+        with self._lock:
+            self._latencies.append(latency)
+
+    def delay(self):
+        with self._lock:
+            if len(self._latencies) < self.min_samples:
+                return None
+            latencies = sorted(self._latencies)
+        rank = max(1, math.ceil(self.percentile * len(latencies)))
+        return max(self.min_delay, latencies[rank - 1])
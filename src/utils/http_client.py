@@ -0,0 +1,290 @@
+import logging
+import os
+import random
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, TimeoutError as FutureTimeout, wait
+from time import perf_counter
+from urllib.parse import urlsplit
+import requests
+from requests.adapters import HTTPAdapter
+from settings import settings
+from utils import deadline
+from utils.circuit_breaker import CLOSED, HALF_OPEN, OPEN, CircuitBreaker
+from utils.hedging import LatencyTracker
+from utils.metrics import hedges, observe_upstream, registry
+from utils.quota import QuotaLimiter, create_quota_state, process_share
+
+logger = logging.getLogger(__name__)
+logger.setLevel(logging.INFO)
+
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+
+
+def is_failure(status_code):
+    return status_code in RETRY_STATUSES
+
+
+def describe_error(e):
+    """Descrição de uma exceção para os logs. As falhas de chamadas externas
+    (requests e httpx) viram o tipo da exceção e o host, sem a mensagem, que
+    traz a URL com as chaves das APIs (o `key` do Google e a chave do serviço
+    de câmbio no caminho); as demais mantêm a mensagem."""
+    try:
+        request = e.request
+    except AttributeError:
+        return str(e)
+    except RuntimeError:
+        request = None
+    url = getattr(request, "url", None)
+    host = urlsplit(str(url)).hostname if url else None
+    return f"{type(e).__name__} ({host})" if host else type(e).__name__
+
+
+class UpstreamPolicy:
+    """Decisões comuns aos clientes síncrono e assíncrono de um serviço
+    externo: circuit breaker, cota, prazo da requisição, novas tentativas e
+    registro do resultado de cada tentativa. As subclasses fazem só o I/O."""
+
+    def __init__(self, name, connect_timeout=2.0, read_timeout=5.0, retries=2, backoff=0.2, pool_size=10, breaker=None, hedge=None, quota=None):
+        self.name = name
+        self.connect_timeout = connect_timeout
+        self.read_timeout = read_timeout
+        self.retries = retries
+        self.backoff = backoff
+        self.pool_size = pool_size
+        self.breaker = breaker or CircuitBreaker(name, enabled=False)
+        self.hedge = hedge
+        self.quota = quota or QuotaLimiter(name)
+        self.stage = f"upstream.{name}"
+
+    def _backoff(self, attempt):
+        return random.uniform(0, self.backoff * 2 ** attempt)
+
+    def _last_attempt(self, attempt, delay):
+        return attempt == self.retries or self.breaker.state == OPEN or not deadline.allows(delay)
+
+    def _record(self, started, status):
+        observe_upstream(self.name, started, status)
+        if status == "deadline":
+            return
+        if status == 429:
+            self.quota.throttled()
+        if status == "error" or is_failure(status):
+            self.breaker.record_failure()
+        else:
+            self.breaker.record_success()
+            if self.hedge:
+                self.hedge.record(perf_counter() - started)
+
+    def _connection_failed(self, e, started, attempt, delay):
+        """Falha de conexão ou timeout de uma tentativa: com o prazo esgotado
+        lança DeadlineExceeded; retorna True quando não há nova tentativa."""
+        if deadline.expired():
+            self._record(started, "deadline")
+            raise deadline.exceeded(self.stage) from e
+        self._record(started, "error")
+        if self._last_attempt(attempt, delay):
+            return True
+        logger.warning(f"Falha de conexão com {self.name}, nova tentativa: {describe_error(e)}")
+        return False
+
+    def _accepted(self, response, started, attempt, delay):
+        """Resposta de uma tentativa; retorna True quando ela é a resposta final."""
+        self._record(started, response.status_code)
+        if not is_failure(response.status_code) or self._last_attempt(attempt, delay):
+            return True
+        logger.warning(f"Resposta {response.status_code} de {self.name}, nova tentativa")
+        return False
+
+    def _release(self, probe):
+        # A chamada de teste que não registrou resultado devolve a vaga
+        if probe:
+            self.breaker.release_probe()
+
+    def _hedge_delay(self):
+        return self.hedge.delay() if self.hedge else None
+
+    def _fire_hedge(self, taken):
+        """Segunda requisição do hedge, com `taken` indicando se havia cota
+        sobrando para ela; retorna se ela deve ser disparada."""
+        if taken:
+            hedges.labels(self.name, "fired").inc()
+        return taken
+
+    def _hedge_won(self, response, secondary):
+        """True quando a resposta de uma das requisições do hedge pode ser usada."""
+        if is_failure(response.status_code):
+            return False
+        if secondary:
+            hedges.labels(self.name, "won").inc()
+        return True
+
+
+class UpstreamClient(UpstreamPolicy):
+    def __init__(self, name, connect_timeout=2.0, read_timeout=5.0, retries=2, backoff=0.2, pool_size=10, breaker=None, hedge=None, quota=None):
+        super().__init__(name, connect_timeout, read_timeout, retries, backoff, pool_size, breaker, hedge, quota)
+        self.session = self._create_session()
+        self._hedge_pool = None
+
+    def _create_session(self):
+        session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=4, pool_maxsize=self.pool_size, max_retries=0)
+        session.mount("http://", adapter)
+        session.mount("https://", adapter)
+        return session
+
+    def get(self, url, **kwargs):
+        """GET com timeouts de conexão e leitura e novas tentativas com backoff
+        exponencial com jitter para falhas de rede e respostas 429/5xx. Falha
+        imediatamente com CircuitOpenError quando o circuito do serviço está
+        aberto, e para de repetir se ele abrir durante as tentativas. Os
+        timeouts de cada tentativa são limitados ao prazo restante da
+        requisição; esgotado o prazo, lança DeadlineExceeded. Cada tentativa
+        espera antes a cota do serviço (QuotaExceeded quando não há cota no
+        tempo disponível)."""
+        probe = self.breaker.check()
+        timeout = kwargs.pop("timeout", (self.connect_timeout, self.read_timeout))
+        try:
+            for attempt in range(self.retries + 1):
+                self.quota.acquire(deadline.remaining())
+                kwargs["timeout"] = deadline.clamp(timeout, self.stage)
+                started = perf_counter()
+                delay = self._backoff(attempt)
+                try:
+                    response = self._send(url, kwargs)
+                except (requests.ConnectionError, requests.Timeout) as e:
+                    if self._connection_failed(e, started, attempt, delay):
+                        raise
+                except requests.RequestException:
+                    self._record(started, "error")
+                    raise
+                else:
+                    if self._accepted(response, started, attempt, delay):
+                        return response
+                time.sleep(delay)
+        finally:
+            self._release(probe)
+
+    def _send(self, url, kwargs):
+        delay = self._hedge_delay()
+        if delay is None:
+            return self.session.get(url, **kwargs)
+        return self._hedged(url, kwargs, delay)
+
+    def _hedged(self, url, kwargs, delay):
+        """Dispara uma segunda requisição se a primeira passar de `delay`
+        segundos e retorna a primeira resposta bem-sucedida das duas."""
+        if self._hedge_pool is None:
+            self._hedge_pool = ThreadPoolExecutor(self.pool_size * 2, thread_name_prefix=f"{self.name}-hedge")
+        primary = self._hedge_pool.submit(self.session.get, url, **kwargs)
+        try:
+            return primary.result(timeout=delay)
+        except FutureTimeout:
+            pass
+
+        if not self._fire_hedge(self.quota.try_acquire()):
+            return primary.result()
+        secondary = self._hedge_pool.submit(self.session.get, url, **kwargs)
+        pending = {primary, secondary}
+        while pending:
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                if future.exception() is None and self._hedge_won(future.result(), future is secondary):
+                    return future.result()
+        return primary.result()
+
+    def reset(self):
+        """Descarta a sessão e o pool de hedge herdados de outro processo."""
+        self.session = self._create_session()
+        self._hedge_pool = None
+
+    def close(self):
+        self.session.close()
+        if self._hedge_pool is not None:
+            self._hedge_pool.shutdown(wait=False)
+            self._hedge_pool = None
+
+
+def create_breaker(name):
+    return CircuitBreaker(
+        name,
+        settings.UPSTREAM_BREAKER_FAILURE_RATE,
+        settings.UPSTREAM_BREAKER_WINDOW,
+        settings.UPSTREAM_BREAKER_MIN_CALLS,
+        settings.UPSTREAM_BREAKER_COOLDOWN,
+        settings.UPSTREAM_BREAKER_ENABLED,
+    )
+
+
+def create_quota(name, rate, burst, monthly_quota):
+    state = create_quota_state(name)
+    if state is None:
+        processes = settings.QUOTA_PROCESSES or int(os.getenv("GUNICORN_WORKERS", "1"))
+        rate, burst, monthly_quota = process_share(rate, burst, monthly_quota, processes)
+    return QuotaLimiter(name, rate, burst, monthly_quota, settings.QUOTA_RESERVE, settings.QUOTA_MAX_WAIT, state=state)
+
+
+def create_latency_tracker():
+    if not settings.UPSTREAM_HEDGE_ENABLED:
+        return None
+    return LatencyTracker(
+        settings.UPSTREAM_HEDGE_PERCENTILE,
+        min_samples=settings.UPSTREAM_HEDGE_MIN_SAMPLES,
+        min_delay=settings.UPSTREAM_HEDGE_MIN_DELAY,
+    )
+
+
+# Compartilhados pelos clientes síncrono e assíncrono do mesmo serviço
+google_breaker = create_breaker("google")
+exchange_breaker = create_breaker("exchange")
+google_quota = create_quota("google", settings.GOOGLE_RATE_LIMIT, settings.GOOGLE_RATE_BURST, settings.GOOGLE_MONTHLY_QUOTA)
+exchange_quota = create_quota("exchange", settings.CURRENCY_RATE_LIMIT, settings.CURRENCY_RATE_BURST, settings.CURRENCY_MONTHLY_QUOTA)
+
+registry.callback(
+    "geoloc_upstream_circuit_state", "Estado do circuit breaker de cada serviço externo (1 no estado atual)",
+    "gauge", ["service", "state"],
+    lambda: {
+        (breaker.name, state): int(breaker.state == state)
+        for breaker in (google_breaker, exchange_breaker)
+        for state in (CLOSED, OPEN, HALF_OPEN)
+    },
+)
+
+
+def quota_remaining():
+    remaining = {}
+    for quota in (google_quota, exchange_quota):
+        for period, value in zip(("second", "month"), quota.remaining()):
+            if value is not None:
+                remaining[(quota.name, period)] = value
+    return remaining
+
+
+registry.callback(
+    "geoloc_upstream_quota_remaining", "Chamadas disponíveis agora no bucket (second) e no restante do mês (month) por serviço",
+    "gauge", ["service", "period"], quota_remaining,
+)
+
+
+google_client = UpstreamClient(
+    "google",
+    settings.GOOGLE_CONNECT_TIMEOUT,
+    settings.GOOGLE_READ_TIMEOUT,
+    settings.GOOGLE_RETRIES,
+    settings.GOOGLE_RETRY_BACKOFF,
+    settings.GOOGLE_POOL_SIZE,
+    google_breaker,
+    create_latency_tracker(),
+    google_quota,
+)
+exchange_client = UpstreamClient(
+    "exchange",
+    settings.CURRENCY_CONNECT_TIMEOUT,
+    settings.CURRENCY_READ_TIMEOUT,
+    settings.CURRENCY_RETRIES,
+    settings.CURRENCY_RETRY_BACKOFF,
+    settings.CURRENCY_POOL_SIZE,
+    exchange_breaker,
+    create_latency_tracker(),
+    exchange_quota,
+)
@@ -0,0 +1,310 @@
+import functools
+import inspect
+import threading
+import time
+from bisect import bisect_left
+from utils.profiling import record
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _labels(names, values, extra=()):
+    pairs = list(zip(names, values)) + list(extra)
+    if not pairs:
+        return ""
+    return "{" + ",".join(f'{name}="{_escape(value)}"' for name, value in pairs) + "}"
+
+
+def _number(value):
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class _Metric:
+    kind = None
+
+    def __init__(self, name, documentation, labelnames=()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._children = {}
+        self._lock = threading.Lock()
+        if not self.labelnames:
+            self._default = self.labels()
+
+    def labels(self, *values):
+        key = tuple(str(value) for value in values)
+        child = self._children.get(key)
+        if child is None:
+            if len(key) != len(self.labelnames):
+                raise ValueError(f"{self.name} espera os labels {self.labelnames}")
+            with self._lock:
+                child = self._children.setdefault(key, self._child())
+        return child
+
+    def _child(self):
+        raise NotImplementedError
+
+    def _samples(self):
+        with self._lock:
+            children = sorted(self._children.items())
+        for values, child in children:
+            yield from child.samples(self.name, self.labelnames, values)
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.kind}"]
+        lines.extend(self._samples())
+        return lines
+
+
+class _Value:
+    def __init__(self):
+        self.value = 0.0
+        self._lock = threading.Lock()
+
+    def inc(self, amount=1):
+        with self._lock:
+            self.value += amount
+
+    def dec(self, amount=1):
+        with self._lock:
+            self.value -= amount
+
+    def set(self, value):
+        with self._lock:
+            self.value = value
+
+    def samples(self, name, labelnames, values):
+        yield f"{name}{_labels(labelnames, values)} {_number(self.value)}"
+
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def _child(self):
+        return _Value()
+
+    def inc(self, amount=1):
+        self._default.inc(amount)
+
+
+class Gauge(_Metric):
+    kind = "gauge"
+
+    def _child(self):
+        return _Value()
+
+    def inc(self, amount=1):
+        self._default.inc(amount)
+
+    def dec(self, amount=1):
+        self._default.dec(amount)
+
+    def set(self, value):
+        self._default.set(value)
+
+
+class _HistogramValue:
+    def __init__(self, buckets):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.sum = 0.0
+        self._lock = threading.Lock()
+
+    def observe(self, value):
+        position = bisect_left(self.buckets, value)
+        with self._lock:
+            self.counts[position] += 1
+            self.sum += value
+
+    def samples(self, name, labelnames, values):
+        with self._lock:
+            counts = list(self.counts)
+            total = self.sum
+        cumulative = 0
+        for bound, count in zip(self.buckets + (float("inf"),), counts):
+            cumulative += count
+            yield f"{name}_bucket{_labels(labelnames, values, [('le', _number(bound))])} {cumulative}"
+        yield f"{name}_sum{_labels(labelnames, values)} {_number(total)}"
+        yield f"{name}_count{_labels(labelnames, values)} {cumulative}"
+
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(self, name, documentation, labelnames=(), buckets=DEFAULT_BUCKETS):
+        self.buckets = tuple(sorted(float(bucket) for bucket in buckets))
+        super().__init__(name, documentation, labelnames)
+
+    def _child(self):
+        return _HistogramValue(self.buckets)
+
+    def observe(self, value):
+        self._default.observe(value)
+
+
+class CallbackMetric:
+    """Métrica calculada na coleta: `collect` retorna {valores dos labels: valor},
+    usada para expor contadores que já existem em outros objetos (caches, etc.)."""
+
+    def __init__(self, name, documentation, kind, labelnames, collect):
+        self.name = name
+        self.documentation = documentation
+        self.kind = kind
+        self.labelnames = tuple(labelnames)
+        self.collect = collect
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.kind}"]
+        for values, value in sorted(self.collect().items()):
+            lines.append(f"{self.name}{_labels(self.labelnames, values)} {_number(value)}")
+        return lines
+
+
+class Registry:
+    def __init__(self):
+        self.metrics = {}
+        self._lock = threading.Lock()
+
+    def register(self, metric):
+        with self._lock:
+            self.metrics[metric.name] = metric
+        return metric
+
+    def counter(self, name, documentation, labelnames=()):
+        return self.register(Counter(name, documentation, labelnames))
+
+    def gauge(self, name, documentation, labelnames=()):
+        return self.register(Gauge(name, documentation, labelnames))
+
+    def histogram(self, name, documentation, labelnames=(), buckets=DEFAULT_BUCKETS):
+        return self.register(Histogram(name, documentation, labelnames, buckets))
+
+    def callback(self, name, documentation, kind, labelnames, collect):
+        return self.register(CallbackMetric(name, documentation, kind, labelnames, collect))
+
+    def render(self):
+        with self._lock:
+            metrics = list(self.metrics.values())
+        lines = []
+        for metric in metrics:
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+
+def timed(histogram, *labels, span=None):
+    """Decorador que registra no histograma a duração da função, síncrona ou
+    assíncrona, inclusive quando ela termina com exceção; com `span`, a
+    duração também entra no profile da requisição, quando houver."""
+
+    def decorator(fn):
+        child = histogram.labels(*labels)
+
+        def observe(started):
+            ended = time.perf_counter()
+            child.observe(ended - started)
+            if span:
+                record(span, started, ended)
+
+        if inspect.iscoroutinefunction(fn):
+            @functools.wraps(fn)
+            async def async_wrapper(*args, **kwargs):
+                started = time.perf_counter()
+                try:
+                    return await fn(*args, **kwargs)
+                finally:
+                    observe(started)
+            return async_wrapper
+
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            started = time.perf_counter()
+            try:
+                return fn(*args, **kwargs)
+            finally:
+                observe(started)
+        return wrapper
+
+    return decorator
+
+
+registry = Registry()
+
+request_latency = registry.histogram(
+    "geoloc_http_request_duration_seconds",
+    "Duração das requisições HTTP por rota",
+    ["method", "route", "status"],
+)
+requests_in_flight = registry.gauge(
+    "geoloc_http_requests_in_flight",
+    "Requisições HTTP em andamento",
+)
+errors = registry.counter(
+    "geoloc_errors_total",
+    "Erros tratados pelas rotas, por classe de exceção",
+    ["exception"],
+)
+upstream_latency = registry.histogram(
+    "geoloc_upstream_request_duration_seconds",
+    "Duração de cada tentativa de chamada aos serviços externos",
+    ["service"],
+)
+upstream_requests = registry.counter(
+    "geoloc_upstream_requests_total",
+    "Tentativas de chamada aos serviços externos por status HTTP (error para falhas de rede)",
+    ["service", "status"],
+)
+hedges = registry.counter(
+    "geoloc_upstream_hedges_total",
+    "Requisições de hedge disparadas (fired) e que responderam antes da original (won)",
+    ["service", "result"],
+)
+mongo_latency = registry.histogram(
+    "geoloc_mongo_query_duration_seconds",
+    "Duração das consultas do modelo Currency",
+    ["operation"],
+)
+
+admission_wait = registry.histogram(
+    "geoloc_admission_queue_wait_seconds",
+    "Tempo de espera na fila de admissão por rota",
+    ["route"],
+)
+admission_rejections = registry.counter(
+    "geoloc_admission_rejected_total",
+    "Requisições recusadas com 503 na admissão, por rota e motivo (queue_full, queue_timeout, deadline)",
+    ["route", "reason"],
+)
+deadlines_exceeded = registry.counter(
+    "geoloc_deadline_exceeded_total",
+    "Requisições que esgotaram o prazo, pelo ponto onde o prazo acabou",
+    ["stage"],
+)
+
+quota_wait = registry.histogram(
+    "geoloc_upstream_quota_wait_seconds",
+    "Espera por cota antes de cada chamada aos serviços externos, por classe de prioridade",
+    ["service", "priority"],
+)
+quota_rejections = registry.counter(
+    "geoloc_upstream_quota_rejected_total",
+    "Chamadas aos serviços externos recusadas pelo limitador de cota, por motivo (timeout, monthly)",
+    ["service", "priority", "reason"],
+)
+
+
+def count_error(e):
+    errors.labels(type(e).__name__).inc()
+
+
+def observe_upstream(service, started, status):
+    ended = time.perf_counter()
+    upstream_latency.labels(service).observe(ended - started)
+    upstream_requests.labels(service, status).inc()
+    record(f"upstream.{service}", started, ended)
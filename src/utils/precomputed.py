@@ -0,0 +1,50 @@
+import gzip
+import hashlib
+import json
+import threading
+
+
+class PrecomputedResponse:
+    """Corpo JSON serializado e comprimido uma única vez, com o ETag derivado
+    do hash do conteúdo."""
+
+    def __init__(self, payload):
+        self.body = json.dumps(payload, sort_keys=True, separators=(",", ":")).encode()
+        self.gzipped = gzip.compress(self.body, compresslevel=9, mtime=0)
+        self.etag = hashlib.sha256(self.body).hexdigest()[:32]
+
+    def to_response(self, request, response_class, max_age=0):
+        """Monta a resposta HTTP escolhendo a versão gzip quando o cliente a
+        aceita e respondendo 304 quando o If-None-Match confere."""
+        gzipped = request.accept_encodings["gzip"] > 0
+        etag = f"{self.etag}-gzip" if gzipped else self.etag
+        if request.if_none_match.contains(etag):
+            response = response_class(status=304)
+        else:
+            response = response_class(self.gzipped if gzipped else self.body, mimetype="application/json")
+            if gzipped:
+                response.headers["Content-Encoding"] = "gzip"
+        response.set_etag(etag)
+        response.headers["Vary"] = "Accept-Encoding"
+        response.headers["Cache-Control"] = f"public, max-age={max_age}"
+        return response
+
+
+class PrecomputedCache:
+    """Guarda a última resposta montada e só a remonta quando a versão dos
+    dados muda; `build` retorna o payload ou None quando não há dados."""
+
+    def __init__(self):
+        self.version = None
+        self.response = None
+        self._lock = threading.Lock()
+
+    def get(self, version, build):
+        if self.response is not None and self.version == version:
+            return self.response
+        with self._lock:
+            if self.response is None or self.version != version:
+                payload = build()
+                self.response = PrecomputedResponse(payload) if payload else None
+                self.version = version
+            return self.response
@@ -0,0 +1,240 @@
+import argparse
+import cProfile
+import hashlib
+import hmac
+import json
+import logging
+import os
+import random
+import re
+import threading
+import time
+import tracemalloc
+import uuid
+from contextvars import ContextVar
+
+logger = logging.getLogger(__name__)
+logger.setLevel(logging.INFO)
+
+OPTIONS = ("cprofile", "tracemalloc")
+
+_profile = ContextVar("geoloc_profile", default=None)
+_path = ContextVar("geoloc_span_path", default=())
+
+
+class _NullSpan:
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+
+NULL_SPAN = _NullSpan()
+
+
+class _Span:
+    __slots__ = ("profile", "name", "path", "token", "started")
+
+    def __init__(self, profile, name):
+        self.profile = profile
+        self.name = name
+
+    def __enter__(self):
+        self.path = _path.get() + (self.name,)
+        self.token = _path.set(self.path)
+        self.started = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        ended = time.perf_counter()
+        _path.reset(self.token)
+        self.profile.add(self.path, self.started, ended)
+        return False
+
+
+def span(name):
+    """Mede o bloco como um trecho do profile da requisição atual; sem profile
+    ativo retorna um contexto vazio compartilhado."""
+    profile = _profile.get()
+    if profile is None:
+        return NULL_SPAN
+    return _Span(profile, name)
+
+
+def record(name, started, ended=None):
+    """Registra um trecho já medido com time.perf_counter (ex.: cada tentativa
+    de chamada a um serviço externo)."""
+    profile = _profile.get()
+    if profile is not None:
+        profile.add(_path.get() + (name,), started, time.perf_counter() if ended is None else ended)
+
+
+def sign(secret, expires):
+    return hmac.new(secret.encode(), str(int(expires)).encode(), hashlib.sha256).hexdigest()
+
+
+def make_token(secret, ttl=300, now=None):
+    expires = int((time.time() if now is None else now) + ttl)
+    return f"{expires}.{sign(secret, expires)}"
+
+
+def verify_token(token, secret, now=None):
+    """Token no formato `<expira em (unix)>.<hmac-sha256 da expiração>`."""
+    if not secret or not token:
+        return False
+    expires, _, signature = token.partition(".")
+    try:
+        expires = int(expires)
+    except ValueError:
+        return False
+    if expires < (time.time() if now is None else now):
+        return False
+    return hmac.compare_digest(signature, sign(secret, expires))
+
+
+def parse_options(value):
+    return {option.strip().lower() for option in (value or "").split(",")} & set(OPTIONS)
+
+
+class Profile:
+    def __init__(self, name, options=()):
+        self.id = uuid.uuid4().hex[:12]
+        self.name = name
+        self.options = set(options)
+        self.spans = []
+        self.started = time.perf_counter()
+        self.ended = None
+        self.wall_started = time.time()
+        self.profiler = None
+        self.memory = None
+        self._tracing_memory = False
+        self._lock = threading.Lock()
+
+    def add(self, path, started, ended):
+        with self._lock:
+            self.spans.append((path, started, ended, threading.get_ident()))
+
+    def start(self):
+        if "tracemalloc" in self.options and not tracemalloc.is_tracing():
+            tracemalloc.start()
+            self._tracing_memory = True
+        if "cprofile" in self.options:
+            self.profiler = cProfile.Profile()
+            self.profiler.enable()
+
+    def stop(self):
+        self.ended = time.perf_counter()
+        if self.profiler is not None:
+            self.profiler.disable()
+        if self._tracing_memory:
+            self.memory = tracemalloc.take_snapshot()
+            tracemalloc.stop()
+            self._tracing_memory = False
+
+    @property
+    def duration(self):
+        return (self.ended or time.perf_counter()) - self.started
+
+    def trace_events(self):
+        """Eventos no formato Trace Event (chrome://tracing, Perfetto, speedscope)."""
+        pid = os.getpid()
+        events = [{
+            "name": self.name, "cat": "request", "ph": "X", "ts": 0, "dur": self.duration * 1e6,
+            "pid": pid, "tid": threading.get_ident(),
+        }]
+        for path, started, ended, tid in sorted(self.spans, key=lambda item: item[1]):
+            events.append({
+                "name": path[-1], "cat": ";".join(path[:-1]) or "request", "ph": "X",
+                "ts": (started - self.started) * 1e6, "dur": (ended - started) * 1e6, "pid": pid, "tid": tid,
+            })
+        return {"traceEvents": events, "displayTimeUnit": "ms", "otherData": {"id": self.id, "request": self.name}}
+
+    def folded(self):
+        """Pilhas no formato colapsado do flamegraph.pl/speedscope, em
+        microssegundos de tempo próprio de cada trecho."""
+        totals = {(): self.duration}
+        for path, started, ended, _ in self.spans:
+            totals[path] = totals.get(path, 0.0) + (ended - started)
+        children = {}
+        for path, total in totals.items():
+            if path:
+                children[path[:-1]] = children.get(path[:-1], 0.0) + total
+        lines = []
+        for path, total in sorted(totals.items()):
+            own = max(0.0, total - children.get(path, 0.0))
+            lines.append(f"{';'.join((self.name,) + path)} {round(own * 1e6)}")
+        return "\n".join(lines) + "\n"
+
+    def write(self, directory):
+        os.makedirs(directory, exist_ok=True)
+        slug = re.sub(r"[^A-Za-z0-9]+", "_", self.name).strip("_")
+        prefix = os.path.join(directory, f"{int(self.wall_started)}-{slug}-{self.id}")
+        with open(f"{prefix}.trace.json", "w") as file:
+            json.dump(self.trace_events(), file)
+        with open(f"{prefix}.folded", "w") as file:
+            file.write(self.folded())
+        if self.profiler is not None:
+            self.profiler.dump_stats(f"{prefix}.prof")
+        if self.memory is not None:
+            with open(f"{prefix}.tracemalloc.txt", "w") as file:
+                for stat in self.memory.statistics("lineno")[:50]:
+                    file.write(f"{stat}\n")
+        return prefix
+
+
+class Profiler:
+    """Decide por requisição se o profiling é ativado: por header assinado
+    (opções extras no header `<header>-Options`) ou por amostragem. Os
+    resultados são gravados em `directory`; desativado, `begin` retorna None
+    sem mais nenhum custo."""
+
+    def __init__(self, enabled=False, directory=None, sample_rate=0.0, secret="", header="X-Profile", default_options=(),
+                 random=random.random):
+        self.enabled = enabled
+        self.directory = directory
+        self.sample_rate = sample_rate
+        self.secret = secret
+        self.header = header
+        self.default_options = set(default_options)
+        self.random = random
+
+    def begin(self, headers, name):
+        if not self.enabled:
+            return None
+        if verify_token(headers.get(self.header), self.secret):
+            options = parse_options(headers.get(f"{self.header}-Options"))
+        elif self.sample_rate and self.random() < self.sample_rate:
+            options = self.default_options
+        else:
+            return None
+        profile = Profile(name, options)
+        profile.start()
+        return profile, _profile.set(profile), _path.set(())
+
+    def end(self, state):
+        profile, profile_token, path_token = state
+        profile.stop()
+        _path.reset(path_token)
+        _profile.reset(profile_token)
+        try:
+            prefix = profile.write(self.directory)
+            logger.info(f"Profile de {profile.name} ({profile.duration * 1000:.1f} ms) gravado em {prefix}")
+        except OSError as e:
+            logger.error(f"Erro ao gravar o profile {profile.id}: {str(e)}")
+        return profile
+
+
+def main(argv=None):
+    from settings import settings
+
+    parser = argparse.ArgumentParser(description="Gera o valor do header que ativa o profiling de uma requisição")
+    parser.add_argument("--ttl", type=int, default=300, help="Validade do token, em segundos")
+    args = parser.parse_args(argv)
+    if not settings.PROFILING_SECRET:
+        parser.error("PROFILING_SECRET não definido")
+    print(make_token(settings.PROFILING_SECRET, args.ttl))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,463 @@
+import asyncio
+import logging
+import math
+import os
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from datetime import datetime, timezone
+from settings import settings
+from utils.exceptions import QuotaExceeded
+from utils.metrics import quota_rejections, quota_wait
+
+logger = logging.getLogger(__name__)
+logger.setLevel(logging.INFO)
+
+INTERACTIVE = "interactive"
+BATCH = "batch"
+BACKGROUND = "background"
+# Em ordem de prioridade
+PRIORITIES = (INTERACTIVE, BATCH, BACKGROUND)
+
+_priority = ContextVar("geoloc_quota_priority", default=INTERACTIVE)
+
+
+def current_priority():
+    return _priority.get()
+
+
+def set_priority(priority):
+    return _priority.set(priority)
+
+
+def reset_priority(token):
+    _priority.reset(token)
+
+
+@contextmanager
+def priority(value):
+    """Executa o bloco com a classe de prioridade `value` nas chamadas aos serviços externos."""
+    token = set_priority(value)
+    try:
+        yield
+    finally:
+        reset_priority(token)
+
+
+def month_of(timestamp):
+    return datetime.fromtimestamp(timestamp, timezone.utc).strftime("%Y-%m")
+
+
+class QuotaState:
+    """Token bucket e consumo do mês de um serviço, mantidos no próprio
+    processo. `take` consome uma chamada se houver cota acima de `floor` (a
+    fração reservada) e retorna (consumiu, espera sugerida), com espera None
+    quando só a virada do mês libera a cota."""
+
+    # Estados compartilhados fazem I/O bloqueante e rodam fora do event loop
+    shared = False
+
+    def __init__(self, burst, timer=time.monotonic, clock=time.time):
+        self.timer = timer
+        self.clock = clock
+        self.tokens = float(burst)
+        self.updated_at = timer()
+        self.month = month_of(clock())
+        self.used = 0
+
+    def refill(self, rate, burst):
+        now = self.timer()
+        if rate:
+            self.tokens = min(burst, self.tokens + max(0.0, now - self.updated_at) * rate)
+        self.updated_at = now
+        month = month_of(self.clock())
+        if month != self.month:
+            self.month = month
+            self.used = 0
+
+    def take(self, rate, burst, monthly_quota, floor):
+        self.refill(rate, burst)
+        if monthly_quota and monthly_quota - self.used <= floor * monthly_quota:
+            return False, None
+        if rate:
+            needed = 1 + floor * burst
+            if self.tokens < needed:
+                return False, (needed - self.tokens) / rate
+            self.tokens -= 1
+        self.used += 1
+        return True, 0.0
+
+    def drain(self, rate, burst):
+        self.refill(rate, burst)
+        self.tokens = min(self.tokens, 0.0)
+
+    def read(self, rate, burst):
+        """(tokens no bucket, mês, chamadas no mês)."""
+        self.refill(rate, burst)
+        return self.tokens, self.month, self.used
+
+    def restore(self, rate, burst, month, used):
+        self.refill(rate, burst)
+        if month == self.month:
+            self.used = max(self.used, int(used))
+        return self.used
+
+
+class SQLiteQuotaState:
+    """QuotaState compartilhado pelos processos do mesmo host no arquivo do
+    cache SQLite: cada operação lê, aplica e grava o estado em uma transação
+    exclusiva. Falhas do SQLite liberam a chamada, como se não houvesse
+    limite, para o cache não derrubar as requisições."""
+
+    shared = True
+
+    def __init__(self, name, path, clock=time.time):
+        self.name = name
+        self.path = path
+        self.clock = clock
+        self._local = threading.local()
+
+    def _connection(self):
+        connection = getattr(self._local, "connection", None)
+        if connection is None or self._local.pid != os.getpid():
+            connection = sqlite3.connect(self.path, timeout=5, isolation_level=None, check_same_thread=False)
+            connection.execute("PRAGMA journal_mode=WAL")
+            connection.execute(
+                "CREATE TABLE IF NOT EXISTS quota ("
+                "name TEXT PRIMARY KEY, tokens REAL NOT NULL, updated_at REAL NOT NULL, month TEXT NOT NULL, used INTEGER NOT NULL)"
+            )
+            self._local.connection = connection
+            self._local.pid = os.getpid()
+        return connection
+
+    def _apply(self, burst, operation):
+        connection = self._connection()
+        connection.execute("BEGIN IMMEDIATE")
+        try:
+            row = connection.execute(
+                "SELECT tokens, updated_at, month, used FROM quota WHERE name = ?", (self.name,)
+            ).fetchone()
+            state = QuotaState(burst, self.clock, self.clock)
+            if row is not None:
+                state.tokens, state.updated_at, state.month, state.used = row
+            result = operation(state)
+            connection.execute(
+                "INSERT OR REPLACE INTO quota (name, tokens, updated_at, month, used) VALUES (?, ?, ?, ?, ?)",
+                (self.name, state.tokens, state.updated_at, state.month, state.used),
+            )
+            connection.execute("COMMIT")
+            return result
+        except BaseException:
+            connection.execute("ROLLBACK")
+            raise
+
+    def take(self, rate, burst, monthly_quota, floor):
+        try:
+            return self._apply(burst, lambda state: state.take(rate, burst, monthly_quota, floor))
+        except sqlite3.Error as e:
+            logger.error(f"Erro ao consumir a cota de {self.name}: {str(e)}")
+            return True, 0.0
+
+    def drain(self, rate, burst):
+        try:
+            self._apply(burst, lambda state: state.drain(rate, burst))
+        except sqlite3.Error as e:
+            logger.error(f"Erro ao atualizar a cota de {self.name}: {str(e)}")
+
+    def read(self, rate, burst):
+        try:
+            return self._apply(burst, lambda state: state.read(rate, burst))
+        except sqlite3.Error as e:
+            logger.error(f"Erro ao ler a cota de {self.name}: {str(e)}")
+            return float(burst), month_of(self.clock()), 0
+
+    def restore(self, rate, burst, month, used):
+        try:
+            return self._apply(burst, lambda state: state.restore(rate, burst, month, used))
+        except sqlite3.Error as e:
+            logger.error(f"Erro ao restaurar a cota de {self.name}: {str(e)}")
+            return 0
+
+
+# Mesma lógica do QuotaState, executada de forma atômica no Redis. Os números
+# fracionários voltam como texto porque o Redis trunca os números do Lua.
+REDIS_QUOTA_SCRIPT = """
+local operation = ARGV[1]
+local now, rate, burst = tonumber(ARGV[2]), tonumber(ARGV[3]), tonumber(ARGV[4])
+local monthly_quota, floor, month = tonumber(ARGV[5]), tonumber(ARGV[6]), ARGV[7]
+local state = redis.call('HMGET', KEYS[1], 'tokens', 'updated_at', 'month', 'used')
+local tokens = tonumber(state[1]) or burst
+local updated_at = tonumber(state[2]) or now
+local used = tonumber(state[4]) or 0
+if state[3] ~= month then used = 0 end
+if rate > 0 then tokens = math.min(burst, tokens + math.max(0, now - updated_at) * rate) end
+local taken, wait = 0, '0'
+if operation == 'take' then
+    if monthly_quota > 0 and monthly_quota - used <= floor * monthly_quota then
+        wait = 'month'
+    elseif rate > 0 and tokens < 1 + floor * burst then
+        wait = tostring((1 + floor * burst - tokens) / rate)
+    else
+        if rate > 0 then tokens = tokens - 1 end
+        used = used + 1
+        taken = 1
+    end
+elseif operation == 'drain' then
+    tokens = math.min(tokens, 0)
+elseif operation == 'restore' and ARGV[8] == month then
+    used = math.max(used, tonumber(ARGV[9]))
+end
+redis.call('HSET', KEYS[1], 'tokens', tostring(tokens), 'updated_at', tostring(now), 'month', month, 'used', used)
+redis.call('EXPIRE', KEYS[1], 3456000)
+return {taken, wait, tostring(tokens), used}
+"""
+
+
+class RedisQuotaState:
+    """QuotaState compartilhado por todos os processos e hosts em um Redis,
+    com cada operação feita por um script Lua atômico. Falhas de conexão
+    liberam a chamada, como no SQLiteQuotaState."""
+
+    shared = True
+
+    def __init__(self, name, url=None, client=None, clock=time.time):
+        if client is None:
+            import redis
+
+            client = redis.Redis.from_url(url, socket_timeout=0.5, socket_connect_timeout=0.5)
+        self.name = name
+        self.client = client
+        self.clock = clock
+
+    def _run(self, operation, rate, burst, monthly_quota=0, floor=0.0, *extra):
+        now = self.clock()
+        taken, wait, tokens, used = self.client.eval(
+            REDIS_QUOTA_SCRIPT, 1, f"quota:{self.name}", operation, now, rate, burst, monthly_quota, floor, month_of(now), *extra
+        )
+        wait = wait.decode() if isinstance(wait, bytes) else wait
+        return bool(taken), None if wait == "month" else float(wait), float(tokens), int(used)
+
+    def take(self, rate, burst, monthly_quota, floor):
+        try:
+            return self._run("take", rate, burst, monthly_quota, floor)[:2]
+        except Exception as e:
+            logger.error(f"Erro ao consumir a cota de {self.name}: {str(e)}")
+            return True, 0.0
+
+    def drain(self, rate, burst):
+        try:
+            self._run("drain", rate, burst)
+        except Exception as e:
+            logger.error(f"Erro ao atualizar a cota de {self.name}: {str(e)}")
+
+    def read(self, rate, burst):
+        try:
+            _, _, tokens, used = self._run("read", rate, burst)
+        except Exception as e:
+            logger.error(f"Erro ao ler a cota de {self.name}: {str(e)}")
+            tokens, used = float(burst), 0
+        return tokens, month_of(self.clock()), used
+
+    def restore(self, rate, burst, month, used):
+        try:
+            return self._run("restore", rate, burst, 0, 0.0, month, int(used))[3]
+        except Exception as e:
+            logger.error(f"Erro ao restaurar a cota de {self.name}: {str(e)}")
+            return 0
+
+
+class QuotaLimiter:
+    """Limitador de cota de um serviço externo: token bucket de `rate`
+    chamadas por segundo (com rajadas de até `burst`) e cota mensal de
+    `monthly_quota` chamadas. As classes de prioridade são atendidas em
+    ordem (interativas, lote, segundo plano): uma classe só consome cota
+    quando não há chamadas de classe mais prioritária esperando no processo,
+    e as classes não interativas não usam a fração `reserve` final do bucket
+    nem da cota mensal. O bucket e o consumo do mês ficam em `state`, do
+    próprio processo ou compartilhado (SQLiteQuotaState, RedisQuotaState).
+    Sem limites configurados, não restringe nada."""
+
+    def __init__(self, name, rate=0.0, burst=0, monthly_quota=0, reserve=0.0, max_wait=2.0, timer=time.monotonic, clock=time.time, state=None):
+        self.name = name
+        self.rate = rate
+        self.burst = burst or max(1, int(rate))
+        self.monthly_quota = monthly_quota
+        self.reserve = reserve
+        self.max_wait = max_wait
+        self.timer = timer
+        self.state = state or QuotaState(self.burst, timer, clock)
+        self._waiting = dict.fromkeys(PRIORITIES, 0)
+        self._condition = threading.Condition()
+
+    @property
+    def enabled(self):
+        return self.rate > 0 or self.monthly_quota > 0
+
+    def _try_take(self, priority):
+        """Consome uma chamada da cota; retorna (consumiu, espera sugerida),
+        com espera None quando só a virada do mês libera a cota."""
+        level = PRIORITIES.index(priority)
+        if any(self._waiting[higher] for higher in PRIORITIES[:level]):
+            return False, 1 / self.rate if self.rate else 0.01
+        floor = 0 if level == 0 else self.reserve
+        return self.state.take(self.rate, self.burst, self.monthly_quota, floor)
+
+    def _rejected(self, priority, reason):
+        quota_rejections.labels(self.name, priority, reason).inc()
+        if reason == "monthly":
+            return QuotaExceeded(f"Cota mensal de {self.name} esgotada", reason)
+        return QuotaExceeded(reason=reason)
+
+    def _wait_for(self, priority, started, timeout, wait):
+        """Tempo a esperar antes de tentar de novo; recusa de imediato quando
+        a cota não será liberada dentro do tempo disponível."""
+        if wait is None:
+            raise self._rejected(priority, "monthly")
+        left = started + timeout - self.timer()
+        if wait > left:
+            raise self._rejected(priority, "timeout")
+        return wait
+
+    def _timeout(self, timeout):
+        return self.max_wait if timeout is None else min(timeout, self.max_wait)
+
+    def acquire(self, timeout=None):
+        """Espera, até `timeout` (limitado a `max_wait`), a cota para uma
+        chamada da classe de prioridade atual; retorna o tempo de espera."""
+        if not self.enabled:
+            return 0.0
+        priority = current_priority()
+        timeout = self._timeout(timeout)
+        started = self.timer()
+        with self._condition:
+            self._waiting[priority] += 1
+            try:
+                while True:
+                    taken, wait = self._try_take(priority)
+                    if taken:
+                        break
+                    self._condition.wait(self._wait_for(priority, started, timeout, wait))
+            finally:
+                self._waiting[priority] -= 1
+                self._condition.notify_all()
+        waited = self.timer() - started
+        quota_wait.labels(self.name, priority).observe(waited)
+        return waited
+
+    async def acquire_async(self, timeout=None):
+        if not self.enabled:
+            return 0.0
+        priority = current_priority()
+        timeout = self._timeout(timeout)
+        started = self.timer()
+        with self._condition:
+            self._waiting[priority] += 1
+        try:
+            while True:
+                taken, wait = await self._off_loop(self._take, priority)
+                if taken:
+                    break
+                await asyncio.sleep(self._wait_for(priority, started, timeout, wait))
+        finally:
+            with self._condition:
+                self._waiting[priority] -= 1
+                self._condition.notify_all()
+        waited = self.timer() - started
+        quota_wait.labels(self.name, priority).observe(waited)
+        return waited
+
+    def _take(self, priority):
+        with self._condition:
+            return self._try_take(priority)
+
+    async def _off_loop(self, fn, *args):
+        """Com estado compartilhado, executa em uma thread a operação que faz
+        I/O (e espera a trava do limitador), sem parar o event loop."""
+        if not self.state.shared:
+            return fn(*args)
+        return await asyncio.to_thread(fn, *args)
+
+    def try_acquire(self):
+        """Consome cota apenas se houver disponível agora, sem esperar (ex.: hedge)."""
+        if not self.enabled:
+            return True
+        return self._take(current_priority())[0]
+
+    async def try_acquire_async(self):
+        if not self.enabled:
+            return True
+        return (await self._off_loop(self._take, current_priority()))[0]
+
+    def throttled(self):
+        """Resposta 429 do serviço: esvazia o bucket para recuar antes da
+        próxima chamada. No event loop, o estado compartilhado é atualizado em
+        segundo plano."""
+        if self.state.shared:
+            try:
+                asyncio.get_running_loop().run_in_executor(None, self._drain)
+                return
+            except RuntimeError:
+                pass
+        self._drain()
+
+    def _drain(self):
+        with self._condition:
+            self.state.drain(self.rate, self.burst)
+
+    def _read(self):
+        with self._condition:
+            return self.state.read(self.rate, self.burst)
+
+    @property
+    def month(self):
+        return self._read()[1]
+
+    def remaining(self):
+        """Chamadas disponíveis agora no bucket e no restante do mês (None sem limite)."""
+        tokens, _, used = self._read()
+        second = tokens if self.rate else None
+        month = self.monthly_quota - used if self.monthly_quota else None
+        return second, month
+
+    def dump(self):
+        _, month, used = self._read()
+        return {"month": month, "used": used}
+
+    def restore(self, data):
+        """Retoma o consumo do mês registrado em um snapshot."""
+        with self._condition:
+            return self.state.restore(self.rate, self.burst, data["month"], data["used"])
+
+    def stats(self):
+        tokens, _, used = self._read()
+        with self._condition:
+            waiting = dict(self._waiting)
+        return {
+            "rate": self.rate,
+            "tokens": tokens if self.rate else None,
+            "monthly_quota": self.monthly_quota or None,
+            "used_this_month": used,
+            "remaining_this_month": self.monthly_quota - used if self.monthly_quota else None,
+            "waiting": waiting,
+        }
+
+
+def create_quota_state(name, backend=None):
+    """Estado da cota conforme CACHE_BACKEND: compartilhado no SQLite ou no
+    Redis, ou None (no próprio processo) com o backend em memória."""
+    backend = backend or settings.CACHE_BACKEND
+    if backend == "sqlite":
+        return SQLiteQuotaState(name, settings.CACHE_SQLITE_PATH)
+    if backend == "redis":
+        return RedisQuotaState(name, settings.CACHE_REDIS_URL)
+    return None
+
+
+def process_share(rate, burst, monthly_quota, processes):
+    """Parte de cada um dos `processes` processos nos limites de um serviço,
+    quando o estado da cota não é compartilhado entre eles."""
+    if processes <= 1:
+        return rate, burst, monthly_quota
+    return rate / processes, math.ceil(burst / processes), monthly_quota and max(1, monthly_quota // processes)
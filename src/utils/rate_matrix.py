@@ -0,0 +1,76 @@
+import threading
+import numpy as np
+from utils.rates import currency_code
+
+
+class RateMatrix:
+    def __init__(self, currencies, rates, version=None):
+        self.currencies = currencies
+        self.index = {currency: position for position, currency in enumerate(currencies)}
+        self.rates = rates
+        self.version = version
+
+    @classmethod
+    def build(cls, tables, pivot=None, version=None):
+        """Monta a matriz N×N em que rates[i, j] converte a moeda i na moeda j.
+        As linhas vêm das tabelas em cache; as lacunas são preenchidas com a
+        taxa cruzada pela moeda pivô (pivô[j] / pivô[i])."""
+        currencies = set(tables)
+        for table in tables.values():
+            currencies.update(table.rates)
+        currencies = sorted(currencies)
+
+        def vector(table):
+            return np.array([table.rates.get(currency, np.nan) for currency in currencies], dtype=float)
+
+        size = len(currencies)
+        rates = np.full((size, size), np.nan)
+        if pivot in tables:
+            pivot_rates = vector(tables[pivot])
+            with np.errstate(divide="ignore", invalid="ignore"):
+                rates = pivot_rates[np.newaxis, :] / pivot_rates[:, np.newaxis]
+            rates[~np.isfinite(rates)] = np.nan
+
+        index = {currency: position for position, currency in enumerate(currencies)}
+        for base, table in tables.items():
+            row = vector(table)
+            known = ~np.isnan(row)
+            rates[index[base], known] = row[known]
+        np.fill_diagonal(rates, 1.0)
+        return cls(currencies, rates, version)
+
+    def convert(self, base, amounts, targets=None):
+        """Converte o vetor de valores para todas as moedas alvo de uma vez;
+        retorna {moeda: [valores]} com None onde não há taxa. Os códigos são
+        normalizados na consulta, e o resultado usa as moedas como pedidas."""
+        base = currency_code(base)
+        if base not in self.index:
+            return {}
+        targets = self.currencies if targets is None else targets
+        positions = np.array([self.index.get(currency_code(target), -1) for target in targets], dtype=int)
+        row = self.rates[self.index[base]]
+        selected = np.where(positions >= 0, row[positions], np.nan)
+        converted = np.outer(np.asarray(amounts, dtype=float), selected)
+        result = {}
+        for column, target in enumerate(targets):
+            values = converted[:, column]
+            result[target] = None if np.isnan(values).any() else values.tolist()
+        return result
+
+
+class RateMatrixCache:
+    def __init__(self, store, max_stale=0):
+        self.store = store
+        self.max_stale = max_stale
+        self.matrix = RateMatrix([], np.empty((0, 0)), version=-1)
+        self._lock = threading.Lock()
+
+    def get(self):
+        matrix = self.matrix
+        if matrix.version == self.store.version:
+            return matrix
+        with self._lock:
+            if self.matrix.version != self.store.version:
+                version = self.store.version
+                self.matrix = RateMatrix.build(self.store.tables(self.max_stale), self.store.pivot, version)
+            return self.matrix
@@ -0,0 +1,102 @@
+import threading
+import time
+
+
+def currency_code(currency):
+    """Código de moeda normalizado (ISO 4217 em maiúsculas) para guardar e
+    consultar as tabelas pelo mesmo valor que o serviço de câmbio usa."""
+    return currency.upper() if currency else currency
+
+
+class RateTable:
+    def __init__(self, base, rates, fetched_at=None, next_update=None, updated_at=None):
+        self.base = base
+        self.rates = rates
+        self.fetched_at = time.time() if fetched_at is None else fetched_at
+        self.next_update = next_update
+        self.updated_at = updated_at
+
+    @classmethod
+    def from_response(cls, base, data):
+        return cls(
+            currency_code(data.get("base_code", base)),
+            data.get("conversion_rates", {}),
+            next_update=data.get("time_next_update_unix"),
+            updated_at=data.get("time_last_update_unix"),
+        )
+
+    @classmethod
+    def from_dict(cls, data):
+        return cls(data["base"], data["rates"], data["fetched_at"], data["next_update"], data.get("updated_at"))
+
+    def to_dict(self):
+        return {
+            "base": self.base,
+            "rates": self.rates,
+            "fetched_at": self.fetched_at,
+            "next_update": self.next_update,
+            "updated_at": self.updated_at,
+        }
+
+    def rate(self, currency):
+        return self.rates.get(currency_code(currency))
+
+
+class RateStore:
+    def __init__(self, pivot=None, default_ttl=3600, timer=time.time):
+        self.pivot = pivot
+        self.default_ttl = default_ttl
+        self.timer = timer
+        self._tables = {}
+        self._lock = threading.Lock()
+        self.version = 0
+
+    def expires_at(self, table):
+        if table.next_update:
+            return table.next_update
+        return table.fetched_at + self.default_ttl
+
+    def get(self, base, max_stale=0):
+        table = self._tables.get(currency_code(base))
+        if table and self.expires_at(table) + max_stale > self.timer():
+            return table
+        return None
+
+    def peek(self, base):
+        return self._tables.get(currency_code(base))
+
+    def bases(self):
+        return list(self._tables)
+
+    def tables(self, max_stale=0):
+        now = self.timer()
+        return {
+            base: table for base, table in list(self._tables.items())
+            if self.expires_at(table) + max_stale > now
+        }
+
+    def put(self, table):
+        with self._lock:
+            self._tables[currency_code(table.base)] = table
+            self.version += 1
+
+    def clear(self):
+        with self._lock:
+            self._tables.clear()
+            self.version += 1
+
+    def rate(self, base, desired):
+        """Taxa de base para desired a partir das tabelas em cache, usando a
+        tabela da própria base ou, na falta dela, a taxa cruzada pela moeda pivô.
+        A taxa de uma moeda para ela mesma só é 1.0 quando a moeda é conhecida."""
+        base, desired = currency_code(base), currency_code(desired)
+        table = self.get(base)
+        if table:
+            return 1.0 if base == desired else table.rate(desired)
+        pivot = self.get(self.pivot) if self.pivot else None
+        if pivot:
+            base_rate = pivot.rate(base)
+            desired_rate = pivot.rate(desired)
+            if base_rate and desired_rate is not None:
+                return desired_rate / base_rate
+        return None
@@ -0,0 +1,111 @@
+import logging
+import threading
+
+logger = logging.getLogger(__name__)
+logger.setLevel(logging.INFO)
+
+
+class RateRefresher:
+    def __init__(self, store, fetch, list_currencies, interval=60, refresh_ahead=300):
+        self.store = store
+        self.fetch = fetch
+        self.list_currencies = list_currencies
+        self.interval = interval
+        self.refresh_ahead = refresh_ahead
+        self._pending = set()
+        self._retry_at = {}
+        self._failures = {}
+        self._lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._stop = threading.Event()
+        self._thread = None
+
+    @property
+    def running(self):
+        return self._thread is not None and self._thread.is_alive()
+
+    def start(self):
+        if self.running:
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="rate-refresher", daemon=True)
+        self._thread.start()
+        logger.info("Atualização de câmbio em segundo plano iniciada")
+
+    def stop(self, timeout=None):
+        self._stop.set()
+        self._wakeup.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+        self._thread = None
+
+    def request_refresh(self, currency):
+        """Agenda a atualização imediata de uma moeda; retorna False quando a
+        atualização em segundo plano não está rodando."""
+        if not self.running:
+            return False
+        with self._lock:
+            self._pending.add(currency)
+        self._wakeup.set()
+        return True
+
+    def currencies(self):
+        currencies = set(self.store.bases())
+        try:
+            currencies.update(self.list_currencies())
+        except Exception as e:
+            logger.error(f"Erro ao listar moedas para atualização de câmbio: {str(e)}")
+        return currencies
+
+    def refresh_due(self):
+        with self._lock:
+            pending, self._pending = self._pending, set()
+        now = self.store.timer()
+        deadline = now + self.refresh_ahead
+        for currency in sorted(self.currencies() | pending):
+            if currency not in pending:
+                table = self.store.peek(currency)
+                if table and self.store.expires_at(table) > deadline:
+                    continue
+                if self._retry_at.get(currency, 0) > now:
+                    continue
+            self.refresh(currency)
+
+    def refresh(self, currency):
+        previous = self.store.peek(currency)
+        try:
+            table = self.fetch(currency)
+            self.store.put(table)
+        except Exception as e:
+            logger.error(f"Erro ao atualizar câmbio de {currency}: {str(e)}")
+            self._failed(currency)
+            return False
+        self._failures.pop(currency, None)
+        self._schedule(currency, previous, table)
+        return True
+
+    def _failed(self, currency):
+        """Recuo exponencial, a partir de `interval` e limitado a
+        `refresh_ahead`, entre as tentativas de uma moeda que está falhando."""
+        failures = self._failures[currency] = self._failures.get(currency, 0) + 1
+        delay = min(self.interval * 2 ** failures, max(self.interval, self.refresh_ahead))
+        self._retry_at[currency] = self.store.timer() + delay
+
+    def _schedule(self, currency, previous, table):
+        """Quando o serviço ainda não publicou a próxima tabela (a expiração
+        não avançou), adia a nova busca até a expiração informada em vez de
+        repeti-la a cada ciclo da janela de antecedência."""
+        expires_at = self.store.expires_at(table)
+        if previous is not None and expires_at <= self.store.expires_at(previous):
+            self._retry_at[currency] = max(expires_at, self.store.timer() + self.interval)
+        else:
+            self._retry_at.pop(currency, None)
+
+    def _run(self):
+        while not self._stop.is_set():
+            try:
+                self.refresh_due()
+            except Exception as e:
+                logger.error(f"Erro na atualização de câmbio: {str(e)}")
+            self._wakeup.wait(self.interval)
+            self._wakeup.clear()
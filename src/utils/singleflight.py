@@ -0,0 +1,99 @@
+import asyncio
+import threading
+from utils import deadline
+from utils.exceptions import DeadlineExceeded, QuotaExceeded
+
+# Erros que dependem do prazo ou da prioridade de quem fez a chamada: quem
+# esperava não os recebe e tenta de novo, com o próprio prazo e prioridade
+CALLER_ERRORS = (DeadlineExceeded, QuotaExceeded)
+
+
+class _Call:
+    def __init__(self):
+        self.event = threading.Event()
+        self.result = None
+        self.error = None
+
+
+class FlightCounters:
+    def __init__(self):
+        self.counters = {}
+        self._counters_lock = threading.Lock()
+
+    def _count(self, key, field):
+        name = key[0] if isinstance(key, tuple) else key
+        with self._counters_lock:
+            counters = self.counters.setdefault(name, {"calls": 0, "coalesced": 0})
+            counters[field] += 1
+
+    def stats(self):
+        with self._counters_lock:
+            return {name: dict(counters) for name, counters in self.counters.items()}
+
+
+class SingleFlight(FlightCounters):
+    """Garante uma única chamada em andamento por chave; as threads que chegam
+    durante a chamada esperam e recebem o mesmo resultado ou a mesma exceção,
+    exceto prazo ou cota esgotados de quem fez a chamada (CALLER_ERRORS):
+    nesse caso a próxima thread a tentar faz a chamada."""
+
+    def __init__(self):
+        super().__init__()
+        self._calls = {}
+        self._lock = threading.Lock()
+
+    def do(self, key, fn):
+        while True:
+            with self._lock:
+                call = self._calls.get(key)
+                leader = call is None
+                if leader:
+                    call = self._calls[key] = _Call()
+            self._count(key, "calls" if leader else "coalesced")
+
+            if not leader:
+                if not call.event.wait(deadline.remaining()):
+                    raise deadline.exceeded("singleflight")
+                if isinstance(call.error, CALLER_ERRORS):
+                    continue
+            else:
+                try:
+                    call.result = fn()
+                except Exception as e:
+                    call.error = e
+                finally:
+                    with self._lock:
+                        del self._calls[key]
+                    call.event.set()
+
+            if call.error is not None:
+                raise call.error
+            return call.result
+
+
+class AsyncSingleFlight(FlightCounters):
+    def __init__(self):
+        super().__init__()
+        self._tasks = {}
+
+    async def do(self, key, factory):
+        while True:
+            task = self._tasks.get(key)
+            leader = task is None
+            if leader:
+                self._count(key, "calls")
+                task = self._tasks[key] = asyncio.ensure_future(factory())
+                task.add_done_callback(lambda done: self._tasks.pop(key, None) if self._tasks.get(key) is done else None)
+            else:
+                self._count(key, "coalesced")
+            try:
+                return await asyncio.wait_for(asyncio.shield(task), deadline.remaining())
+            except asyncio.TimeoutError:
+                if task.done():
+                    raise
+                raise deadline.exceeded("singleflight") from None
+            except CALLER_ERRORS:
+                if leader:
+                    raise
+                if self._tasks.get(key) is task:
+                    del self._tasks[key]
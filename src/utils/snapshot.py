@@ -0,0 +1,143 @@
+import json
+import logging
+import mmap
+import os
+import struct
+import threading
+import time
+import zlib
+
+logger = logging.getLogger(__name__)
+logger.setLevel(logging.INFO)
+
+MAGIC = b"GEOSNAP\0"
+FORMAT_VERSION = 1
+# magic, versão do formato, criado em (unix), tamanho e crc32 do conteúdo
+HEADER = struct.Struct("<8sHdQI")
+
+
+class SnapshotError(Exception):
+    pass
+
+
+def write_snapshot(path, sections, created_at=None):
+    """Grava as seções em um arquivo com cabeçalho binário fixo seguido do
+    conteúdo em JSON; a troca pelo arquivo anterior é atômica."""
+    payload = json.dumps(sections, ensure_ascii=False, separators=(",", ":")).encode()
+    created_at = time.time() if created_at is None else created_at
+    header = HEADER.pack(MAGIC, FORMAT_VERSION, created_at, len(payload), zlib.crc32(payload))
+    directory = os.path.dirname(os.path.abspath(path))
+    os.makedirs(directory, exist_ok=True)
+    temporary = f"{path}.{os.getpid()}.tmp"
+    with open(temporary, "wb") as file:
+        file.write(header)
+        file.write(payload)
+        file.flush()
+        os.fsync(file.fileno())
+    os.replace(temporary, path)
+    return HEADER.size + len(payload)
+
+
+def read_snapshot(path):
+    """Lê o arquivo por mmap, valida cabeçalho, versão e crc32 e retorna
+    (criado em, seções)."""
+    with open(path, "rb") as file:
+        if os.fstat(file.fileno()).st_size < HEADER.size:
+            raise SnapshotError("Snapshot truncado")
+        with mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ) as data:
+            magic, version, created_at, length, checksum = HEADER.unpack_from(data)
+            if magic != MAGIC:
+                raise SnapshotError("Arquivo não é um snapshot")
+            if version != FORMAT_VERSION:
+                raise SnapshotError(f"Versão do snapshot não suportada: {version}")
+            payload = data[HEADER.size:HEADER.size + length]
+            if len(payload) != length or zlib.crc32(payload) != checksum:
+                raise SnapshotError("Snapshot corrompido")
+    return created_at, json.loads(payload)
+
+
+class WarmStart:
+    """Snapshot do estado em memória (caches, tabelas de câmbio, moedas) para
+    que um processo novo não comece vazio. Cada seção registra uma função
+    que exporta o estado e outra que o restaura a partir dos dados e da idade
+    do snapshot, retornando quantas entradas foram restauradas."""
+
+    def __init__(self, path, max_age=86400, interval=300, timer=time.time):
+        self.path = path
+        self.max_age = max_age
+        self.interval = interval
+        self.timer = timer
+        self.sections = {}
+        self.last_restore = None
+        self._stop = threading.Event()
+        self._thread = None
+
+    def register(self, name, dump, restore):
+        self.sections[name] = (dump, restore)
+
+    def save(self):
+        sections = {name: dump() for name, (dump, _) in self.sections.items()}
+        return write_snapshot(self.path, sections, self.timer())
+
+    def restore(self):
+        started = time.perf_counter()
+        try:
+            created_at, sections = read_snapshot(self.path)
+        except FileNotFoundError:
+            logger.info("Nenhum snapshot para restaurar")
+            return {}
+        except (OSError, ValueError, SnapshotError) as e:
+            logger.warning(f"Snapshot {self.path} ignorado: {str(e)}")
+            return {}
+
+        age = self.timer() - created_at
+        if age < 0 or age > self.max_age:
+            logger.warning(f"Snapshot {self.path} ignorado pela idade: {age:.0f}s")
+            return {}
+
+        counts = {}
+        for name, (_, restore) in self.sections.items():
+            if name not in sections:
+                continue
+            try:
+                counts[name] = restore(sections[name], age)
+            except (KeyError, TypeError, ValueError) as e:
+                logger.warning(f"Seção {name} do snapshot ignorada: {str(e)}")
+        elapsed = time.perf_counter() - started
+        self.last_restore = {"age": age, "elapsed": elapsed, "entries": counts}
+        summary = ", ".join(f"{name}={count}" for name, count in counts.items())
+        logger.info(f"Snapshot restaurado em {elapsed * 1000:.1f} ms (idade {age:.0f}s): {summary}")
+        return counts
+
+    @property
+    def running(self):
+        return self._thread is not None and self._thread.is_alive()
+
+    def start(self):
+        if self.running:
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="warm-start", daemon=True)
+        self._thread.start()
+
+    def stop(self, save=True, timeout=None):
+        """Para a gravação periódica e, com `save`, grava o snapshot final."""
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+        self._thread = None
+        if save:
+            self._save_logged()
+
+    def _save_logged(self):
+        try:
+            size = self.save()
+        except (OSError, TypeError, ValueError) as e:
+            logger.error(f"Erro ao gravar o snapshot {self.path}: {str(e)}")
+            return None
+        logger.info(f"Snapshot gravado em {self.path} ({size} bytes)")
+        return size
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            self._save_logged()
@@ -0,0 +1,82 @@
+import csv
+import json
+from itertools import islice
+
+
+class RowError(Exception):
+    pass
+
+
+class RowParser:
+    """Converte, linha a linha, um arquivo CSV (com cabeçalho) ou NDJSON em
+    dicionários, sem guardar o arquivo em memória. Registros CSV devem ocupar
+    uma única linha."""
+
+    def __init__(self, file_format):
+        if file_format not in ("csv", "ndjson"):
+            raise ValueError(f"Formato inválido: {file_format}")
+        self.file_format = file_format
+        self.header = None
+        self.count = 0
+
+    def parse(self, line):
+        """Retorna (número da linha de dados, dict ou RowError), ou None para o
+        cabeçalho e linhas em branco."""
+        line = line.rstrip("\r\n")
+        if not line.strip():
+            return None
+        if self.file_format == "csv":
+            values = next(csv.reader([line]))
+            if self.header is None:
+                self.header = [value.strip() for value in values]
+                return None
+            self.count += 1
+            if len(values) != len(self.header):
+                return self.count, RowError("Número de colunas diferente do cabeçalho")
+            return self.count, dict(zip(self.header, values))
+
+        self.count += 1
+        try:
+            row = json.loads(line)
+        except ValueError:
+            return self.count, RowError("JSON inválido")
+        if not isinstance(row, dict):
+            return self.count, RowError("A linha deve ser um objeto JSON")
+        return self.count, row
+
+    def rows(self, lines):
+        for line in lines:
+            row = self.parse(line)
+            if row is not None:
+                yield row
+
+
+def detect_format(content_type=None, filename=None):
+    if (content_type and "csv" in content_type) or (filename and filename.lower().endswith(".csv")):
+        return "csv"
+    return "ndjson"
+
+
+def chunked(iterable, size):
+    iterator = iter(iterable)
+    while True:
+        chunk = list(islice(iterator, size))
+        if not chunk:
+            return
+        yield chunk
+
+
+def to_ndjson(result):
+    return json.dumps(result, ensure_ascii=False, separators=(",", ":")) + "\n"
+
+
+async def aiter_lines(chunks, encoding="utf-8"):
+    """Divide em linhas um corpo recebido em pedaços de bytes."""
+    buffer = b""
+    async for chunk in chunks:
+        buffer += chunk
+        *lines, buffer = buffer.split(b"\n")
+        for line in lines:
+            yield line.decode(encoding)
+    if buffer:
+        yield buffer.decode(encoding)
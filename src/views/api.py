@@ -1,41 +1,245 @@
+import io
 import logging
-from flask import Blueprint, request, jsonify
+import time
+from contextlib import contextmanager
+from flask import Blueprint, Response, g, request, jsonify, stream_with_context
+from flask.json.provider import DefaultJSONProvider
 from marshmallow import ValidationError
-from controllers.geoloc_controller import GeoController
-from schemas import ConversionCountrySchema, ConversionSchema, CoordSchema, TaxSchema
-from utils.exceptions import CountryNotFound, CurrenciesNotFound, DesiredCurrencyNotFound, ExchangeApiError, GoogleMapsApiError, TaxNotFound
+from controllers.batch_controller import BatchGeoController
+from controllers.stream_controller import StreamConverter
+from controllers.geoloc_controller import GeoController, geocode_cache, upstream_flights, warm_start
+from database.db import MongoDBManager
+from settings import settings
+from schemas import ConversionCountrySchema, ConversionMatrixSchema, ConversionSchema, CoordSchema, TaxSchema
+from utils import deadline, quota
+from utils.admission import admission
+from utils.http_client import describe_error, exchange_client, google_client
+from utils.streaming import RowParser, detect_format, to_ndjson
+from utils.metrics import CONTENT_TYPE, count_error, registry, request_latency, requests_in_flight
+from utils.profiling import Profiler, parse_options, span
+from utils.exceptions import CountryNotFound, CurrenciesNotFound, DesiredCurrencyNotFound, ExchangeApiError, GoogleMapsApiError, ServiceOverloaded, TaxNotFound
 
 bp = Blueprint("geoloc", __name__)
 
 logger = logging.getLogger(__name__)
 logger.setLevel(logging.INFO)
 
+TAX_ERRORS = [
+    ((GoogleMapsApiError, ExchangeApiError), 500),
+    ((CountryNotFound, CurrenciesNotFound, TaxNotFound, DesiredCurrencyNotFound), 404),
+    (ServiceOverloaded, 503),
+]
+CONVERSION_ERRORS = [(ExchangeApiError, 500), (TaxNotFound, 404), (ServiceOverloaded, 503)]
+CONVERSION_COUNTRY_ERRORS = [((DesiredCurrencyNotFound, TaxNotFound), 404), (ServiceOverloaded, 503)]
+# Rotas de operação, sem prazo nem controle de admissão
+UNLIMITED_ROUTES = {"/health", "/ready", "/stats", "/metrics"}
+# Rotas atendidas com a prioridade de lote na cota dos serviços externos
+BATCH_ROUTES = {"/tax_coords/batch", "/conversion/batch", "/conversion_by_country/batch", "/conversion/stream"}
+# Rotas em fluxo, sem tamanho limite: o prazo e a vaga de admissão valem por bloco, não para a requisição
+STREAM_ROUTES = {"/conversion/stream"}
+
+route_timeouts = deadline.parse_routes(settings.REQUEST_ROUTE_TIMEOUTS)
+
+profiler = Profiler(
+    settings.PROFILING_ENABLED,
+    settings.PROFILING_DIR,
+    settings.PROFILING_SAMPLE_RATE,
+    settings.PROFILING_SECRET,
+    settings.PROFILING_HEADER,
+    parse_options(settings.PROFILING_OPTIONS),
+)
+
+
+class ProfiledJSONProvider(DefaultJSONProvider):
+    """Provider JSON que mede a serialização das respostas no profile da requisição."""
+
+    def response(self, *args, **kwargs):
+        with span("serialization"):
+            return super().response(*args, **kwargs)
+
+
+def log_error(e):
+    logger.error(f"Error: {describe_error(e)}")
+    count_error(e)
+
+
+def retry_after():
+    return {"Retry-After": str(settings.ADMISSION_RETRY_AFTER)}
+
+
+def shed_response(e):
+    return jsonify({"status": 503, "message": str(e)}), 503, retry_after()
+
+
+def upstream_quota():
+    return {client.name: client.quota.stats() for client in (google_client, exchange_client)}
+
+
+def route_timeout(route, headers):
+    return deadline.request_timeout(headers, settings.REQUEST_TIMEOUT_HEADER, route_timeouts.get(route, settings.REQUEST_TIMEOUT))
+
+
+@contextmanager
+def stream_chunk_budget(route):
+    """Prazo de STREAM_CHUNK_TIMEOUT e vaga de admissão da rota para um bloco da conversão em fluxo."""
+    token = deadline.start(settings.STREAM_CHUNK_TIMEOUT)
+    try:
+        admitted = admission.acquire(route, deadline.remaining())
+        try:
+            yield
+        finally:
+            if admitted is not None:
+                admitted.release()
+    finally:
+        deadline.end(token)
+
+
+def load_batch(schema):
+    payload = request.get_json()
+    if not isinstance(payload, list):
+        raise ValidationError("O lote deve ser uma lista de itens")
+    if len(payload) > settings.BATCH_MAX_ITEMS:
+        raise ValidationError(f"O lote deve ter no máximo {settings.BATCH_MAX_ITEMS} itens")
+    items = []
+    for item in payload:
+        try:
+            items.append(schema.load(item))
+        except ValidationError as e:
+            items.append(e)
+    return items
+
+
+def valid_items(items):
+    return [item for item in items if not isinstance(item, ValidationError)]
+
+
+def run_batch(items, handler, errors):
+    results = []
+    for item in items:
+        try:
+            if isinstance(item, ValidationError):
+                raise item
+            results.append({"status": 200, **handler(item)})
+        except ValidationError as e:
+            results.append({"status": 422, "message": str(e)})
+        except Exception as e:
+            log_error(e)
+            status = next((status for types, status in errors if isinstance(e, types)), 400)
+            results.append({"status": status, "message": str(e)})
+    return {"results": results}
+
+def end_profile(state, response=None):
+    if state is None:
+        return
+    profile = profiler.end(state)
+    if response is not None:
+        response.headers["X-Profile-Id"] = profile.id
+
+@bp.before_request
+def start_request_timer():
+    g.request_started = time.perf_counter()
+    route = request.url_rule.rule if request.url_rule else "unmatched"
+    g.profile = profiler.begin(request.headers, f"{request.method} {route}")
+    requests_in_flight.inc()
+
+@bp.before_request
+def admit_request():
+    if not request.url_rule or request.url_rule.rule in UNLIMITED_ROUTES:
+        return None
+    route = request.url_rule.rule
+    if route in BATCH_ROUTES:
+        g.priority = quota.set_priority(quota.BATCH)
+    if route in STREAM_ROUTES:
+        return None
+    g.deadline = deadline.start(route_timeout(route, request.headers))
+    try:
+        g.admitted = admission.acquire(route, deadline.remaining())
+    except ServiceOverloaded as e:
+        log_error(e)
+        return shed_response(e)
+
+@bp.after_request
+def observe_request(response):
+    route = request.url_rule.rule if request.url_rule else "unmatched"
+    request_latency.labels(request.method, route, response.status_code).observe(time.perf_counter() - g.request_started)
+    state, g.profile = g.profile, None
+    end_profile(state, response)
+    return response
+
+@bp.teardown_request
+def finish_request(exc=None):
+    state, g.profile = g.get("profile"), None
+    end_profile(state)
+    admitted, g.admitted = g.get("admitted"), None
+    if admitted is not None:
+        admitted.release()
+    token, g.priority = g.get("priority"), None
+    if token is not None:
+        quota.reset_priority(token)
+    token, g.deadline = g.get("deadline"), None
+    if token is not None:
+        deadline.end(token)
+    requests_in_flight.dec()
+
 @bp.route("/health", methods=["GET"])
 def health_check():
     return {"status":"ok", "message":"Service is healthy"}
 
+@bp.route("/ready", methods=["GET"])
+def readiness_check():
+    if not MongoDBManager.ping():
+        return jsonify({"status": 503, "message": "MongoDB indisponível"}), 503
+    return {"status":"ok", "message":"Service is ready"}
+
+@bp.route("/stats", methods=["GET"])
+def get_stats():
+    return {"geocode_cache": geocode_cache.stats(), "upstream_calls": upstream_flights.stats(), "snapshot_restore": warm_start.last_restore, "admission": admission.stats(), "upstream_quota": upstream_quota()}
+
+@bp.route("/metrics", methods=["GET"])
+def get_metrics():
+    return Response(registry.render(), content_type=CONTENT_TYPE)
+
 @bp.route("/tax_coords", methods=["POST"])
 def get_tax_by_coords():
     try:
         payload = request.get_json()
         validated_payload = TaxSchema().load(payload)
-        tax = GeoController().get_tax_by_coords(
-            validated_payload["latitude"],
-            validated_payload["longitude"],
-            validated_payload["sender_currency"]
-        )
-        return {"tax": tax}
+        return GeoController().get_tax_response(validated_payload)
     except ValidationError as e:
-        logger.error(f"Error: {str(e)}")
+        log_error(e)
         return jsonify({"status": 422, "message": str(e)}), 422
     except (GoogleMapsApiError, ExchangeApiError) as e:
-        logger.error(f"Error: {str(e)}")
+        log_error(e)
         return jsonify({"status": 500, "message": str(e)}), 500
     except (CountryNotFound, CurrenciesNotFound, TaxNotFound, DesiredCurrencyNotFound) as e:
-        logger.error(f"Error: {str(e)}")
+        log_error(e)
         return jsonify({"status": 404, "message": str(e)}), 404
+    except ServiceOverloaded as e:
+        log_error(e)
+        return shed_response(e)
+    except Exception as e:
+        log_error(e)
+        return jsonify({"status": 400, "message": str(e)}), 400
+    
+@bp.route("/tax_coords/batch", methods=["POST"])
+def get_tax_by_coords_batch():
+    try:
+        items = load_batch(TaxSchema())
+        controller = BatchGeoController(settings.BATCH_MAX_WORKERS)
+        controller.prepare_tax_by_coords(valid_items(items))
+        return run_batch(
+            items,
+            controller.get_tax_response,
+            TAX_ERRORS,
+        )
+    except ValidationError as e:
+        log_error(e)
+        return jsonify({"status": 422, "message": str(e)}), 422
+    except ServiceOverloaded as e:
+        log_error(e)
+        return shed_response(e)
     except Exception as e:
-        logger.error(f"Error: {str(e)}")
+        log_error(e)
         return jsonify({"status": 400, "message": str(e)}), 400
     
 @bp.route("/conversion", methods=["POST"])
@@ -46,22 +250,91 @@ def get_conversion():
         exchange_currency = GeoController().get_conversion(
             validated_payload["sender_currency"],
             validated_payload["receiver_currency"],
-            validated_payload["value"]
+            validated_payload["value"],
+            validated_payload["as_of"]
         )
         if not exchange_currency:
             raise TaxNotFound("Conversão não encontrada")
         return {"result": exchange_currency}
     except ValidationError as e:
-        logger.error(f"Error: {str(e)}")
+        log_error(e)
+        return jsonify({"status": 422, "message": str(e)}), 422
+    except ExchangeApiError as e:
+        log_error(e)
+        return jsonify({"status": 500, "message": str(e)}), 500
+    except TaxNotFound as e:
+        log_error(e)
+        return jsonify({"status": 404, "message": str(e)}), 404
+    except ServiceOverloaded as e:
+        log_error(e)
+        return shed_response(e)
+    except Exception as e:
+        log_error(e)
+        return jsonify({"status": 400, "message": str(e)}), 400
+    
+@bp.route("/conversion/batch", methods=["POST"])
+def get_conversion_batch():
+    def convert(controller, item):
+        exchange_currency = controller.get_conversion(item["sender_currency"], item["receiver_currency"], item["value"], item["as_of"])
+        if not exchange_currency:
+            raise TaxNotFound("Conversão não encontrada")
+        return {"result": exchange_currency}
+
+    try:
+        items = load_batch(ConversionSchema())
+        controller = BatchGeoController(settings.BATCH_MAX_WORKERS)
+        controller.prepare_conversion(valid_items(items))
+        return run_batch(items, lambda item: convert(controller, item), CONVERSION_ERRORS)
+    except ValidationError as e:
+        log_error(e)
+        return jsonify({"status": 422, "message": str(e)}), 422
+    except ServiceOverloaded as e:
+        log_error(e)
+        return shed_response(e)
+    except Exception as e:
+        log_error(e)
+        return jsonify({"status": 400, "message": str(e)}), 400
+    
+@bp.route("/conversion/stream", methods=["POST"])
+def get_conversion_stream():
+    try:
+        parser = RowParser(request.args.get("format") or detect_format(request.content_type))
+    except ValueError as e:
+        log_error(e)
+        return jsonify({"status": 422, "message": str(e)}), 422
+
+    lines = io.TextIOWrapper(request.stream, encoding="utf-8", newline="")
+    route = request.url_rule.rule
+    converter = StreamConverter(settings.STREAM_CHUNK_SIZE, settings.BATCH_MAX_WORKERS, lambda: stream_chunk_budget(route))
+    results = converter.convert(parser.rows(lines))
+    return Response(stream_with_context(to_ndjson(result) for result in results), mimetype="application/x-ndjson")
+    
+@bp.route("/conversion/matrix", methods=["POST"])
+def get_conversion_matrix():
+    try:
+        payload = request.get_json()
+        validated_payload = ConversionMatrixSchema().load(payload)
+        result = GeoController().get_conversion_matrix(
+            validated_payload["sender_currency"],
+            validated_payload["values"],
+            validated_payload["receiver_currencies"],
+            validated_payload["as_of"]
+        )
+        return {"sender_currency": validated_payload["sender_currency"], "result": result}
+    except ValidationError as e:
+        log_error(e)
         return jsonify({"status": 422, "message": str(e)}), 422
     except ExchangeApiError as e:
-        logger.error(f"Error: {str(e)}")
+        log_error(e)
         return jsonify({"status": 500, "message": str(e)}), 500
     except TaxNotFound as e:
-        logger.error(f"Error: {str(e)}")
+        log_error(e)
         return jsonify({"status": 404, "message": str(e)}), 404
+    except ServiceOverloaded as e:
+        log_error(e)
+        return shed_response(e)
     except Exception as e:
-        logger.error(f"Error: {str(e)}")
+        log_error(e)
         return jsonify({"status": 400, "message": str(e)}), 400
     
 @bp.route("/conversion_by_country", methods=["POST"])
@@ -72,19 +345,46 @@ def get_conversion_by_country():
         exchange_currency = GeoController().get_conversion_by_country(
             validated_payload["sender_country"],
             validated_payload["receiver_country"],
-            validated_payload["value"]
+            validated_payload["value"],
+            validated_payload["as_of"]
         )
         if not exchange_currency:
             raise DesiredCurrencyNotFound("Conversão não encontrada")
         return {"result": exchange_currency}
     except ValidationError as e:
-        logger.error(f"Error: {str(e)}")
+        log_error(e)
         return jsonify({"status": 422, "message": str(e)}), 422
     except (DesiredCurrencyNotFound, TaxNotFound) as e:
-        logger.error(f"Error: {str(e)}")
+        log_error(e)
         return jsonify({"status": 404, "message": str(e)}), 404
+    except ServiceOverloaded as e:
+        log_error(e)
+        return shed_response(e)
+    except Exception as e:
+        log_error(e)
+        return jsonify({"status": 400, "message": str(e)}), 400
+
+@bp.route("/conversion_by_country/batch", methods=["POST"])
+def get_conversion_by_country_batch():
+    def convert(controller, item):
+        exchange_currency = controller.get_conversion_by_country(item["sender_country"], item["receiver_country"], item["value"], item["as_of"])
+        if not exchange_currency:
+            raise DesiredCurrencyNotFound("Conversão não encontrada")
+        return {"result": exchange_currency}
+
+    try:
+        items = load_batch(ConversionCountrySchema())
+        controller = BatchGeoController(settings.BATCH_MAX_WORKERS)
+        controller.prepare_conversion_by_country(valid_items(items))
+        return run_batch(items, lambda item: convert(controller, item), CONVERSION_COUNTRY_ERRORS)
+    except ValidationError as e:
+        log_error(e)
+        return jsonify({"status": 422, "message": str(e)}), 422
+    except ServiceOverloaded as e:
+        log_error(e)
+        return shed_response(e)
     except Exception as e:
-        logger.error(f"Error: {str(e)}")
+        log_error(e)
         return jsonify({"status": 400, "message": str(e)}), 400
 
 @bp.route("/coords/currency", methods=["POST"])
@@ -98,28 +398,34 @@ def get_currency_by_coords():
         )
         return currency
     except ValidationError as e:
-        logger.error(f"Error: {str(e)}")
+        log_error(e)
         return jsonify({"status": 422, "message": str(e)}), 422
     except GoogleMapsApiError as e:
-        logger.error(f"Error: {str(e)}")
+        log_error(e)
         return jsonify({"status": 500, "message": str(e)}), 500
     except CountryNotFound as e:
-        logger.error(f"Error: {str(e)}")
+        log_error(e)
         return jsonify({"status": 404, "message": str(e)}), 404
+    except ServiceOverloaded as e:
+        log_error(e)
+        return shed_response(e)
     except Exception as e:
-        logger.error(f"Error: {str(e)}")
+        log_error(e)
         return jsonify({"status": 400, "message": str(e)}), 400
 
 @bp.route("/currencies", methods=["GET"])
 def get_currencies():
     try:
-        currencies = GeoController().get_currencies()
+        currencies = GeoController().get_currencies_response()
         if not currencies:
             raise CurrenciesNotFound("Não foi possível buscar as moedas")
-        return {"result": currencies}
+        return currencies.to_response(request, Response, settings.CURRENCIES_CACHE_MAX_AGE)
     except CurrenciesNotFound as e:
-        logger.error(f"Error: {str(e)}")
+        log_error(e)
         return jsonify({"status": 404, "message": str(e)}), 404
+    except ServiceOverloaded as e:
+        log_error(e)
+        return shed_response(e)
     except Exception as e:
-        logger.error(f"Error: {str(e)}")
+        log_error(e)
         return jsonify({"status": 400, "message": str(e)}), 400
\ No newline at end of file
@@ -0,0 +1,278 @@
+import asyncio
+import logging
+import time
+from contextlib import asynccontextmanager
+from quart import Blueprint, Response, g, request, jsonify
+from marshmallow import ValidationError
+from database.db import MongoDBManager
+from controllers.async_geoloc_controller import AsyncBatchGeoController, AsyncGeoController, AsyncStreamConverter, async_upstream_flights
+from controllers.geoloc_controller import geocode_cache, warm_start
+from settings import settings
+from schemas import ConversionCountrySchema, ConversionMatrixSchema, ConversionSchema, CoordSchema, TaxSchema
+from views.api import BATCH_ROUTES, CONVERSION_COUNTRY_ERRORS, CONVERSION_ERRORS, STREAM_ROUTES, TAX_ERRORS, UNLIMITED_ROUTES, end_profile, log_error, profiler, retry_after, route_timeout, upstream_quota
+from utils import deadline, quota
+from utils.admission import async_admission
+from utils.streaming import RowParser, aiter_lines, detect_format, to_ndjson
+from utils.metrics import CONTENT_TYPE, registry, request_latency, requests_in_flight
+from utils.exceptions import CountryNotFound, CurrenciesNotFound, DesiredCurrencyNotFound, GoogleMapsApiError, ServiceOverloaded, TaxNotFound
+
+bp = Blueprint("geoloc_async", __name__)
+
+logger = logging.getLogger(__name__)
+logger.setLevel(logging.INFO)
+
+COORDS_ERRORS = [(GoogleMapsApiError, 500), (CountryNotFound, 404)]
+CURRENCIES_ERRORS = [(CurrenciesNotFound, 404)]
+
+
+def error_response(e, errors):
+    log_error(e)
+    if isinstance(e, ValidationError):
+        status = 422
+    elif isinstance(e, ServiceOverloaded):
+        return jsonify({"status": 503, "message": str(e)}), 503, retry_after()
+    else:
+        status = next((status for types, status in errors if isinstance(e, types)), 400)
+    return jsonify({"status": status, "message": str(e)}), status
+
+
+async def load_batch(schema):
+    payload = await request.get_json()
+    if not isinstance(payload, list):
+        raise ValidationError("O lote deve ser uma lista de itens")
+    if len(payload) > settings.BATCH_MAX_ITEMS:
+        raise ValidationError(f"O lote deve ter no máximo {settings.BATCH_MAX_ITEMS} itens")
+    items = []
+    for item in payload:
+        try:
+            items.append(schema.load(item))
+        except ValidationError as e:
+            items.append(e)
+    return items
+
+
+async def run_batch(items, handler, errors):
+    async def run(item):
+        try:
+            if isinstance(item, ValidationError):
+                raise item
+            return {"status": 200, **await handler(item)}
+        except ValidationError as e:
+            return {"status": 422, "message": str(e)}
+        except Exception as e:
+            log_error(e)
+            status = next((status for types, status in errors if isinstance(e, types)), 400)
+            return {"status": status, "message": str(e)}
+
+    return {"results": await asyncio.gather(*(run(item) for item in items))}
+
+
+@asynccontextmanager
+async def stream_chunk_budget(route):
+    token = deadline.start(settings.STREAM_CHUNK_TIMEOUT)
+    try:
+        admitted = await async_admission.acquire_async(route, deadline.remaining())
+        try:
+            yield
+        finally:
+            if admitted is not None:
+                admitted.release()
+    finally:
+        deadline.end(token)
+
+
+@bp.before_request
+async def start_request_timer():
+    g.request_started = time.perf_counter()
+    route = request.url_rule.rule if request.url_rule else "unmatched"
+    g.profile = profiler.begin(request.headers, f"{request.method} {route}")
+    requests_in_flight.inc()
+
+@bp.before_request
+async def admit_request():
+    if not request.url_rule or request.url_rule.rule in UNLIMITED_ROUTES:
+        return None
+    route = request.url_rule.rule
+    if route in BATCH_ROUTES:
+        g.priority = quota.set_priority(quota.BATCH)
+    if route in STREAM_ROUTES:
+        return None
+    g.deadline = deadline.start(route_timeout(route, request.headers))
+    try:
+        g.admitted = await async_admission.acquire_async(route, deadline.remaining())
+    except ServiceOverloaded as e:
+        return error_response(e, [])
+
+@bp.after_request
+async def observe_request(response):
+    route = request.url_rule.rule if request.url_rule else "unmatched"
+    request_latency.labels(request.method, route, response.status_code).observe(time.perf_counter() - g.request_started)
+    state, g.profile = g.profile, None
+    end_profile(state, response)
+    return response
+
+@bp.teardown_request
+async def finish_request(exc=None):
+    state, g.profile = g.get("profile"), None
+    end_profile(state)
+    admitted, g.admitted = g.get("admitted"), None
+    if admitted is not None:
+        admitted.release()
+    token, g.priority = g.get("priority"), None
+    if token is not None:
+        quota.reset_priority(token)
+    token, g.deadline = g.get("deadline"), None
+    if token is not None:
+        deadline.end(token)
+    requests_in_flight.dec()
+
+@bp.route("/health", methods=["GET"])
+async def health_check():
+    return {"status":"ok", "message":"Service is healthy"}
+
+@bp.route("/ready", methods=["GET"])
+async def readiness_check():
+    if not await asyncio.to_thread(MongoDBManager.ping):
+        return jsonify({"status": 503, "message": "MongoDB indisponível"}), 503
+    return {"status":"ok", "message":"Service is ready"}
+
+@bp.route("/stats", methods=["GET"])
+async def get_stats():
+    return {"geocode_cache": geocode_cache.stats(), "upstream_calls": async_upstream_flights.stats(), "snapshot_restore": warm_start.last_restore, "admission": async_admission.stats(), "upstream_quota": upstream_quota()}
+
+@bp.route("/metrics", methods=["GET"])
+async def get_metrics():
+    return Response(registry.render(), content_type=CONTENT_TYPE)
+
+@bp.route("/tax_coords", methods=["POST"])
+async def get_tax_by_coords():
+    try:
+        validated_payload = TaxSchema().load(await request.get_json())
+        return await AsyncGeoController().get_tax_response(validated_payload)
+    except Exception as e:
+        return error_response(e, TAX_ERRORS)
+
+@bp.route("/tax_coords/batch", methods=["POST"])
+async def get_tax_by_coords_batch():
+    try:
+        controller = AsyncBatchGeoController()
+        return await run_batch(await load_batch(TaxSchema()), controller.get_tax_response, TAX_ERRORS)
+    except Exception as e:
+        return error_response(e, [])
+
+@bp.route("/conversion", methods=["POST"])
+async def get_conversion():
+    try:
+        validated_payload = ConversionSchema().load(await request.get_json())
+        exchange_currency = await AsyncGeoController().get_conversion(
+            validated_payload["sender_currency"],
+            validated_payload["receiver_currency"],
+            validated_payload["value"],
+            validated_payload["as_of"]
+        )
+        if not exchange_currency:
+            raise TaxNotFound("Conversão não encontrada")
+        return {"result": exchange_currency}
+    except Exception as e:
+        return error_response(e, CONVERSION_ERRORS)
+
+@bp.route("/conversion/batch", methods=["POST"])
+async def get_conversion_batch():
+    async def convert(item):
+        exchange_currency = await controller.get_conversion(item["sender_currency"], item["receiver_currency"], item["value"], item["as_of"])
+        if not exchange_currency:
+            raise TaxNotFound("Conversão não encontrada")
+        return {"result": exchange_currency}
+
+    try:
+        controller = AsyncBatchGeoController()
+        return await run_batch(await load_batch(ConversionSchema()), convert, CONVERSION_ERRORS)
+    except Exception as e:
+        return error_response(e, [])
+
+@bp.route("/conversion/stream", methods=["POST"])
+async def get_conversion_stream():
+    try:
+        parser = RowParser(request.args.get("format") or detect_format(request.content_type))
+    except ValueError as e:
+        return error_response(e, [])
+
+    body = request.body
+    route = request.url_rule.rule
+
+    async def rows():
+        async for line in aiter_lines(body):
+            row = parser.parse(line)
+            if row is not None:
+                yield row
+
+    async def results():
+        async for result in AsyncStreamConverter(settings.STREAM_CHUNK_SIZE, lambda: stream_chunk_budget(route)).convert(rows()):
+            yield to_ndjson(result).encode()
+
+    return Response(results(), mimetype="application/x-ndjson")
+
+@bp.route("/conversion/matrix", methods=["POST"])
+async def get_conversion_matrix():
+    try:
+        validated_payload = ConversionMatrixSchema().load(await request.get_json())
+        result = await AsyncGeoController().get_conversion_matrix(
+            validated_payload["sender_currency"],
+            validated_payload["values"],
+            validated_payload["receiver_currencies"],
+            validated_payload["as_of"]
+        )
+        return {"sender_currency": validated_payload["sender_currency"], "result": result}
+    except Exception as e:
+        return error_response(e, CONVERSION_ERRORS)
+
+@bp.route("/conversion_by_country", methods=["POST"])
+async def get_conversion_by_country():
+    try:
+        validated_payload = ConversionCountrySchema().load(await request.get_json())
+        exchange_currency = await AsyncGeoController().get_conversion_by_country(
+            validated_payload["sender_country"],
+            validated_payload["receiver_country"],
+            validated_payload["value"],
+            validated_payload["as_of"]
+        )
+        if not exchange_currency:
+            raise DesiredCurrencyNotFound("Conversão não encontrada")
+        return {"result": exchange_currency}
+    except Exception as e:
+        return error_response(e, CONVERSION_COUNTRY_ERRORS)
+
+@bp.route("/conversion_by_country/batch", methods=["POST"])
+async def get_conversion_by_country_batch():
+    async def convert(item):
+        exchange_currency = await controller.get_conversion_by_country(item["sender_country"], item["receiver_country"], item["value"], item["as_of"])
+        if not exchange_currency:
+            raise DesiredCurrencyNotFound("Conversão não encontrada")
+        return {"result": exchange_currency}
+
+    try:
+        controller = AsyncBatchGeoController()
+        return await run_batch(await load_batch(ConversionCountrySchema()), convert, CONVERSION_COUNTRY_ERRORS)
+    except Exception as e:
+        return error_response(e, [])
+
+@bp.route("/coords/currency", methods=["POST"])
+async def get_currency_by_coords():
+    try:
+        validated_payload = CoordSchema().load(await request.get_json())
+        return await AsyncGeoController().get_currency_by_coords(
+            validated_payload["latitude"],
+            validated_payload["longitude"]
+        )
+    except Exception as e:
+        return error_response(e, COORDS_ERRORS)
+
+@bp.route("/currencies", methods=["GET"])
+async def get_currencies():
+    try:
+        currencies = await AsyncGeoController().get_currencies_response()
+        if not currencies:
+            raise CurrenciesNotFound("Não foi possível buscar as moedas")
+        return currencies.to_response(request, Response, settings.CURRENCIES_CACHE_MAX_AGE)
+    except Exception as e:
+        return error_response(e, CURRENCIES_ERRORS)
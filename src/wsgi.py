@@ -0,0 +1,4 @@
+from main import create_app
+
+# As threads de segundo plano são iniciadas por worker em gunicorn.conf.py
+app = create_app(background=False)